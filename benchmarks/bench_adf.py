@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark and validate the fast ADF path against statsmodels adfuller.
+
+Compares, on synthetic AR(1) spreads:
+- adfuller with AIC lag search (what adf_test used to run every cycle)
+- adfuller with a fixed lag
+- FastADF.test, one series at a time
+- FastADF.test_batch, all series in one call
+
+and checks FastADF against fixed-lag adfuller within tolerance.
+
+Usage:
+    python benchmarks/bench_adf.py [--series 50] [--length 500] [--lag 1]
+"""
+
+import argparse
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.append('src')
+
+from statsmodels.tsa.stattools import adfuller
+
+from analytics.fast_adf import FastADF
+
+warnings.filterwarnings('ignore', category=FutureWarning)
+
+STAT_TOLERANCE = 1e-8
+PVALUE_TOLERANCE = 1e-4
+
+
+def make_spreads(n_series: int, length: int) -> np.ndarray:
+    """AR(1) spreads with persistence from 0.5 (stationary) to 1.0 (unit root)."""
+    rng = np.random.default_rng(42)
+    phi = np.linspace(0.5, 1.0, n_series)
+    spreads = np.zeros((n_series, length))
+    noise = rng.standard_normal((n_series, length))
+    for t in range(1, length):
+        spreads[:, t] = phi * spreads[:, t - 1] + noise[:, t]
+    return spreads
+
+
+def timed(fn, repeat: int = 3) -> float:
+    """Best-of-N wall time in milliseconds."""
+    best = np.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def validate(spreads: np.ndarray, lag: int):
+    fast = FastADF.test_batch(spreads, lag=lag)
+    worst_stat = worst_p = 0.0
+    
+    for row, result in zip(spreads, fast):
+        ref = adfuller(row, maxlag=lag, autolag=None)
+        worst_stat = max(worst_stat, abs(ref[0] - result['statistic']))
+        worst_p = max(worst_p, abs(ref[1] - result['p_value']))
+        for level, value in ref[4].items():
+            assert abs(value - result['critical_values'][level]) < STAT_TOLERANCE
+    
+    print(f"Validation vs adfuller(maxlag={lag}, autolag=None): "
+          f"max |Δstat|={worst_stat:.2e}, max |Δp|={worst_p:.2e}")
+    assert worst_stat < STAT_TOLERANCE, "statistic outside tolerance"
+    assert worst_p < PVALUE_TOLERANCE, "p-value outside tolerance"
+
+
+def main(n_series: int, length: int, lag: int):
+    spreads = make_spreads(n_series, length)
+    
+    # Build the p-value table outside the timings
+    FastADF.test(spreads[0], lag=lag)
+    
+    validate(spreads, lag)
+    
+    results = {
+        'adfuller (AIC lag search)': timed(lambda: [adfuller(s) for s in spreads], repeat=1),
+        f'adfuller (lag={lag})': timed(lambda: [adfuller(s, maxlag=lag, autolag=None) for s in spreads]),
+        'FastADF.test (loop)': timed(lambda: [FastADF.test(s, lag=lag) for s in spreads]),
+        'FastADF.test_batch': timed(lambda: FastADF.test_batch(spreads, lag=lag))
+    }
+    
+    baseline = results['adfuller (AIC lag search)']
+    print(f"\n{n_series} series x {length} points")
+    for name, ms in results.items():
+        print(f"  {name:28s} {ms:9.2f}ms  {ms / n_series * 1000:9.1f}µs/series  {baseline / ms:7.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--series', type=int, default=50)
+    parser.add_argument('--length', type=int, default=500)
+    parser.add_argument('--lag', type=int, default=1)
+    args = parser.parse_args()
+    
+    main(args.series, args.length, args.lag)
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Benchmark tick insertion paths against a local TimescaleDB:
+executemany INSERT ... ON CONFLICT vs COPY into staging + set-based merge.
+
+Usage:
+    python benchmarks/bench_tick_insert.py [--batch-size 1000] [--batches 20]
+
+Writes synthetic ticks under a dedicated symbol and deletes them afterwards.
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+
+import yaml
+
+sys.path.append('src')
+
+from storage.timeseries_db import TimeSeriesDB
+
+
+BENCH_SYMBOL = 'benchusdt'
+
+
+def make_batches(batch_size: int, n_batches: int, start_ms: int) -> list:
+    """Synthetic tick batches with unique (time, trade_id)."""
+    batches = []
+    trade_id = 0
+    for b in range(n_batches):
+        batch = []
+        for i in range(batch_size):
+            trade_id += 1
+            batch.append({
+                'symbol': BENCH_SYMBOL,
+                'timestamp_ms': start_ms + trade_id,
+                'price': 100.0 + (trade_id % 100) * 0.01,
+                'size': 0.001 * (1 + trade_id % 7),
+                'trade_id': trade_id,
+                'is_buyer_maker': trade_id % 2 == 0
+            })
+        batches.append(batch)
+    return batches
+
+
+async def run_path(db: TimeSeriesDB, insert, batches: list) -> float:
+    """Insert all batches with one path and return rows/sec."""
+    async with db.pool.acquire() as conn:
+        await conn.execute("DELETE FROM ticks WHERE symbol = $1", BENCH_SYMBOL)
+    
+    rows = sum(len(b) for b in batches)
+    start = time.perf_counter()
+    for batch in batches:
+        await insert(batch)
+    elapsed = time.perf_counter() - start
+    
+    async with db.pool.acquire() as conn:
+        stored = await conn.fetchval("SELECT COUNT(*) FROM ticks WHERE symbol = $1", BENCH_SYMBOL)
+        await conn.execute("DELETE FROM ticks WHERE symbol = $1", BENCH_SYMBOL)
+    
+    assert stored == rows, f"expected {rows} rows, found {stored}"
+    return rows / elapsed
+
+
+async def main(batch_size: int, n_batches: int):
+    with open('config/settings.yaml') as f:
+        config = yaml.safe_load(f)
+    
+    db = TimeSeriesDB(config['DATABASE_URL'])
+    await db.connect()
+    
+    try:
+        start_ms = int(time.time() * 1000) - 3_600_000
+        batches = make_batches(batch_size, n_batches, start_ms)
+        
+        print(f"{n_batches} batches x {batch_size} rows")
+        results = {}
+        for name, insert in [('executemany', db.insert_ticks_batch), ('copy', db.insert_ticks_copy)]:
+            results[name] = await run_path(db, insert, batches)
+            print(f"  {name:12s} {results[name]:>12,.0f} rows/sec")
+        
+        print(f"  speedup      {results['copy'] / results['executemany']:>12.1f}x")
+    finally:
+        await db.disconnect()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--batches', type=int, default=20)
+    args = parser.parse_args()
+    
+    asyncio.run(main(args.batch_size, args.batches))
@@ -0,0 +1,13 @@
+"""
+pytest configuration: modules import from src/ (flat packages, as in main.py).
+
+test_system.py is a standalone check script against live services (run it
+directly), not part of the pytest suite.
+"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+collect_ignore = ['test_system.py']
@@ -5,9 +5,10 @@ Supports custom rules, rate limiting, and alert history.
 
 import asyncio
 from datetime import datetime, timedelta
-from typing import Callable, Dict, List, Optional
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
+import numpy as np
 import pandas as pd
 from loguru import logger
 
@@ -42,6 +43,8 @@ class AlertRule:
         severity: Alert severity level
         cooldown_seconds: Minimum time between repeat alerts
         message_template: Alert message with placeholders
+        metric: Analytics key the rule reads in AlertEngine.evaluate
+            (default: ALERT_METRICS for the alert type)
     """
     rule_id: str
     alert_type: AlertType
@@ -52,6 +55,20 @@ class AlertRule:
     cooldown_seconds: int = 60
     message_template: str = "Alert triggered for {symbol}"
     enabled: bool = True
+    metric: Optional[str] = None
+    
+    def __post_init__(self):
+        if self.metric is None:
+            self.metric = ALERT_METRICS.get(self.alert_type, self.alert_type.value)
+
+
+# Analytics key read by each alert type in AlertEngine.evaluate
+ALERT_METRICS = {
+    AlertType.ZSCORE_THRESHOLD: 'zscore',
+    AlertType.SPREAD_BREAKOUT: 'spread',
+    AlertType.VOLATILITY_SPIKE: 'volatility',
+    AlertType.CORRELATION_BREAK: 'correlation'
+}
 
 
 @dataclass
@@ -76,6 +93,14 @@ class AlertEngine:
     - Cooldown to prevent spam
     - Alert history
     - Async callbacks for real-time notifications
+    - Batch evaluation of all rules against one cycle's metrics (evaluate)
+    
+    Rules are indexed by (symbol, metric). Rules whose condition is a plain
+    threshold comparison (THRESHOLD_CONDITIONS) are kept as arrays and
+    checked together with one vectorized comparison; other conditions are
+    called per rule, but only for the (symbol, metric) keys present in the
+    batch. Messages, history and callbacks are only paid for by rules that
+    trigger.
     """
     
     def __init__(self, check_interval: float = 0.5):
@@ -86,15 +111,24 @@ class AlertEngine:
         self.callbacks: List[Callable] = []
         self.running = False
         
+        # Rule index, rebuilt lazily after rules are added or removed
+        self._index_dirty = True
+        self._key_positions: Dict[Tuple[str, str], int] = {}
+        self._threshold_rules: List[AlertRule] = []
+        self._threshold_positions: Dict[str, int] = {}
+        self._other_rules: Dict[Tuple[str, str], List[AlertRule]] = {}
+        
     def add_rule(self, rule: AlertRule):
-        """Add an alert rule."""
+        """Add an alert rule (replaces a rule with the same rule_id)."""
         self.rules[rule.rule_id] = rule
+        self._index_dirty = True
         logger.info(f"Added alert rule: {rule.rule_id} for {rule.symbol}")
         
     def remove_rule(self, rule_id: str):
         """Remove an alert rule."""
         if rule_id in self.rules:
             del self.rules[rule_id]
+            self._index_dirty = True
             logger.info(f"Removed alert rule: {rule_id}")
     
     def enable_rule(self, rule_id: str):
@@ -146,10 +180,102 @@ class AlertEngine:
         if not should_trigger:
             return None
         
-        # Create alert
+        alert = self._trigger(rule, current_value, datetime.now())
+        await self._dispatch([alert])
+        
+        return alert
+    
+    def _rebuild_index(self):
+        """Index rules by (symbol, metric) and pack threshold rules into arrays."""
+        self._key_positions = {}
+        self._threshold_rules = []
+        self._other_rules = {}
+        
+        for rule in self.rules.values():
+            key = (rule.symbol, rule.metric)
+            if rule.condition in THRESHOLD_CONDITIONS:
+                self._key_positions.setdefault(key, len(self._key_positions))
+                self._threshold_rules.append(rule)
+            else:
+                self._other_rules.setdefault(key, []).append(rule)
+        
+        rules = self._threshold_rules
+        self._threshold_positions = {rule.rule_id: i for i, rule in enumerate(rules)}
+        self._rule_keys = np.array([self._key_positions[(r.symbol, r.metric)] for r in rules], dtype=np.int64)
+        self._thresholds = np.array([r.threshold for r in rules], dtype=np.float64)
+        self._use_abs = np.array([THRESHOLD_CONDITIONS[r.condition][0] for r in rules], dtype=bool)
+        self._above = np.array([THRESHOLD_CONDITIONS[r.condition][1] for r in rules], dtype=bool)
+        self._cooldowns = np.array([r.cooldown_seconds for r in rules], dtype=np.float64)
+        self._last_triggered = np.array([
+            self.last_trigger_times[r.rule_id].timestamp() if r.rule_id in self.last_trigger_times else -np.inf
+            for r in rules
+        ], dtype=np.float64)
+        self._index_dirty = False
+    
+    async def evaluate(self, metrics_by_pair: Dict[str, Dict]) -> List[Alert]:
+        """
+        Check every rule against one batch of analytics.
+        
+        Args:
+            metrics_by_pair: symbol -> {metric: value}, e.g.
+                {'btcusdt-ethusdt': {'zscore': 2.3, 'correlation': 0.81}}.
+                Missing or None/NaN values skip the rules reading them. The
+                symbol's dict is also the data argument of non-threshold
+                conditions.
+        
+        Returns:
+            Triggered alerts (callbacks already run)
+        """
+        if self._index_dirty:
+            self._rebuild_index()
+        
+        now = datetime.now()
+        triggered: List[Alert] = []
+        
+        if self._threshold_rules:
+            key_values = np.full(len(self._key_positions), np.nan)
+            for symbol, metrics in metrics_by_pair.items():
+                for metric, value in metrics.items():
+                    position = self._key_positions.get((symbol, metric))
+                    if position is not None and value is not None:
+                        key_values[position] = value
+            
+            values = key_values[self._rule_keys]
+            compared = np.where(self._use_abs, np.abs(values), values)
+            with np.errstate(invalid='ignore'):
+                hit = np.where(self._above, compared > self._thresholds, compared < self._thresholds)
+                hit &= (now.timestamp() - self._last_triggered) >= self._cooldowns
+            
+            for i in np.flatnonzero(hit).tolist():
+                rule = self._threshold_rules[i]
+                if rule.enabled:
+                    triggered.append(self._trigger(rule, float(values[i]), now))
+        
+        for symbol, metrics in metrics_by_pair.items():
+            for metric, value in metrics.items():
+                for rule in self._other_rules.get((symbol, metric), ()):
+                    if value is None or not rule.enabled or self._cooling_down(rule, now):
+                        continue
+                    try:
+                        should_trigger = rule.condition(value, rule.threshold, metrics)
+                    except Exception as e:
+                        logger.error(f"Error evaluating rule {rule.rule_id}: {e}")
+                        continue
+                    if should_trigger:
+                        triggered.append(self._trigger(rule, value, now))
+        
+        await self._dispatch(triggered)
+        return triggered
+    
+    def _cooling_down(self, rule: AlertRule, now: datetime) -> bool:
+        last_trigger = self.last_trigger_times.get(rule.rule_id)
+        return last_trigger is not None and (now - last_trigger).total_seconds() < rule.cooldown_seconds
+    
+    def _trigger(self, rule: AlertRule, value: float, now: datetime) -> Alert:
+        """Create and record an alert for a rule whose condition is met."""
         message = rule.message_template.format(
             symbol=rule.symbol,
-            value=current_value,
+            value=value,
             threshold=rule.threshold
         )
         
@@ -159,31 +285,43 @@ class AlertEngine:
             symbol=rule.symbol,
             severity=rule.severity,
             message=message,
-            value=current_value,
+            value=value,
             threshold=rule.threshold,
-            timestamp=datetime.now()
+            timestamp=now
         )
         
-        # Update last trigger time
-        self.last_trigger_times[rule.rule_id] = datetime.now()
+        # Update last trigger time (and its copy in the threshold arrays)
+        self.last_trigger_times[rule.rule_id] = now
+        position = self._threshold_positions.get(rule.rule_id)
+        if not self._index_dirty and position is not None:
+            self._last_triggered[position] = now.timestamp()
         
         # Store in history
         self.alert_history.append(alert)
-        
-        # Trigger callbacks
-        for callback in self.callbacks:
-            try:
-                if asyncio.iscoroutinefunction(callback):
-                    await callback(alert)
-                else:
-                    callback(alert)
-            except Exception as e:
-                logger.error(f"Error in alert callback: {e}")
-        
         logger.warning(f"🚨 ALERT: {alert.message}")
         
         return alert
     
+    async def _dispatch(self, alerts: List[Alert]):
+        """Run callbacks for alerts; async callbacks run concurrently."""
+        if not alerts or not self.callbacks:
+            return
+        
+        pending = []
+        for alert in alerts:
+            for callback in self.callbacks:
+                try:
+                    if asyncio.iscoroutinefunction(callback):
+                        pending.append(callback(alert))
+                    else:
+                        callback(alert)
+                except Exception as e:
+                    logger.error(f"Error in alert callback: {e}")
+        
+        for result in await asyncio.gather(*pending, return_exceptions=True):
+            if isinstance(result, Exception):
+                logger.error(f"Error in alert callback: {result}")
+    
     def get_recent_alerts(self, minutes: int = 60) -> List[Alert]:
         """Get alerts from the last N minutes."""
         cutoff = datetime.now() - timedelta(minutes=minutes)
@@ -242,6 +380,17 @@ class AlertConditions:
         return percentile > threshold or percentile < (100 - threshold)
 
 
+# Conditions that are a plain threshold comparison: condition -> (compare
+# abs(value), trigger above threshold). AlertEngine.evaluate checks rules
+# using them with one vectorized comparison instead of calling them.
+THRESHOLD_CONDITIONS = {
+    AlertConditions.zscore_above: (True, True),
+    AlertConditions.zscore_entry: (True, True),
+    AlertConditions.zscore_exit: (True, False),
+    AlertConditions.correlation_break: (False, False)
+}
+
+
 # Predefined alert rule builders
 class AlertRuleBuilder:
     """Helper to build common alert rules."""
@@ -324,5 +473,42 @@ if __name__ == "__main__":
         # Check history
         recent = engine.get_recent_alerts(minutes=5)
         print(f"\nRecent alerts: {len(recent)}")
+        
+        # Batch evaluation: many pairs, one call per cycle
+        import time
+        rng = np.random.default_rng(42)
+        pairs = [f"sym{i}-sym{i + 1}" for i in range(500)]
+        metrics = {
+            pair: {'zscore': float(z), 'correlation': float(c)}
+            for pair, z, c in zip(pairs, rng.normal(0, 1, len(pairs)), rng.uniform(0.65, 1, len(pairs)))
+        }
+        
+        engines = [AlertEngine(), AlertEngine()]
+        for batch_engine in engines:
+            logger.disable(__name__)
+            for pair in pairs:
+                batch_engine.add_rule(AlertRuleBuilder.mean_reversion_entry_alert(pair))
+                batch_engine.add_rule(AlertRuleBuilder.correlation_break_alert(pair))
+        
+        # Previous approach: per pair, scan all rules and check the pair's own
+        start = time.perf_counter()
+        looped = []
+        for pair, values in metrics.items():
+            for rule in engines[0].rules.values():
+                if rule.symbol == pair:
+                    alert = await engines[0].check_rule(rule, values[rule.metric])
+                    if alert:
+                        looped.append(alert.rule_id)
+        loop_ms = (time.perf_counter() - start) * 1000
+        
+        await engines[1].evaluate({})  # Index is built on the first call
+        start = time.perf_counter()
+        batched = [alert.rule_id for alert in await engines[1].evaluate(metrics)]
+        batch_ms = (time.perf_counter() - start) * 1000
+        logger.enable(__name__)
+        
+        assert sorted(looped) == sorted(batched)
+        print(f"{len(pairs)} pairs, {len(engines[1].rules)} rules, {len(batched)} alerts: "
+              f"per-pair check_rule {loop_ms:.1f}ms, evaluate {batch_ms:.1f}ms")
     
     asyncio.run(test())
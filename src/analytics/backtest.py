@@ -0,0 +1,424 @@
+"""
+Vectorized historical backtest of the PositionSimulator strategy.
+
+PositionSimulator is driven one event at a time (check_entry_signal, then
+check_exit_signal, per analytics update). SpreadBacktester replays the same
+rules over whole z-score / spread arrays:
+
+- With numba installed, one compiled pass runs the per-bar state machine
+  (_scan_bars) without any Python objects per bar
+- Otherwise entry and exit timing, which do not depend on capital (the PnL
+  checks compare size * return against size * threshold), come from
+  next-entry and next-z-exit indices precomputed in O(n), and only the bars
+  between entry and z-score exit are scanned (vectorized) for a stop loss
+  or take profit
+- ClosedTrade records and the capital path are built in bulk afterwards
+
+The result is the same ClosedTrade records, final simulator state and
+get_performance_metrics() output as feeding every bar through a fresh
+PositionSimulator, including the per-bar order (entry check before exit
+check, so a trade can close on its entry bar) and skipping bars whose
+z-score is NaN.
+"""
+
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from analytics.pnl_tracker import ClosedTrade, Position, PositionSimulator
+from analytics.statistical import StatisticalAnalytics
+
+try:
+    from numba import njit
+except ImportError:  # Optional: compiled bar loop, NumPy trade scan otherwise
+    njit = None
+
+
+@dataclass
+class BacktestResult:
+    """Trades and final state of a backtest run."""
+    trades: List[ClosedTrade]
+    simulator: PositionSimulator  # Final state, as if driven bar by bar
+    entry_index: np.ndarray  # Bar index of each trade's entry
+    exit_index: np.ndarray  # Bar index of each trade's exit
+    n_bars: int
+    metrics: dict = field(default_factory=dict)
+    
+    def get_trade_history(self) -> pd.DataFrame:
+        return self.simulator.get_trade_history()
+
+
+class SpreadBacktester:
+    """Replays PositionSimulator entry/exit/stop/take-profit rules on arrays."""
+    
+    def __init__(
+        self,
+        initial_capital: float = 10000,
+        entry_threshold: float = 2.0,
+        exit_threshold: float = 0.2,
+        position_size_pct: float = 0.10,
+        stop_loss_pct: float = 0.05,
+        take_profit_pct: float = 0.10
+    ):
+        """Same parameters and defaults as PositionSimulator."""
+        self.initial_capital = initial_capital
+        self.entry_threshold = entry_threshold
+        self.exit_threshold = exit_threshold
+        self.position_size_pct = position_size_pct
+        self.stop_loss_pct = stop_loss_pct
+        self.take_profit_pct = take_profit_pct
+    
+    def new_simulator(self) -> PositionSimulator:
+        return PositionSimulator(
+            initial_capital=self.initial_capital,
+            entry_threshold=self.entry_threshold,
+            exit_threshold=self.exit_threshold,
+            position_size_pct=self.position_size_pct,
+            stop_loss_pct=self.stop_loss_pct,
+            take_profit_pct=self.take_profit_pct
+        )
+    
+    def run(
+        self,
+        zscore: np.ndarray,
+        spread: np.ndarray,
+        timestamps,
+        price_1: Optional[np.ndarray] = None,
+        price_2: Optional[np.ndarray] = None,
+        hedge_ratio=np.nan,
+        compiled: Optional[bool] = None
+    ) -> BacktestResult:
+        """
+        Backtest over aligned per-bar arrays.
+        
+        Args:
+            zscore: Spread z-score per bar (NaN bars are skipped, as live)
+            spread: Spread value per bar
+            timestamps: Bar times (datetime64 array, DatetimeIndex or epoch ms ints)
+            price_1, price_2: Leg prices (only recorded on Position)
+            hedge_ratio: Scalar or per-bar hedge ratio (only recorded on Position)
+            compiled: Use the numba bar loop (default: if numba is installed)
+        
+        Returns:
+            BacktestResult with ClosedTrade records, final simulator and
+            get_performance_metrics() output
+        """
+        z = np.ascontiguousarray(zscore, dtype=np.float64)
+        s = np.ascontiguousarray(spread, dtype=np.float64)
+        n = len(z)
+        if len(s) != n:
+            raise ValueError("zscore and spread must have the same length")
+        
+        if compiled is None:
+            compiled = _scan_bars_compiled is not None
+        if compiled and _scan_bars_compiled is None:
+            raise ImportError("numba is required for compiled=True")
+        
+        scan = _scan_bars_compiled if compiled else self._scan_trades
+        trades, open_state = scan(
+            z, s, self.entry_threshold, self.exit_threshold, self.position_size_pct,
+            self.stop_loss_pct, self.take_profit_pct, float(self.initial_capital)
+        )
+        
+        return self._build_result(
+            z, s, trades, open_state, self._to_datetime64(timestamps),
+            price_1, price_2, np.broadcast_to(np.asarray(hedge_ratio, dtype=np.float64), (n,))
+        )
+    
+    @staticmethod
+    def _next_true(mask: np.ndarray) -> np.ndarray:
+        """next[i] = smallest j >= i with mask[j], or len(mask) if none."""
+        n = len(mask)
+        idx = np.where(mask, np.arange(n), n)
+        return np.minimum.accumulate(idx[::-1])[::-1]
+    
+    @staticmethod
+    def _scan_trades(z, s, entry_threshold, exit_threshold, size_pct, stop_pct, take_profit_pct, capital):
+        """
+        NumPy trade scan (used without numba); same outputs as _scan_bars.
+        
+        Jumps from one entry to the next with precomputed next-entry and
+        next-z-exit indices and scans each trade's bars for stop loss / take
+        profit in one vectorized step, so Python work is per trade, not per bar.
+        """
+        n = len(z)
+        valid = ~np.isnan(z)
+        abs_z = np.abs(z)
+        reverted = abs_z < exit_threshold
+        next_entry = SpreadBacktester._next_true(abs_z > entry_threshold)
+        next_z_exit = {
+            1: SpreadBacktester._next_true(valid & (reverted | (z > 0))),
+            -1: SpreadBacktester._next_true(valid & (reverted | (z < 0)))
+        }
+        
+        trades = []
+        open_state = np.array([0.0, -1.0, 0.0, 0.0, 0.0, 0.0])
+        i = 0
+        
+        while i < n:
+            i = int(next_entry[i])
+            if i >= n:
+                break
+            
+            direction = -1 if z[i] > 0 else 1
+            size = capital * size_pct
+            z_exit = int(next_z_exit[direction][i])
+            
+            # PnL on the bars up to the z-score exit, exactly as _calculate_pnl
+            end = min(z_exit, n - 1) + 1
+            change = s[i:end] - s[i]
+            pnl = size * (change / s[i]) if direction == 1 else size * (-change / s[i])
+            
+            checked = valid[i:end]
+            hit = checked & ((pnl < -(size * stop_pct)) | (pnl > (size * take_profit_pct)))
+            if hit.any():
+                exit_i = i + int(np.argmax(hit))
+            else:
+                exit_i = z_exit if z_exit < n else -1
+            
+            # Extremes over every checked bar up to and including the exit
+            span = exit_i - i + 1 if exit_i >= 0 else len(pnl)
+            tracked = pnl[:span][checked[:span] & ~np.isnan(pnl[:span])]
+            favorable = max(0.0, float(tracked.max())) if len(tracked) else 0.0
+            adverse = min(0.0, float(tracked.min())) if len(tracked) else 0.0
+            
+            if exit_i < 0:
+                open_state = np.array([1.0, i, direction, size, favorable, adverse])
+                break
+            
+            trade_pnl = float(pnl[exit_i - i])
+            trades.append((i, exit_i, direction, size, trade_pnl, favorable, adverse))
+            capital += trade_pnl
+            i = exit_i + 1
+        
+        columns = np.array(trades, dtype=np.float64).reshape(-1, 7)
+        return columns, open_state
+    
+    def _build_result(self, z, s, trades, open_state, times, price_1, price_2, hedge) -> BacktestResult:
+        """Turn scanned trades into ClosedTrade records and simulator state."""
+        sim = self.new_simulator()
+        entries = trades[:, 0].astype(np.int64)
+        exits = trades[:, 1].astype(np.int64)
+        directions, sizes, pnls = trades[:, 2], trades[:, 3], trades[:, 4]
+        n_trades = len(pnls)
+        
+        entry_times = times[entries].tolist()
+        exit_times = times[exits].tolist()
+        pnl_percent = (pnls / sizes) * 100
+        
+        sim.closed_trades = [
+            ClosedTrade(
+                entry_time=entry_times[k],
+                exit_time=exit_times[k],
+                entry_zscore=float(z[entries[k]]),
+                exit_zscore=float(z[exits[k]]),
+                direction='long' if directions[k] > 0 else 'short',
+                size=float(sizes[k]),
+                pnl=float(pnls[k]),
+                pnl_percent=float(pnl_percent[k]),
+                hold_duration=(exit_times[k] - entry_times[k]).total_seconds(),
+                max_favorable=float(trades[k, 5]),
+                max_adverse=float(trades[k, 6])
+            )
+            for k in range(n_trades)
+        ]
+        
+        # Capital path: sequential sums, as repeated += in _close_position
+        capital = np.cumsum(np.r_[float(self.initial_capital), pnls])
+        peak = np.maximum.accumulate(capital)
+        drawdown = (peak[1:] - capital[1:]) / peak[1:]
+        
+        sim.current_capital = float(capital[-1])
+        sim.total_pnl = float(np.cumsum(np.r_[0.0, pnls])[-1])
+        sim.peak_capital = float(peak[-1])
+        sim.max_drawdown = max(0.0, float(drawdown.max())) if n_trades else 0.0
+        sim.win_count = int((pnls > 0).sum())
+        sim.loss_count = n_trades - sim.win_count
+        
+        in_position, i, direction, size, favorable, adverse = open_state
+        if in_position:
+            i = int(i)
+            sim.current_position = Position(
+                entry_time=times[i].tolist(),
+                entry_zscore=float(z[i]),
+                entry_spread=float(s[i]),
+                entry_price_1=float(price_1[i]) if price_1 is not None else np.nan,
+                entry_price_2=float(price_2[i]) if price_2 is not None else np.nan,
+                direction='long' if direction > 0 else 'short',
+                size=float(size),
+                hedge_ratio=float(hedge[i])
+            )
+        if n_trades or in_position:
+            sim.max_unrealized_profit = float(favorable) if in_position else float(trades[-1, 5])
+            sim.max_unrealized_loss = float(adverse) if in_position else float(trades[-1, 6])
+        
+        return BacktestResult(
+            trades=sim.closed_trades,
+            simulator=sim,
+            entry_index=entries,
+            exit_index=exits,
+            n_bars=len(z),
+            metrics=sim.get_performance_metrics()
+        )
+    
+    @staticmethod
+    def _to_datetime64(timestamps) -> np.ndarray:
+        """Bar times as naive datetime64[us] (UTC for tz-aware input)."""
+        values = np.asarray(timestamps)
+        if np.issubdtype(values.dtype, np.integer):
+            return values.astype('datetime64[ms]').astype('datetime64[us]')
+        
+        index = pd.DatetimeIndex(timestamps)
+        if index.tz is not None:
+            index = index.tz_convert('UTC').tz_localize(None)
+        return index.values.astype('datetime64[us]')
+    
+    @staticmethod
+    def signals_from_prices(
+        prices_1,
+        prices_2,
+        hedge_ratio: float,
+        zscore_window: int = 60,
+        min_periods: int = 20
+    ):
+        """
+        Spread and rolling z-score arrays for a fixed hedge ratio.
+        
+        Same definitions as the live path (calculate_spread / calculate_zscore),
+        e.g. for close prices from get_ohlcv or get_pair_ohlcv.
+        """
+        series_1 = pd.Series(np.asarray(prices_1, dtype=np.float64))
+        series_2 = pd.Series(np.asarray(prices_2, dtype=np.float64))
+        spread = StatisticalAnalytics.calculate_spread(series_1, series_2, hedge_ratio)
+        zscore = StatisticalAnalytics.calculate_zscore(spread, window=zscore_window, min_periods=min_periods)
+        return spread.values, zscore.values
+
+
+def _scan_bars(z, s, entry_threshold, exit_threshold, size_pct, stop_pct, take_profit_pct, capital):
+    """
+    Bar-by-bar state machine mirroring check_entry_signal / check_exit_signal.
+    
+    Written for numba (compiled when available). Returns a (trades x 7)
+    array of entry index, exit index, direction (+1 long / -1 short), size,
+    PnL, max favorable and max adverse, and the open position state
+    [in_position, entry index, direction, size, favorable, adverse].
+    """
+    n = z.shape[0]
+    trades = np.empty((64, 7))
+    n_trades = 0
+    in_position = False
+    entry_i = -1
+    direction = 0
+    size = 0.0
+    entry_spread = 0.0
+    favorable = 0.0
+    adverse = 0.0
+    
+    for t in range(n):
+        zt = z[t]
+        if zt != zt:  # NaN z-score: bar skipped
+            continue
+        
+        if not in_position and abs(zt) > entry_threshold:
+            in_position = True
+            entry_i = t
+            direction = -1 if zt > 0 else 1
+            size = capital * size_pct
+            entry_spread = s[t]
+            favorable = 0.0
+            adverse = 0.0
+        
+        if not in_position:
+            continue
+        
+        change = s[t] - entry_spread
+        if direction == 1:
+            pnl = size * (change / entry_spread)
+        else:
+            pnl = size * (-change / entry_spread)
+        
+        if pnl > favorable:
+            favorable = pnl
+        if pnl < adverse:
+            adverse = pnl
+        
+        if abs(zt) < exit_threshold or (direction == 1 and zt > 0) or (direction == -1 and zt < 0) \
+                or pnl < -(size * stop_pct) or pnl > size * take_profit_pct:
+            if n_trades == trades.shape[0]:
+                grown = np.empty((trades.shape[0] * 2, 7))
+                grown[:n_trades] = trades
+                trades = grown
+            
+            trades[n_trades, 0] = entry_i
+            trades[n_trades, 1] = t
+            trades[n_trades, 2] = direction
+            trades[n_trades, 3] = size
+            trades[n_trades, 4] = pnl
+            trades[n_trades, 5] = favorable
+            trades[n_trades, 6] = adverse
+            n_trades += 1
+            capital += pnl
+            in_position = False
+    
+    open_state = np.zeros(6)
+    if in_position:
+        open_state[0] = 1.0
+        open_state[1] = entry_i
+        open_state[2] = direction
+        open_state[3] = size
+        open_state[4] = favorable
+        open_state[5] = adverse
+    
+    return trades[:n_trades].copy(), open_state
+
+
+_scan_bars_compiled = njit(cache=True)(_scan_bars) if njit is not None else None
+
+
+if __name__ == "__main__":
+    import time
+    from loguru import logger
+    
+    logger.remove()  # PositionSimulator logs every trade
+    
+    np.random.seed(42)
+    n = 20_000
+    times = np.datetime64('2024-01-01T00:00:00', 'ms') + np.arange(n) * 1000
+    prices_2 = 100 + np.cumsum(np.random.randn(n) * 0.1)
+    ou = np.zeros(n)
+    for t in range(1, n):
+        ou[t] = 0.97 * ou[t - 1] + np.random.randn() * 0.3
+    prices_1 = 1.5 * prices_2 + 20 + ou
+    
+    spread, zscore = SpreadBacktester.signals_from_prices(prices_1, prices_2, hedge_ratio=1.5)
+    backtester = SpreadBacktester()
+    
+    # Reference: drive PositionSimulator bar by bar, as main.py does live
+    start = time.perf_counter()
+    simulator = backtester.new_simulator()
+    py_times = times.astype('datetime64[us]').tolist()
+    for k in range(n):
+        if np.isnan(zscore[k]):
+            continue
+        simulator.check_entry_signal(zscore[k], spread[k], prices_1[k], prices_2[k], 1.5, py_times[k])
+        simulator.check_exit_signal(zscore[k], spread[k], prices_1[k], prices_2[k], py_times[k])
+    loop_s = time.perf_counter() - start
+    
+    state = lambda sim: (sim.current_position, sim.max_unrealized_profit, sim.max_unrealized_loss)
+    paths = [False, True] if _scan_bars_compiled is not None else [False]
+    for compiled in paths:
+        backtester.run(zscore[:100], spread[:100], times[:100], compiled=compiled)  # JIT warm-up
+        start = time.perf_counter()
+        result = backtester.run(zscore, spread, times, prices_1, prices_2, hedge_ratio=1.5, compiled=compiled)
+        vector_s = time.perf_counter() - start
+        
+        assert result.trades == simulator.closed_trades, "trade records differ"
+        assert result.metrics == simulator.get_performance_metrics(), "metrics differ"
+        assert state(result.simulator) == state(simulator), "final state differs"
+        name = 'numba' if compiled else 'numpy'
+        print(f"{name}: {len(result.trades)} trades, identical to PositionSimulator, {n / vector_s:,.0f} bars/s")
+    
+    print(f"PositionSimulator loop: {n / loop_s:,.0f} bars/s")
+    print({k: round(v, 3) for k, v in result.metrics.items()})
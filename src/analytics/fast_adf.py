@@ -0,0 +1,159 @@
+"""
+Fast Augmented Dickey-Fuller test.
+
+statsmodels' adfuller searches lags by AIC (one regression per candidate
+lag) and interpolates MacKinnon p-values on every call. For the analytics
+cycle a fixed lag is enough, so this module runs one least-squares
+regression per series and looks p-values and critical values up in tables
+built once per regression type. Several equal-length spreads can be tested
+in one batched call.
+
+Results match adfuller(x, maxlag=lag, autolag=None, regression=...) to
+floating-point precision for the statistic and critical values and to
+~1e-5 for the p-value (linear interpolation of the MacKinnon surface).
+"""
+
+from functools import lru_cache
+from typing import Dict, List
+
+import numpy as np
+from statsmodels.tsa.adfvalues import mackinnoncrit, mackinnonp
+
+
+class FastADF:
+    """Fixed-lag ADF test with cached MacKinnon tables."""
+    
+    REGRESSIONS = ('c', 'ct', 'n')
+    
+    # Test-statistic grid for the p-value table; outside it p is 0 or 1
+    TABLE_MIN = -20.0
+    TABLE_MAX = 5.0
+    TABLE_STEP = 0.005
+    
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _pvalue_table(regression: str):
+        # Built on first use (~0.5s), then shared by every test in the process
+        grid = np.arange(FastADF.TABLE_MIN, FastADF.TABLE_MAX + FastADF.TABLE_STEP, FastADF.TABLE_STEP)
+        pvalues = np.array([mackinnonp(tau, regression=regression, N=1) for tau in grid])
+        return grid, pvalues
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def critical_values(regression: str, nobs: int) -> Dict[str, float]:
+        """MacKinnon (2010) 1%/5%/10% critical values for a sample size."""
+        crit = mackinnoncrit(N=1, regression=regression, nobs=nobs)
+        return {'1%': float(crit[0]), '5%': float(crit[1]), '10%': float(crit[2])}
+    
+    @staticmethod
+    def pvalues(statistics: np.ndarray, regression: str = 'c') -> np.ndarray:
+        """Vectorized MacKinnon p-values by table interpolation."""
+        grid, table = FastADF._pvalue_table(regression)
+        return np.interp(statistics, grid, table, left=0.0, right=1.0)
+    
+    @staticmethod
+    def statistics(
+        series: np.ndarray,
+        lag: int = 1,
+        regression: str = 'c'
+    ) -> np.ndarray:
+        """
+        ADF t-statistics for a batch of series.
+        
+        Args:
+            series: (B x T) array of equal-length series (or one 1-D series)
+            lag: Number of lagged differences
+            regression: 'c' (constant), 'ct' (constant + trend) or 'n' (none)
+        
+        Returns:
+            (B,) array of test statistics
+        """
+        if regression not in FastADF.REGRESSIONS:
+            raise ValueError(f"Invalid regression: {regression}")
+        
+        series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+        diff = np.diff(series, axis=1)
+        n_batch, n_diff = diff.shape
+        nobs = n_diff - lag
+        
+        # Design matrix per series: y_{t-1}, Δy_{t-1} .. Δy_{t-lag}, deterministic terms
+        columns = [series[:, lag:-1]]
+        columns += [diff[:, lag - i:n_diff - i] for i in range(1, lag + 1)]
+        if regression in ('c', 'ct'):
+            columns.append(np.ones((n_batch, nobs)))
+        if regression == 'ct':
+            columns.append(np.broadcast_to(np.arange(1, nobs + 1, dtype=np.float64), (n_batch, nobs)))
+        
+        X = np.stack(columns, axis=2)  # (B, nobs, k)
+        y = diff[:, lag:]  # (B, nobs)
+        k = X.shape[2]
+        
+        # Least squares via batched QR: beta = R⁻¹ Qᵀy, Var(beta) = σ² R⁻¹R⁻ᵀ
+        Q, R = np.linalg.qr(X)
+        R_inv = np.linalg.inv(R)
+        beta = np.einsum('bij,bj->bi', R_inv, np.einsum('bji,bj->bi', Q, y))
+        
+        resid = y - np.einsum('bij,bj->bi', X, beta)
+        sigma2 = np.einsum('bi,bi->b', resid, resid) / (nobs - k)
+        var_gamma = sigma2 * np.einsum('bj,bj->b', R_inv[:, 0, :], R_inv[:, 0, :])
+        
+        return beta[:, 0] / np.sqrt(var_gamma)
+    
+    @staticmethod
+    def test(
+        series: np.ndarray,
+        lag: int = 1,
+        regression: str = 'c',
+        significance: float = 0.05
+    ) -> Dict[str, any]:
+        """
+        Fixed-lag ADF test for one series, in the adf_test result format.
+        """
+        return FastADF.test_batch(np.atleast_2d(series), lag, regression, significance)[0]
+    
+    @staticmethod
+    def test_batch(
+        series: np.ndarray,
+        lag: int = 1,
+        regression: str = 'c',
+        significance: float = 0.05
+    ) -> List[Dict[str, any]]:
+        """Fixed-lag ADF test for each row of a (B x T) array."""
+        series = np.atleast_2d(np.asarray(series, dtype=np.float64))
+        stats = FastADF.statistics(series, lag, regression)
+        pvalues = FastADF.pvalues(stats, regression)
+        nobs = series.shape[1] - 1 - lag
+        critical_values = FastADF.critical_values(regression, nobs)
+        
+        return [
+            {
+                'statistic': float(stat),
+                'p_value': float(p),
+                'is_stationary': bool(p < significance),
+                'critical_values': dict(critical_values),
+                'used_lag': lag,
+                'n_obs': nobs
+            }
+            for stat, p in zip(stats, pvalues)
+        ]
+
+
+if __name__ == "__main__":
+    import warnings
+    from statsmodels.tsa.stattools import adfuller
+    
+    warnings.filterwarnings('ignore', category=FutureWarning)
+    
+    np.random.seed(42)
+    ar = np.zeros((8, 500))
+    for t in range(1, 500):
+        ar[:, t] = np.linspace(0.5, 1.0, 8) * ar[:, t - 1] + np.random.randn(8)
+    
+    for regression in FastADF.REGRESSIONS:
+        fast = FastADF.test_batch(ar, lag=2, regression=regression)
+        worst_stat = worst_p = 0.0
+        for row, result in zip(ar, fast):
+            ref = adfuller(row, maxlag=2, autolag=None, regression=regression)
+            worst_stat = max(worst_stat, abs(ref[0] - result['statistic']))
+            worst_p = max(worst_p, abs(ref[1] - result['p_value']))
+        print(f"regression={regression}: max |Δstat|={worst_stat:.2e}, max |Δp|={worst_p:.2e}")
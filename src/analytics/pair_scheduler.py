@@ -0,0 +1,284 @@
+"""
+Multi-pair analytics scheduling.
+Runs the CPU-heavy part of each pair's analytics cycle in a thread or process
+pool so a slow pair (e.g. a statsmodels ADF on a long window) cannot delay
+the others.
+"""
+
+import asyncio
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from analytics.statistical import StatisticalAnalytics
+
+
+def compute_pair_statistics(
+    prices_1: np.ndarray,
+    prices_2: np.ndarray,
+    hedge_ratio: Optional[float] = None,
+    r_squared: Optional[float] = None,
+    corr_window: int = 100,
+    adf_method: str = 'statsmodels',
+    adf_lag: Optional[int] = None
+) -> Optional[dict]:
+    """
+    Pure per-pair statistics; safe to run in a worker thread or process.
+    
+    Args:
+        prices_1, prices_2: Aligned price arrays (snapshots, not live views)
+        hedge_ratio: Precomputed hedge ratio (e.g. rolling OLS); fitted by
+            OLS when None
+        r_squared: R² accompanying a precomputed hedge ratio
+        corr_window: Rolling correlation window
+        adf_method: 'statsmodels' or 'fast' (see StatisticalAnalytics.adf_test)
+        adf_lag: Max lag (statsmodels) or fixed lag (fast)
+    
+    Returns:
+        Dict with hedge_ratio, r_squared, spread (ndarray), correlation,
+        adf, half_life and the latest prices, or None if no hedge ratio
+    """
+    series_1 = pd.Series(prices_1)
+    series_2 = pd.Series(prices_2)
+    
+    if hedge_ratio is None:
+        hedge_ratio, r_squared, _ = StatisticalAnalytics.calculate_hedge_ratio(series_1, series_2)
+    
+    if pd.isna(hedge_ratio):
+        return None
+    
+    spread = StatisticalAnalytics.calculate_spread(series_1, series_2, hedge_ratio)
+    corr_series = StatisticalAnalytics.rolling_correlation(series_1, series_2, window=corr_window)
+    
+    return {
+        'hedge_ratio': float(hedge_ratio),
+        'r_squared': r_squared,
+        'spread': spread.values,
+        'correlation': corr_series.iloc[-1] if not corr_series.empty else None,
+        'adf': StatisticalAnalytics.adf_test(spread, max_lag=adf_lag, method=adf_method),
+        'half_life': StatisticalAnalytics.calculate_half_life(spread),
+        'price_1': float(prices_1[-1]),
+        'price_2': float(prices_2[-1])
+    }
+
+
+@dataclass
+class PairSchedule:
+    """Scheduling state and accounting for one pair."""
+    symbol_1: str
+    symbol_2: str
+    last_completed: float = 0.0  # time.monotonic() of the last applied result
+    in_flight: Optional[asyncio.Future] = field(default=None, repr=False)
+    runs: int = 0
+    skipped: int = 0
+    deadline_misses: int = 0
+    errors: int = 0
+    last_duration_ms: float = 0.0
+    
+    @property
+    def pair(self) -> str:
+        return f"{self.symbol_1}-{self.symbol_2}"
+    
+    @property
+    def busy(self) -> bool:
+        return self.in_flight is not None and not self.in_flight.done()
+    
+    def to_dict(self) -> dict:
+        return {
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'deadline_misses': self.deadline_misses,
+            'errors': self.errors,
+            'last_duration_ms': self.last_duration_ms,
+            'staleness_s': time.monotonic() - self.last_completed if self.last_completed else None
+        }
+
+
+class PairAnalyticsScheduler:
+    """
+    Per-cycle scheduler for many pairs.
+    
+    Each cycle:
+    - Pairs are ordered by staleness (longest since last result first)
+    - prepare() snapshots a pair's inputs on the event loop
+    - compute() runs in the pool; at most max_workers pairs run at once and
+      the next pair starts as soon as a worker frees up
+    - apply() runs on the event loop as soon as that pair's result arrives,
+      independent of the other pairs
+    - Results not back within the cycle deadline are discarded and counted
+      as deadline misses
+    - A pair whose previous job is still running, or that did not get a
+      worker before the deadline, is counted as skipped; staleness ordering
+      puts it first next cycle
+    """
+    
+    EXECUTORS = ('thread', 'process')
+    
+    def __init__(
+        self,
+        pairs: List[Tuple[str, str]],
+        prepare: Callable[[str, str], Optional[tuple]],
+        compute: Callable[..., Any],
+        apply: Callable[[str, str, Any], Awaitable[None]],
+        executor: str = 'thread',
+        max_workers: int = 4,
+        deadline: float = 4.0
+    ):
+        """
+        Args:
+            pairs: (symbol_1, symbol_2) tuples
+            prepare: Returns compute() arguments for a pair, or None to skip
+                it (e.g. not enough data yet)
+            compute: Pure function run in the pool (module-level for 'process')
+            apply: Coroutine consuming a pair's compute() result
+            executor: 'thread' or 'process'
+            max_workers: Pool size and max concurrently running pairs
+            deadline: Seconds a cycle waits for results
+        """
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Invalid executor: {executor}")
+        
+        self.schedules = [PairSchedule(s1, s2) for s1, s2 in pairs]
+        self.prepare = prepare
+        self.compute = compute
+        self.apply = apply
+        self.max_workers = max_workers
+        self.deadline = deadline
+        
+        pool_cls = ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor
+        self.executor: Executor = pool_cls(max_workers=max_workers)
+        self.cycles = 0
+    
+    async def run_cycle(self):
+        """Run one analytics cycle over all pairs."""
+        loop = asyncio.get_running_loop()
+        self.cycles += 1
+        started = time.monotonic()
+        
+        # Stalest first; pairs still running from an earlier cycle sit this one out
+        queue = []
+        for schedule in sorted(self.schedules, key=lambda s: s.last_completed):
+            if schedule.busy:
+                schedule.skipped += 1
+            else:
+                queue.append(schedule)
+        
+        capacity = self.max_workers - sum(1 for s in self.schedules if s.busy)
+        jobs: Dict[asyncio.Future, Tuple[PairSchedule, float]] = {}  # future -> (pair, submit time)
+        pending = set()
+        
+        while queue or pending:
+            # Start pairs as workers free up
+            while queue and capacity > 0:
+                schedule = queue.pop(0)
+                args = self.prepare(schedule.symbol_1, schedule.symbol_2)
+                if args is None:
+                    continue
+                
+                future = loop.run_in_executor(self.executor, self.compute, *args)
+                future.add_done_callback(self._on_job_done)
+                schedule.in_flight = future
+                jobs[future] = (schedule, time.monotonic())
+                pending.add(future)
+                capacity -= 1
+            
+            remaining = started + self.deadline - time.monotonic()
+            if not pending or remaining <= 0:
+                break
+            
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for future in done:
+                capacity += 1
+                await self._finish(*jobs[future], future)
+        
+        # Pairs that never got a worker before the deadline
+        for schedule in queue:
+            schedule.skipped += 1
+        
+        for future in pending:
+            schedule, _ = jobs[future]
+            schedule.deadline_misses += 1
+            logger.warning(f"Analytics for {schedule.pair} missed the {self.deadline:.1f}s deadline")
+    
+    async def _finish(self, schedule: PairSchedule, submitted: float, future: asyncio.Future):
+        """Apply one pair's result."""
+        schedule.last_duration_ms = (time.monotonic() - submitted) * 1000
+        
+        if future.exception() is not None:
+            schedule.errors += 1
+            logger.error(f"Analytics for {schedule.pair} failed: {future.exception()}")
+            return
+        
+        try:
+            result = future.result()
+            if result is not None:
+                await self.apply(schedule.symbol_1, schedule.symbol_2, result)
+        except Exception as e:
+            schedule.errors += 1
+            logger.error(f"Applying analytics for {schedule.pair} failed: {e}")
+            return
+        
+        schedule.runs += 1
+        schedule.last_completed = time.monotonic()
+    
+    @staticmethod
+    def _on_job_done(future: asyncio.Future):
+        # Retrieve exceptions of jobs abandoned after a deadline miss
+        if not future.cancelled():
+            future.exception()
+    
+    def get_stats(self) -> dict:
+        """Per-pair and total scheduling counters."""
+        pairs = {s.pair: s.to_dict() for s in self.schedules}
+        return {
+            'cycles': self.cycles,
+            'busy': sum(1 for s in self.schedules if s.busy),
+            'runs': sum(s.runs for s in self.schedules),
+            'skipped': sum(s.skipped for s in self.schedules),
+            'deadline_misses': sum(s.deadline_misses for s in self.schedules),
+            'errors': sum(s.errors for s in self.schedules),
+            'pairs': pairs
+        }
+    
+    def shutdown(self):
+        """Stop the pool without waiting for abandoned jobs."""
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+if __name__ == "__main__":
+    import itertools
+    
+    np.random.seed(42)
+    symbols = ['btcusdt', 'ethusdt', 'bnbusdt', 'solusdt', 'adausdt']
+    base = np.cumsum(np.random.randn(500)) + 100
+    prices = {s: base * (i + 1) + np.random.randn(500) for i, s in enumerate(symbols)}
+    
+    def prepare(s1, s2):
+        return (prices[s1], prices[s2])
+    
+    async def apply(s1, s2, result):
+        print(f"{s1}-{s2}: beta={result['hedge_ratio']:.3f}, "
+              f"adf p={result['adf'].get('p_value', float('nan')):.3f}")
+    
+    async def test():
+        scheduler = PairAnalyticsScheduler(
+            list(itertools.combinations(symbols, 2)), prepare, compute_pair_statistics, apply,
+            max_workers=4, deadline=2.0
+        )
+        for _ in range(3):
+            start = time.perf_counter()
+            await scheduler.run_cycle()
+            print(f"Cycle took {(time.perf_counter() - start) * 1000:.0f}ms")
+        
+        stats = scheduler.get_stats()
+        print({k: v for k, v in stats.items() if k != 'pairs'})
+        scheduler.shutdown()
+    
+    asyncio.run(test())
@@ -0,0 +1,279 @@
+"""
+Parallel parameter sweep for the PositionSimulator strategy.
+
+Evaluates every combination of entry/exit thresholds, stop loss, take profit
+and z-score window with SpreadBacktester in a process pool:
+
+- Leg prices and bar times are copied once into shared memory; workers
+  attach to that block in their initializer, so tasks only carry parameters
+- Tasks are chunks of combinations sharing one z-score window, so each
+  worker computes a window's spread/z-score once per chunk
+- Progress (combinations done, combinations/s, bars/s) is logged as chunks
+  complete; results come back as a table ranked by Sharpe ratio, profit
+  factor and max drawdown
+"""
+
+import itertools
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+
+from analytics.backtest import SpreadBacktester
+from analytics.statistical import StatisticalAnalytics
+
+# Shared arrays of the current worker process (set by _init_worker)
+_worker_state: Dict = {}
+
+
+def _init_worker(shm_name: str, n_bars: int, hedge_ratio: float, initial_capital: float,
+                 position_size_pct: float, min_periods: int):
+    """Pool initializer: attach to the shared price/time block."""
+    shm = shared_memory.SharedMemory(name=shm_name)  # Kept open for the worker's lifetime
+    
+    data = np.ndarray((3, n_bars), dtype=np.float64, buffer=shm.buf)
+    _worker_state.update(
+        shm=shm,
+        price_1=data[0],
+        price_2=data[1],
+        time_ms=data[2].view(np.int64),
+        hedge_ratio=hedge_ratio,
+        initial_capital=initial_capital,
+        position_size_pct=position_size_pct,
+        min_periods=min_periods
+    )
+
+
+def _run_chunk(zscore_window: int, combos: List[Tuple[float, float, float, float]]) -> List[dict]:
+    """Backtest (entry, exit, stop, take profit) combinations for one window."""
+    state = _worker_state
+    spread, zscore = SpreadBacktester.signals_from_prices(
+        state['price_1'], state['price_2'], state['hedge_ratio'],
+        zscore_window=zscore_window, min_periods=min(state['min_periods'], zscore_window)
+    )
+    
+    return evaluate_combinations(
+        zscore, spread, state['time_ms'], zscore_window, combos,
+        state['initial_capital'], state['position_size_pct']
+    )
+
+
+def evaluate_combinations(
+    zscore: np.ndarray,
+    spread: np.ndarray,
+    time_ms: np.ndarray,
+    zscore_window: int,
+    combos: List[Tuple[float, float, float, float]],
+    initial_capital: float,
+    position_size_pct: float
+) -> List[dict]:
+    """Backtest combinations on one z-score series; one result row each."""
+    results = []
+    for entry, exit_, stop, take_profit in combos:
+        backtester = SpreadBacktester(
+            initial_capital=initial_capital,
+            entry_threshold=entry,
+            exit_threshold=exit_,
+            position_size_pct=position_size_pct,
+            stop_loss_pct=stop,
+            take_profit_pct=take_profit
+        )
+        metrics = backtester.run(zscore, spread, time_ms).metrics
+        results.append({
+            'zscore_window': zscore_window,
+            'entry_threshold': entry,
+            'exit_threshold': exit_,
+            'stop_loss_pct': stop,
+            'take_profit_pct': take_profit,
+            **{key: float(metrics.get(key, 0.0)) for key in ParameterSweep.METRICS}
+        })
+    return results
+
+
+class ParameterSweep:
+    """Grid search over PositionSimulator parameters and z-score windows."""
+    
+    METRICS = (
+        'sharpe_ratio', 'profit_factor', 'max_drawdown', 'total_return',
+        'total_trades', 'win_rate', 'total_pnl'
+    )
+    
+    # Ranking: best Sharpe first, then profit factor, then smallest drawdown
+    RANK_BY = (('sharpe_ratio', False), ('profit_factor', False), ('max_drawdown', True))
+    
+    def __init__(
+        self,
+        entry_thresholds: Sequence[float] = (1.5, 2.0, 2.5, 3.0),
+        exit_thresholds: Sequence[float] = (0.0, 0.2, 0.5),
+        stop_loss_pcts: Sequence[float] = (0.02, 0.05, 0.10),
+        take_profit_pcts: Sequence[float] = (0.05, 0.10, 0.20),
+        zscore_windows: Sequence[int] = (30, 60, 120),
+        initial_capital: float = 10000,
+        position_size_pct: float = 0.10,
+        min_periods: int = 20,
+        max_workers: Optional[int] = None,
+        chunk_size: int = 32,
+        progress_interval: float = 2.0
+    ):
+        """
+        Args:
+            entry_thresholds, exit_thresholds: |z| levels (combinations with
+                exit >= entry are skipped)
+            stop_loss_pcts, take_profit_pcts: Fractions of position size
+            zscore_windows: Rolling z-score windows in bars
+            initial_capital, position_size_pct: Fixed for every combination
+            min_periods: Minimum bars for a z-score (capped at the window)
+            max_workers: Process pool size (None = CPU count)
+            chunk_size: Combinations per task
+            progress_interval: Seconds between progress log lines
+        """
+        self.entry_thresholds = list(entry_thresholds)
+        self.exit_thresholds = list(exit_thresholds)
+        self.stop_loss_pcts = list(stop_loss_pcts)
+        self.take_profit_pcts = list(take_profit_pcts)
+        self.zscore_windows = list(zscore_windows)
+        self.initial_capital = initial_capital
+        self.position_size_pct = position_size_pct
+        self.min_periods = min_periods
+        self.max_workers = max_workers
+        self.chunk_size = chunk_size
+        self.progress_interval = progress_interval
+        self.stats: dict = {}
+    
+    def combinations(self) -> List[Tuple[float, float, float, float]]:
+        """(entry, exit, stop, take profit) combinations of the grid."""
+        return [
+            combo for combo in itertools.product(
+                self.entry_thresholds, self.exit_thresholds, self.stop_loss_pcts, self.take_profit_pcts
+            )
+            if combo[1] < combo[0]
+        ]
+    
+    def _tasks(self) -> List[Tuple[int, list]]:
+        combos = self.combinations()
+        return [
+            (window, combos[i:i + self.chunk_size])
+            for window in self.zscore_windows
+            for i in range(0, len(combos), self.chunk_size)
+        ]
+    
+    def run(
+        self,
+        prices_1: np.ndarray,
+        prices_2: np.ndarray,
+        timestamps,
+        hedge_ratio: Optional[float] = None
+    ) -> pd.DataFrame:
+        """
+        Run the sweep over aligned leg prices (e.g. get_pair_ohlcv closes).
+        
+        Args:
+            prices_1, prices_2: Aligned prices without NaNs
+            timestamps: Bar times (datetime64 array, DatetimeIndex or epoch ms ints)
+            hedge_ratio: Fixed hedge ratio; OLS fit over the whole sample when None
+        
+        Returns:
+            One row per combination with its parameters and METRICS, ranked
+            (rank 1 = best) by RANK_BY
+        """
+        price_1 = np.asarray(prices_1, dtype=np.float64)
+        price_2 = np.asarray(prices_2, dtype=np.float64)
+        time_ms = SpreadBacktester._to_datetime64(timestamps).astype('datetime64[ms]').view(np.int64)
+        n_bars = len(price_1)
+        if len(price_2) != n_bars or len(time_ms) != n_bars:
+            raise ValueError("prices_1, prices_2 and timestamps must have the same length")
+        if np.isnan(price_1).any() or np.isnan(price_2).any():
+            raise ValueError("Prices must not contain NaN (align legs first)")
+        
+        if hedge_ratio is None:
+            hedge_ratio, _, _ = StatisticalAnalytics.calculate_hedge_ratio(pd.Series(price_1), pd.Series(price_2))
+            if pd.isna(hedge_ratio):
+                raise ValueError("Not enough data to fit a hedge ratio")
+        
+        tasks = self._tasks()
+        n_combos = sum(len(combos) for _, combos in tasks)
+        logger.info(f"Sweep: {n_combos} combinations x {n_bars:,} bars in {len(tasks)} tasks")
+        
+        shm = shared_memory.SharedMemory(create=True, size=max(3 * n_bars * 8, 1))
+        try:
+            data = np.ndarray((3, n_bars), dtype=np.float64, buffer=shm.buf)
+            data[0] = price_1
+            data[1] = price_2
+            data[2] = time_ms.view(np.float64)
+            del data  # Release the buffer export so the block can be closed
+            
+            rows = self._run_pool(shm.name, n_bars, float(hedge_ratio), tasks, n_combos)
+        finally:
+            shm.close()
+            shm.unlink()
+        
+        return self.rank(pd.DataFrame(rows))
+    
+    def _run_pool(self, shm_name: str, n_bars: int, hedge_ratio: float, tasks, n_combos: int) -> List[dict]:
+        rows = []
+        started = time.perf_counter()
+        last_report = started
+        
+        with ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(shm_name, n_bars, hedge_ratio, self.initial_capital, self.position_size_pct, self.min_periods)
+        ) as pool:
+            futures = [pool.submit(_run_chunk, window, combos) for window, combos in tasks]
+            
+            for future in as_completed(futures):
+                rows.extend(future.result())
+                
+                now = time.perf_counter()
+                if now - last_report >= self.progress_interval or len(rows) == n_combos:
+                    last_report = now
+                    elapsed = now - started
+                    logger.info(
+                        f"Sweep: {len(rows)}/{n_combos} ({len(rows) / n_combos:.0%}), "
+                        f"{len(rows) / elapsed:,.0f} combos/s, {len(rows) * n_bars / elapsed / 1e6:,.1f}M bars/s"
+                    )
+        
+        elapsed = time.perf_counter() - started
+        self.stats = {
+            'combinations': n_combos,
+            'bars': n_bars,
+            'tasks': len(tasks),
+            'elapsed_s': elapsed,
+            'combos_per_s': n_combos / elapsed if elapsed else 0.0,
+            'bars_per_s': n_combos * n_bars / elapsed if elapsed else 0.0
+        }
+        return rows
+    
+    @staticmethod
+    def rank(results: pd.DataFrame) -> pd.DataFrame:
+        """Sort by RANK_BY and add a 1-based rank column."""
+        if results.empty:
+            return results
+        
+        columns = [column for column, _ in ParameterSweep.RANK_BY]
+        ascending = [asc for _, asc in ParameterSweep.RANK_BY]
+        ranked = results.sort_values(columns, ascending=ascending, kind='mergesort').reset_index(drop=True)
+        ranked.insert(0, 'rank', np.arange(1, len(ranked) + 1))
+        return ranked
+
+
+if __name__ == "__main__":
+    np.random.seed(42)
+    n = 100_000
+    times = np.datetime64('2024-01-01T00:00:00', 'ms') + np.arange(n) * 60_000
+    prices_2 = 100 + np.cumsum(np.random.randn(n) * 0.1)
+    ou = np.zeros(n)
+    for t in range(1, n):
+        ou[t] = 0.97 * ou[t - 1] + np.random.randn() * 0.3
+    prices_1 = 1.5 * prices_2 + 20 + ou
+    
+    sweep = ParameterSweep(max_workers=4)
+    table = sweep.run(prices_1, prices_2, times, hedge_ratio=1.5)
+    
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(table.head(10))
+    print({k: round(v, 1) for k, v in sweep.stats.items()})
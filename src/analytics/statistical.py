@@ -13,6 +13,9 @@ from loguru import logger
 import warnings
 warnings.filterwarnings('ignore')
 
+from analytics.fast_adf import FastADF
+from analytics.streaming import RollingCointegration
+
 
 class StatisticalAnalytics:
     """
@@ -110,7 +113,8 @@ class StatisticalAnalytics:
     def adf_test(
         series: pd.Series,
         max_lag: Optional[int] = None,
-        significance: float = 0.05
+        significance: float = 0.05,
+        method: str = 'statsmodels'
     ) -> Dict[str, any]:
         """
         Augmented Dickey-Fuller test for stationarity/cointegration.
@@ -118,6 +122,9 @@ class StatisticalAnalytics:
         H0: Series has unit root (non-stationary)
         H1: Series is stationary
         
+        method: 'statsmodels' (adfuller with AIC lag search up to max_lag) or
+        'fast' (FastADF with max_lag as a fixed lag, default 1)
+        
         Returns:
             {
                 'statistic': test statistic,
@@ -146,6 +153,13 @@ class StatisticalAnalytics:
             }
         
         try:
+            if method == 'fast':
+                return FastADF.test(
+                    series_clean.values,
+                    lag=1 if max_lag is None else max_lag,
+                    significance=significance
+                )
+            
             result = adfuller(series_clean, maxlag=max_lag)
             
             return {
@@ -228,6 +242,29 @@ class StatisticalAnalytics:
             logger.error(f"Half-life calculation failed: {e}")
             return np.nan
     
+    @staticmethod
+    def rolling_cointegration(
+        spread: pd.Series,
+        window: int = 100,
+        lag: int = 1
+    ) -> pd.DataFrame:
+        """
+        Rolling fixed-lag ADF statistic, ADF p-value and half-life.
+        
+        Each row matches adf_test(method='fast', max_lag=lag) and
+        calculate_half_life on the preceding `window` values, but the whole
+        series is computed in O(T) from running regression sums
+        (see RollingCointegration).
+        """
+        spread_clean = spread.dropna()
+        columns = ['adf_statistic', 'adf_pvalue', 'half_life']
+        
+        if len(spread_clean) < window:
+            return pd.DataFrame(np.nan, index=spread_clean.index, columns=columns)
+        
+        values = RollingCointegration.compute(spread_clean.values, window=window, lag=lag)
+        return pd.DataFrame(values, index=spread_clean.index, columns=columns)
+    
     @staticmethod
     def calculate_sharpe_ratio(
         returns: pd.Series,
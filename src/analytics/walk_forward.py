@@ -0,0 +1,411 @@
+"""
+Walk-forward optimization of the PositionSimulator strategy.
+
+Fold k optimizes the ParameterSweep grid on train_bars bars and evaluates the
+best combination out of sample on the next test_bars bars; fold k+1 starts
+test_bars later. Over months of ohlcv_1m bars the train windows overlap
+heavily, so the pipeline avoids per-fold recomputation:
+
+- Bars are streamed chunk by chunk (TimeSeriesDB.iter_pair_closes) and the
+  rolling window statistics are computed once per bar as they arrive,
+  carrying each window's tail across chunks (RollingPairMoments)
+- Rolling means, variances and the covariance of the two legs are kept
+  instead of spread statistics: a fold's spread z-score for its own hedge
+  ratio b follows from mean_1 - b * mean_2 and var_1 + b^2 * var_2 - 2b * cov
+- Complete folds are sliced out of a bounded buffer and run in a process
+  pool while streaming continues; at most max_pending folds are in flight,
+  so memory stays bounded by the fold size, not the history length
+"""
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from loguru import logger
+from numpy.lib.stride_tricks import sliding_window_view
+
+from analytics.backtest import SpreadBacktester
+from analytics.param_sweep import ParameterSweep, evaluate_combinations
+
+
+class RollingPairMoments:
+    """
+    Rolling means, variances (ddof=1) and covariance of two series, fed in chunks.
+    
+    The last window - 1 values are carried between chunks, so every bar's
+    statistics equal pandas rolling(window) over the whole stream without
+    keeping the stream. Window sums come from cumulative sums restarted per
+    block of window rows, over values centered on the block mean, so they
+    stay precise at any price level; the spread variance derived from them
+    cancels var_1 and b^2 * var_2, which are far larger for cointegrated legs.
+    """
+    
+    FIELDS = ('count', 'mean_1', 'mean_2', 'var_1', 'var_2', 'cov')
+    
+    def __init__(self, window: int):
+        if window < 2:
+            raise ValueError(f"window must be >= 2, got {window}")
+        
+        self.window = window
+        self.reset()
+    
+    def reset(self):
+        self._tail_1 = np.empty(0)
+        self._tail_2 = np.empty(0)
+    
+    def update(self, values_1: np.ndarray, values_2: np.ndarray) -> Dict[str, np.ndarray]:
+        """Statistics of the window ending at each new value (see FIELDS)."""
+        w = self.window
+        carried = len(self._tail_1)
+        x = np.concatenate((self._tail_1, np.asarray(values_1, dtype=np.float64)))
+        y = np.concatenate((self._tail_2, np.asarray(values_2, dtype=np.float64)))
+        n_new = len(x) - carried
+        if n_new == 0:
+            return {name: np.empty(0) for name in self.FIELDS}
+        
+        # Pad so every new value has w - 1 predecessors and the new values
+        # fill whole blocks of w rows; padding is masked out via `valid`
+        lead = w - 1 - carried
+        n_blocks = -(-n_new // w)
+        trail = n_blocks * w - n_new
+        pad = lambda values: np.concatenate((np.zeros(lead), values, np.zeros(trail)))
+        valid = pad(np.ones(len(x)))
+        
+        # Block j holds the 2w - 1 values seen by the windows of its w rows
+        blocks = lambda values: sliding_window_view(values, 2 * w - 1)[::w]
+        valid_b = blocks(valid)
+        count_b = valid_b.sum(axis=1, keepdims=True)
+        ref_x = (blocks(pad(x)) * valid_b).sum(axis=1, keepdims=True) / count_b
+        ref_y = (blocks(pad(y)) * valid_b).sum(axis=1, keepdims=True) / count_b
+        dx = (blocks(pad(x)) - ref_x) * valid_b
+        dy = (blocks(pad(y)) - ref_y) * valid_b
+        
+        def window_sum(values):
+            # Cumsums restart per block, so window differences stay small
+            cumsum = np.concatenate((np.zeros((n_blocks, 1)), np.cumsum(values, axis=1)), axis=1)
+            return (cumsum[:, w:] - cumsum[:, :w]).ravel()[:n_new]
+        
+        count = window_sum(valid_b)
+        mean_x = window_sum(dx) / count
+        mean_y = window_sum(dy) / count
+        with np.errstate(divide='ignore', invalid='ignore'):
+            var_x = (window_sum(dx * dx) - count * mean_x * mean_x) / (count - 1)
+            var_y = (window_sum(dy * dy) - count * mean_y * mean_y) / (count - 1)
+            cov = (window_sum(dx * dy) - count * mean_x * mean_y) / (count - 1)
+        
+        self._tail_1 = x[-(w - 1):].copy()
+        self._tail_2 = y[-(w - 1):].copy()
+        
+        return {
+            'count': count,
+            'mean_1': mean_x + np.repeat(ref_x.ravel(), w)[:n_new],
+            'mean_2': mean_y + np.repeat(ref_y.ravel(), w)[:n_new],
+            'var_1': var_x,
+            'var_2': var_y,
+            'cov': cov
+        }
+    
+    @staticmethod
+    def spread_zscore(
+        moments: Dict[str, np.ndarray],
+        spread: np.ndarray,
+        hedge_ratio: float,
+        min_periods: int
+    ) -> np.ndarray:
+        """Rolling z-score of spread = values_1 - hedge_ratio * values_2."""
+        mean = moments['mean_1'] - hedge_ratio * moments['mean_2']
+        var = moments['var_1'] + hedge_ratio ** 2 * moments['var_2'] - 2 * hedge_ratio * moments['cov']
+        
+        # Same guards as calculate_zscore: min_periods and zero variance -> NaN
+        var = np.where((moments['count'] >= min_periods) & (var > 0), var, np.nan)
+        return (spread - mean) / np.sqrt(var)
+
+
+def _run_fold(fold: dict) -> dict:
+    """Optimize on a fold's train bars and evaluate the winner on its test bars."""
+    train = fold['train_bars']
+    price_1, price_2, time_ms = fold['price_1'], fold['price_2'], fold['time_ms']
+    
+    hedge_ratio = fold['hedge_ratio']
+    if hedge_ratio is None:
+        # OLS without intercept on the train bars, as StatisticalAnalytics.calculate_hedge_ratio
+        hedge_ratio = float(np.dot(price_1[:train], price_2[:train]) / np.dot(price_2[:train], price_2[:train]))
+    spread = price_1 - hedge_ratio * price_2
+    
+    zscores = {}
+    rows = []
+    for window, moments in fold['moments'].items():
+        zscores[window] = RollingPairMoments.spread_zscore(
+            moments, spread, hedge_ratio, min(fold['min_periods'], window)
+        )
+        rows += evaluate_combinations(
+            zscores[window][:train], spread[:train], time_ms[:train], window, fold['combos'],
+            fold['initial_capital'], fold['position_size_pct']
+        )
+    
+    table = pd.DataFrame(rows)
+    eligible = table[table['total_trades'] >= fold['min_trades']]
+    best = ParameterSweep.rank(eligible if not eligible.empty else table).iloc[0]
+    
+    window = int(best['zscore_window'])
+    test = SpreadBacktester(
+        initial_capital=fold['initial_capital'],
+        entry_threshold=best['entry_threshold'],
+        exit_threshold=best['exit_threshold'],
+        position_size_pct=fold['position_size_pct'],
+        stop_loss_pct=best['stop_loss_pct'],
+        take_profit_pct=best['take_profit_pct']
+    ).run(zscores[window][train:], spread[train:], time_ms[train:]).metrics
+    
+    result = {
+        'fold': fold['fold'],
+        'train_start': time_ms[0],
+        'test_start': time_ms[train],
+        'test_end': time_ms[-1],
+        'hedge_ratio': hedge_ratio,
+        'zscore_window': window
+    }
+    for key in ('entry_threshold', 'exit_threshold', 'stop_loss_pct', 'take_profit_pct'):
+        result[key] = float(best[key])
+    for key in ParameterSweep.METRICS:
+        result[f'train_{key}'] = float(best[key])
+        result[f'test_{key}'] = float(test.get(key, 0.0))
+    return result
+
+
+class WalkForwardOptimizer:
+    """Rolling train/test evaluation of the ParameterSweep grid."""
+    
+    def __init__(
+        self,
+        sweep: Optional[ParameterSweep] = None,
+        train_bars: int = 30 * 1440,
+        test_bars: int = 7 * 1440,
+        hedge_ratio: Optional[float] = None,
+        min_trades: int = 10,
+        max_workers: Optional[int] = None,
+        max_pending: Optional[int] = None
+    ):
+        """
+        Args:
+            sweep: Grid and fixed settings (capital, position size, min_periods);
+                its pool is not used, folds run in this optimizer's pool
+            train_bars: In-sample bars per fold (default 30 days of 1m bars)
+            test_bars: Out-of-sample bars per fold, and the step between folds
+            hedge_ratio: Fixed hedge ratio; fitted per fold on its train bars when None
+            min_trades: Train combinations with fewer trades are only chosen
+                if no combination has enough
+            max_workers: Process pool size (None = CPU count)
+            max_pending: Folds queued or running at once (default 2 * max_workers)
+        """
+        if train_bars < 2 or test_bars < 1:
+            raise ValueError("train_bars must be >= 2 and test_bars >= 1")
+        
+        self.sweep = sweep or ParameterSweep()
+        self.train_bars = train_bars
+        self.test_bars = test_bars
+        self.hedge_ratio = hedge_ratio
+        self.min_trades = min_trades
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.stats: dict = {}
+    
+    @property
+    def fold_bars(self) -> int:
+        return self.train_bars + self.test_bars
+    
+    async def run(
+        self,
+        db,
+        symbol_1: str,
+        symbol_2: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        interval: str = '1m',
+        chunk_rows: int = 50_000
+    ) -> pd.DataFrame:
+        """Walk forward over stored bars (see TimeSeriesDB.iter_pair_closes)."""
+        chunks = db.iter_pair_closes(symbol_1, symbol_2, start, end, interval=interval, chunk_rows=chunk_rows)
+        return await self.run_stream(chunks)
+    
+    def run_arrays(
+        self,
+        time_ms: np.ndarray,
+        price_1: np.ndarray,
+        price_2: np.ndarray,
+        chunk_rows: int = 50_000
+    ) -> pd.DataFrame:
+        """Walk forward over in-memory arrays, fed through the same chunked path."""
+        async def chunks():
+            for i in range(0, len(time_ms), chunk_rows):
+                yield {
+                    'time_ms': time_ms[i:i + chunk_rows],
+                    'close_1': price_1[i:i + chunk_rows],
+                    'close_2': price_2[i:i + chunk_rows]
+                }
+        
+        return asyncio.run(self.run_stream(chunks()))
+    
+    async def run_stream(self, chunks: AsyncIterator[Dict[str, np.ndarray]]) -> pd.DataFrame:
+        """
+        Walk forward over a stream of aligned bar chunks.
+        
+        Args:
+            chunks: Dicts with time_ms, close_1 and close_2 arrays, in time order
+        
+        Returns:
+            One row per complete fold: train/test start, test end, hedge
+            ratio, chosen parameters and train_* / test_* metrics. Trailing
+            bars that do not fill a test window are not evaluated.
+        """
+        loop = asyncio.get_running_loop()
+        windows = self.sweep.zscore_windows
+        moments = {window: RollingPairMoments(window) for window in windows}
+        combos = self.sweep.combinations()
+        
+        buffer: Optional[Dict[str, np.ndarray]] = None
+        pending = set()
+        results: List[dict] = []
+        n_folds = 0
+        n_bars = 0
+        started = time.perf_counter()
+        max_pending = self.max_pending or 2 * (self.max_workers or os.cpu_count() or 1)
+        
+        with ProcessPoolExecutor(max_workers=self.max_workers) as pool:
+            
+            async for chunk in chunks:
+                n_bars += len(chunk['time_ms'])
+                features = {
+                    'time_ms': np.asarray(chunk['time_ms'], dtype=np.int64),
+                    'price_1': np.asarray(chunk['close_1'], dtype=np.float64),
+                    'price_2': np.asarray(chunk['close_2'], dtype=np.float64)
+                }
+                for window, state in moments.items():
+                    for name, values in state.update(features['price_1'], features['price_2']).items():
+                        features[f'{name}_{window}'] = values
+                
+                buffer = features if buffer is None else \
+                    {k: np.concatenate((buffer[k], features[k])) for k in buffer}
+                
+                while len(buffer['time_ms']) >= self.fold_bars:
+                    while len(pending) >= max_pending:
+                        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                        results += self._collect(done, started)
+                    
+                    fold = self._make_fold(n_folds, buffer, combos)
+                    pending.add(loop.run_in_executor(pool, _run_fold, fold))
+                    n_folds += 1
+                    buffer = {k: v[self.test_bars:] for k, v in buffer.items()}
+            
+            if pending:
+                done, _ = await asyncio.wait(pending)
+                results += self._collect(done, started)
+        
+        elapsed = time.perf_counter() - started
+        self.stats = {
+            'folds': n_folds,
+            'bars': n_bars,
+            'combinations': len(combos) * len(windows),
+            'elapsed_s': elapsed,
+            'bars_per_s': n_bars / elapsed if elapsed else 0.0
+        }
+        
+        if not results:
+            logger.warning(f"Walk-forward: {n_bars:,} bars, fewer than one fold ({self.fold_bars:,} bars)")
+            return pd.DataFrame()
+        
+        table = pd.DataFrame(results).sort_values('fold').reset_index(drop=True)
+        for column in ('train_start', 'test_start', 'test_end'):
+            table[column] = pd.to_datetime(table[column], unit='ms', utc=True)
+        
+        self.stats['test_sharpe_mean'] = float(table['test_sharpe_ratio'].mean())
+        self.stats['test_pnl_total'] = float(table['test_total_pnl'].sum())
+        logger.info(
+            f"Walk-forward: {n_folds} folds over {n_bars:,} bars in {elapsed:.1f}s, "
+            f"mean out-of-sample Sharpe {self.stats['test_sharpe_mean']:.2f}"
+        )
+        return table
+    
+    def _make_fold(self, index: int, buffer: Dict[str, np.ndarray], combos: list) -> dict:
+        """Copy one fold's bars and rolling statistics out of the buffer."""
+        part = {k: v[:self.fold_bars].copy() for k, v in buffer.items()}
+        return {
+            'fold': index,
+            'train_bars': self.train_bars,
+            'hedge_ratio': self.hedge_ratio,
+            'time_ms': part['time_ms'],
+            'price_1': part['price_1'],
+            'price_2': part['price_2'],
+            'moments': {
+                window: {name: part[f'{name}_{window}'] for name in RollingPairMoments.FIELDS}
+                for window in self.sweep.zscore_windows
+            },
+            'combos': combos,
+            'min_trades': self.min_trades,
+            'min_periods': self.sweep.min_periods,
+            'initial_capital': self.sweep.initial_capital,
+            'position_size_pct': self.sweep.position_size_pct
+        }
+    
+    def _collect(self, done, started: float) -> List[dict]:
+        rows = []
+        for future in done:
+            row = future.result()
+            rows.append(row)
+            logger.info(
+                f"Fold {row['fold']}: window {row['zscore_window']}, entry {row['entry_threshold']}, "
+                f"exit {row['exit_threshold']} -> train Sharpe {row['train_sharpe_ratio']:.2f}, "
+                f"test Sharpe {row['test_sharpe_ratio']:.2f} ({time.perf_counter() - started:.1f}s)"
+            )
+        return rows
+
+
+if __name__ == "__main__":
+    from analytics.statistical import StatisticalAnalytics
+    
+    np.random.seed(42)
+    n = 60 * 1440  # 60 days of 1m bars
+    time_ms = 1_704_067_200_000 + np.arange(n, dtype=np.int64) * 60_000
+    prices_2 = 100 + np.cumsum(np.random.randn(n) * 0.05)
+    ou = np.zeros(n)
+    for t in range(1, n):
+        ou[t] = 0.98 * ou[t - 1] + np.random.randn() * 0.1
+    prices_1 = 1.5 * prices_2 + 20 + ou
+    
+    # Chunked rolling moments vs pandas rolling z-score of the spread, at
+    # BTC/ETH-like levels where the leg variances dwarf the spread variance
+    rng = np.random.default_rng(7)
+    eth = 3500 + np.cumsum(rng.standard_normal(n) * 5)
+    noise = np.zeros(n)
+    shocks = rng.standard_normal(n) * 0.5
+    for t in range(1, n):
+        noise[t] = 0.9 * noise[t - 1] + shocks[t]
+    btc = 15 * eth + noise
+    spread = btc - 15 * eth
+    for window in (30, 120):
+        state = RollingPairMoments(window)
+        moments = [state.update(btc[i:i + 50_000], eth[i:i + 50_000]) for i in range(0, n, 50_000)]
+        moments = {name: np.concatenate([m[name] for m in moments]) for name in RollingPairMoments.FIELDS}
+        zscore = RollingPairMoments.spread_zscore(moments, spread, 15.0, 20)
+        reference = StatisticalAnalytics.calculate_zscore(pd.Series(spread), window=window, min_periods=20).values
+        flips = int(((np.abs(zscore) > 2) != (np.abs(reference) > 2)).sum())
+        assert flips == 0, f"entry decisions differ on {flips} bars"
+        print(f"Window {window}: chunked z-score vs pandas max diff {np.nanmax(np.abs(zscore - reference)):.2e}")
+    
+    sweep = ParameterSweep(
+        entry_thresholds=(1.5, 2.0, 2.5), exit_thresholds=(0.0, 0.5),
+        stop_loss_pcts=(0.02, 0.05), take_profit_pcts=(0.05, 0.10), zscore_windows=(30, 60, 120)
+    )
+    optimizer = WalkForwardOptimizer(sweep, train_bars=14 * 1440, test_bars=7 * 1440, hedge_ratio=1.5, max_workers=2)
+    table = optimizer.run_arrays(time_ms, prices_1, prices_2, chunk_rows=20_000)
+    
+    columns = ['fold', 'test_start', 'zscore_window', 'entry_threshold', 'exit_threshold',
+               'train_sharpe_ratio', 'test_sharpe_ratio', 'test_total_return', 'test_total_trades']
+    with pd.option_context('display.width', 200, 'display.max_columns', 20):
+        print(table[columns])
+    print({k: round(v, 2) for k, v in optimizer.stats.items()})
@@ -0,0 +1,174 @@
+"""
+Bounded tick queue between the WebSocket read loop and tick processing.
+Lets the socket keep reading while consumers validate, buffer and flush.
+"""
+
+import asyncio
+import time
+from collections import deque
+from dataclasses import dataclass, asdict
+from typing import List, Optional
+
+from loguru import logger
+
+
+BACKPRESSURE_POLICIES = ('block', 'drop_oldest', 'coalesce')
+
+
+@dataclass
+class QueueMetrics:
+    """Counters for one tick queue."""
+    enqueued: int = 0
+    processed: int = 0
+    dropped: int = 0
+    coalesced: int = 0
+    max_depth: int = 0
+    total_wait: float = 0.0  # seconds spent in queue, summed over processed ticks
+    max_wait: float = 0.0
+    last_wait: float = 0.0
+    
+    def to_dict(self) -> dict:
+        data = asdict(self)
+        data['avg_wait_ms'] = (self.total_wait / self.processed * 1000) if self.processed else 0.0
+        data['max_wait_ms'] = self.max_wait * 1000
+        data['last_wait_ms'] = self.last_wait * 1000
+        return data
+
+
+class TickQueue:
+    """
+    Bounded FIFO of normalized ticks with a backpressure policy.
+    
+    Policies when the queue is full:
+    - block: the producer waits for space (socket reads pause)
+    - drop_oldest: the oldest queued tick is discarded
+    - coalesce: the new tick is merged into the newest queued tick of the
+      same symbol (latest price/time win, sizes are summed so volume is kept);
+      falls back to drop_oldest if no tick of that symbol is queued
+    """
+    
+    def __init__(self, maxsize: int = 10000, policy: str = 'block'):
+        if policy not in BACKPRESSURE_POLICIES:
+            raise ValueError(f"Invalid backpressure policy: {policy}")
+        if maxsize < 1:
+            raise ValueError(f"maxsize must be >= 1, got {maxsize}")
+        
+        self.maxsize = maxsize
+        self.policy = policy
+        self.metrics = QueueMetrics()
+        self._items: deque = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+        self._closed = False
+    
+    def __len__(self) -> int:
+        return len(self._items)
+    
+    @property
+    def depth(self) -> int:
+        """Current number of queued ticks."""
+        return len(self._items)
+    
+    async def put(self, tick: dict):
+        """Enqueue a tick, applying the backpressure policy if full."""
+        if len(self._items) >= self.maxsize:
+            if self.policy == 'block':
+                while len(self._items) >= self.maxsize and not self._closed:
+                    self._not_full.clear()
+                    await self._not_full.wait()
+            elif self.policy == 'coalesce' and self._coalesce(tick):
+                return
+            else:
+                self._items.popleft()
+                self.metrics.dropped += 1
+        
+        if self._closed:
+            return
+        
+        self._items.append((tick, time.perf_counter()))
+        self.metrics.enqueued += 1
+        self.metrics.max_depth = max(self.metrics.max_depth, len(self._items))
+        self._not_empty.set()
+    
+    def _coalesce(self, tick: dict) -> bool:
+        """Merge tick into the newest queued tick of the same symbol."""
+        symbol = tick['symbol']
+        for i in range(len(self._items) - 1, -1, -1):
+            queued, enqueued_at = self._items[i]
+            if queued['symbol'] == symbol:
+                merged = dict(tick)
+                merged['size'] = queued['size'] + tick['size']
+                # Keep the original enqueue time so time-in-queue stays honest
+                self._items[i] = (merged, enqueued_at)
+                self.metrics.coalesced += 1
+                return True
+        return False
+    
+    async def get(self) -> Optional[dict]:
+        """
+        Dequeue the oldest tick, waiting if empty.
+        
+        Returns None once the queue is closed and drained.
+        """
+        while not self._items:
+            if self._closed:
+                return None
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        
+        tick, enqueued_at = self._items.popleft()
+        self._not_full.set()
+        
+        wait = time.perf_counter() - enqueued_at
+        self.metrics.processed += 1
+        self.metrics.total_wait += wait
+        self.metrics.last_wait = wait
+        self.metrics.max_wait = max(self.metrics.max_wait, wait)
+        
+        return tick
+    
+    async def get_batch(self, max_items: int) -> List[dict]:
+        """
+        Dequeue up to max_items ticks at once, waiting for at least one.
+        
+        Returns an empty list once the queue is closed and drained.
+        """
+        first = await self.get()
+        if first is None:
+            return []
+        
+        batch = [first]
+        now = time.perf_counter()
+        while self._items and len(batch) < max_items:
+            tick, enqueued_at = self._items.popleft()
+            wait = now - enqueued_at
+            self.metrics.processed += 1
+            self.metrics.total_wait += wait
+            self.metrics.last_wait = wait
+            self.metrics.max_wait = max(self.metrics.max_wait, wait)
+            batch.append(tick)
+        
+        self._not_full.set()
+        return batch
+    
+    def close(self):
+        """Stop accepting ticks; consumers drain what is left and then get None."""
+        self._closed = True
+        self._not_empty.set()
+        self._not_full.set()
+
+
+if __name__ == "__main__":
+    async def test():
+        queue = TickQueue(maxsize=3, policy='coalesce')
+        for i in range(5):
+            await queue.put({'symbol': 'btcusdt', 'price': 100.0 + i, 'size': 1.0})
+        queue.close()
+        
+        while (tick := await queue.get()) is not None:
+            logger.info(f"Dequeued: {tick}")
+        
+        logger.info(f"Metrics: {queue.metrics.to_dict()}")
+    
+    asyncio.run(test())
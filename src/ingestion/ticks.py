@@ -0,0 +1,168 @@
+"""
+Tick record format and fast decoding of Binance trade messages.
+
+Normalized ticks keep the exchange trade time as integer epoch milliseconds
+('timestamp_ms'); conversion to datetime happens only where a datetime is
+actually needed (display, legacy readers). Decoding uses msgspec or orjson
+when installed and falls back to the standard library json module.
+"""
+
+import json
+from datetime import datetime
+from typing import Optional, Tuple, TypedDict
+
+try:
+    import msgspec
+except ImportError:  # Optional fast path
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:  # Optional fast path
+    orjson = None
+
+
+class Tick(TypedDict, total=False):
+    """Normalized trade tick."""
+    symbol: str
+    timestamp_ms: int  # Exchange trade time, epoch milliseconds
+    price: float
+    size: float
+    trade_id: int
+    is_buyer_maker: bool  # True if sell, False if buy
+    timestamp: datetime  # Legacy field, accepted in place of timestamp_ms
+
+
+def tick_epoch_ms(tick: dict) -> int:
+    """Trade time of a tick as integer epoch milliseconds."""
+    if 'timestamp_ms' in tick:
+        return tick['timestamp_ms']
+    return int(round(tick['timestamp'].timestamp() * 1000))
+
+
+def tick_datetime(tick: dict) -> datetime:
+    """Trade time of a tick as a (local, naive) datetime - for display only."""
+    if 'timestamp' in tick:
+        return tick['timestamp']
+    return datetime.fromtimestamp(tick['timestamp_ms'] / 1000.0)
+
+
+def normalize_trade(
+    symbol: str,
+    trade_time_ms: int,
+    price: str,
+    quantity: str,
+    trade_id: int,
+    is_buyer_maker: bool
+) -> Tick:
+    """Build a normalized tick from Binance trade event fields."""
+    return {
+        'symbol': symbol.lower(),
+        'timestamp_ms': trade_time_ms,
+        'price': float(price),
+        'size': float(quantity),
+        'trade_id': trade_id,
+        'is_buyer_maker': is_buyer_maker
+    }
+
+
+if msgspec is not None:
+    class _BinanceTrade(msgspec.Struct):
+        """Binance trade event; only the fields we use are decoded."""
+        e: str = ''
+        s: str = ''
+        T: int = 0
+        p: str = '0'
+        q: str = '0'
+        t: int = 0
+        m: bool = False
+    
+    class _CombinedTrade(msgspec.Struct):
+        """Combined-stream envelope around a trade event."""
+        stream: str = ''
+        data: Optional[_BinanceTrade] = None
+
+
+class TradeDecoder:
+    """
+    Decode raw trade messages straight into normalized ticks.
+    
+    Backends:
+    - msgspec: typed decode into a Struct (no intermediate dict)
+    - orjson: fast dict decode
+    - json: standard library fallback
+    """
+    
+    BACKENDS = ('auto', 'msgspec', 'orjson', 'json')
+    
+    def __init__(self, backend: str = 'auto'):
+        if backend not in self.BACKENDS:
+            raise ValueError(f"Invalid decoder backend: {backend}")
+        
+        if backend == 'auto':
+            backend = 'msgspec' if msgspec else 'orjson' if orjson else 'json'
+        elif backend == 'msgspec' and msgspec is None:
+            raise ImportError("msgspec is not installed")
+        elif backend == 'orjson' and orjson is None:
+            raise ImportError("orjson is not installed")
+        
+        self.backend = backend
+        
+        if backend == 'msgspec':
+            self._trade_decoder = msgspec.json.Decoder(_BinanceTrade)
+            self._combined_decoder = msgspec.json.Decoder(_CombinedTrade)
+        else:
+            self._loads = orjson.loads if backend == 'orjson' else json.loads
+    
+    def decode(self, message) -> Optional[Tick]:
+        """Decode a single-stream message; None if it is not a trade."""
+        if self.backend == 'msgspec':
+            return self._from_struct(self._trade_decoder.decode(message))
+        return self._from_dict(self._loads(message))
+    
+    def decode_combined(self, message) -> Tuple[Optional[str], Optional[Tick]]:
+        """Decode a combined-stream message into (stream name, tick or None)."""
+        if self.backend == 'msgspec':
+            envelope = self._combined_decoder.decode(message)
+            if envelope.data is None:
+                return envelope.stream or None, None
+            return envelope.stream, self._from_struct(envelope.data)
+        
+        payload = self._loads(message)
+        data = payload.get('data')
+        return payload.get('stream'), self._from_dict(data) if data else None
+    
+    @staticmethod
+    def _from_struct(trade) -> Optional[Tick]:
+        if trade.e != 'trade':
+            return None
+        return normalize_trade(trade.s, trade.T, trade.p, trade.q, trade.t, trade.m)
+    
+    @staticmethod
+    def _from_dict(data: dict) -> Optional[Tick]:
+        if data.get('e') != 'trade':
+            return None
+        return normalize_trade(data['s'], data['T'], data['p'], data['q'], data['t'], data['m'])
+
+
+if __name__ == "__main__":
+    import time
+    
+    message = (
+        '{"e":"trade","E":1700000000001,"T":1700000000000,"s":"BTCUSDT",'
+        '"t":123456789,"p":"37000.10","q":"0.015","X":"MARKET","m":true}'
+    )
+    
+    for backend in ('msgspec', 'orjson', 'json'):
+        try:
+            decoder = TradeDecoder(backend)
+        except ImportError as e:
+            print(f"{backend:8s} skipped: {e}")
+            continue
+        
+        n = 100000
+        start = time.perf_counter()
+        for _ in range(n):
+            decoder.decode(message)
+        elapsed = time.perf_counter() - start
+        print(f"{backend:8s} {elapsed / n * 1e6:.2f} µs/message -> {decoder.decode(message)}")
@@ -5,11 +5,15 @@ Handles connection management, reconnection logic, and data normalization.
 
 import asyncio
 import json
-from datetime import datetime
+import time
 from typing import Callable, List, Optional
+import numpy as np
 import websockets
 from loguru import logger
 
+from ingestion.tick_queue import TickQueue
+from ingestion.ticks import TradeDecoder, tick_epoch_ms
+
 
 class BinanceWebSocketClient:
     """
@@ -20,6 +24,10 @@ class BinanceWebSocketClient:
     - Data validation and normalization
     - Multiple symbol support
     - Graceful shutdown
+    - Optional bounded queue + worker pool so slow processing never
+      blocks the socket read loop
+    - Optional combined-stream mode: many symbols multiplexed per socket
+      (/stream?streams=a@trade/b@trade), sharded across connections
     """
     
     def __init__(
@@ -27,24 +35,93 @@ class BinanceWebSocketClient:
         symbols: List[str],
         on_message: Callable,
         base_url: str = "wss://fstream.binance.com/ws",
-        max_reconnect_attempts: int = 10
+        max_reconnect_attempts: int = 10,
+        queue_size: int = 0,
+        num_workers: int = 1,
+        backpressure: str = 'block',
+        combined_streams: bool = False,
+        streams_per_connection: int = 200,
+        num_connections: int = 0,
+        decoder: str = 'auto',
+        on_batch: Optional[Callable] = None,
+        max_batch_size: int = 256
     ):
+        """
+        Args:
+            symbols: Symbols to subscribe to
+            on_message: Async callback for each normalized tick
+            base_url: Binance WebSocket base URL
+            max_reconnect_attempts: Give up after this many consecutive failures
+            queue_size: Total queued ticks across workers; 0 = call on_message
+                inline from the read loop
+            num_workers: Consumer tasks; ticks are routed by symbol so each
+                symbol is processed in order by a single worker
+            backpressure: 'block', 'drop_oldest' or 'coalesce' (see TickQueue)
+            combined_streams: Multiplex symbols over combined-stream sockets
+                instead of one socket per symbol
+            streams_per_connection: Max streams per combined socket
+            num_connections: Number of combined sockets (shards); 0 = as few
+                as streams_per_connection allows
+            decoder: JSON backend - 'auto', 'msgspec', 'orjson' or 'json'
+            on_batch: Optional async callback taking a list of ticks; when set,
+                queue workers drain up to max_batch_size ticks per call
+                instead of calling on_message per tick
+            max_batch_size: Max ticks per on_batch call
+        """
         self.symbols = [s.lower() for s in symbols]
         self.on_message = on_message
         self.base_url = base_url
         self.max_reconnect_attempts = max_reconnect_attempts
         self.connections = {}
         self.running = False
+        self.decoder = TradeDecoder(decoder)
+        self.on_batch = on_batch
+        self.max_batch_size = max_batch_size
+        
+        # Combined-stream mode
+        self.combined_streams = combined_streams
+        self.streams_per_connection = streams_per_connection
+        self.num_connections = num_connections
+        self.combined_base_url = base_url.rstrip('/')
+        if self.combined_base_url.endswith('/ws'):
+            self.combined_base_url = self.combined_base_url[:-len('/ws')]
+        self.combined_base_url += '/stream'
+        
+        # Per-stream routing for combined messages: stream name -> handler
+        self.stream_routes = {f"{symbol}@trade": self._dispatch for symbol in self.symbols}
+        
+        # Decoupled processing stage
+        self.num_workers = max(1, num_workers)
+        self.queues: List[TickQueue] = []
+        if queue_size > 0:
+            per_worker = max(1, queue_size // self.num_workers)
+            self.queues = [TickQueue(per_worker, backpressure) for _ in range(self.num_workers)]
+        self._symbol_queue = {}
+        self._workers: List[asyncio.Task] = []
         
     async def connect_symbol(self, symbol: str):
         """Connect to WebSocket stream for a single symbol."""
         url = f"{self.base_url}/{symbol}@trade"
+        await self._run_connection(url, symbol, self._handle_message)
+    
+    async def connect_shard(self, shard_id: int, symbols: List[str]):
+        """
+        Connect one combined-stream socket carrying the trade streams of
+        several symbols. Reconnection is shared by all streams in the shard.
+        """
+        streams = '/'.join(f"{symbol}@trade" for symbol in symbols)
+        url = f"{self.combined_base_url}?streams={streams}"
+        label = f"shard {shard_id} ({len(symbols)} streams)"
+        await self._run_connection(url, label, self._handle_combined_message)
+    
+    async def _run_connection(self, url: str, label: str, handle_message: Callable):
+        """Read one socket until stopped, reconnecting with exponential backoff."""
         reconnect_count = 0
         
         while self.running and reconnect_count < self.max_reconnect_attempts:
             try:
                 async with websockets.connect(url) as websocket:
-                    logger.info(f"Connected to {symbol} stream")
+                    logger.info(f"Connected to {label} stream")
                     reconnect_count = 0  # Reset on successful connection
                     
                     async for message in websocket:
@@ -52,43 +129,103 @@ class BinanceWebSocketClient:
                             break
                             
                         try:
-                            data = json.loads(message)
-                            if data.get('e') == 'trade':
-                                normalized = self._normalize_trade(data)
-                                await self.on_message(normalized)
+                            await handle_message(message)
                         except json.JSONDecodeError as e:
-                            logger.error(f"JSON decode error for {symbol}: {e}")
+                            logger.error(f"JSON decode error for {label}: {e}")
                         except Exception as e:
-                            logger.error(f"Error processing message for {symbol}: {e}")
+                            logger.error(f"Error processing message for {label}: {e}")
                             
             except websockets.exceptions.WebSocketException as e:
                 reconnect_count += 1
                 delay = min(2 ** reconnect_count, 60)  # Exponential backoff, max 60s
                 logger.warning(
-                    f"WebSocket error for {symbol}: {e}. "
+                    f"WebSocket error for {label}: {e}. "
                     f"Reconnecting in {delay}s (attempt {reconnect_count}/{self.max_reconnect_attempts})"
                 )
                 await asyncio.sleep(delay)
             except Exception as e:
-                logger.error(f"Unexpected error for {symbol}: {e}")
+                logger.error(f"Unexpected error for {label}: {e}")
                 break
                 
-        logger.info(f"Connection closed for {symbol}")
+        logger.info(f"Connection closed for {label}")
     
-    def _normalize_trade(self, raw_data: dict) -> dict:
-        """
-        Normalize Binance trade data to standard format.
+    async def _handle_message(self, message: str):
+        """Handle a raw single-stream message."""
+        tick = self.decoder.decode(message)
+        if tick is not None:
+            await self._dispatch(tick)
+    
+    async def _handle_combined_message(self, message: str):
+        """Handle a combined-stream message: {"stream": ..., "data": {...}}."""
+        stream, tick = self.decoder.decode_combined(message)
+        handler = self.stream_routes.get(stream)
+        if handler is not None and tick is not None:
+            await handler(tick)
+    
+    def _build_shards(self) -> List[List[str]]:
+        """Split symbols across connections for combined-stream mode."""
+        num_shards = self.num_connections or -(-len(self.symbols) // self.streams_per_connection)
+        num_shards = max(1, min(num_shards, len(self.symbols)))
         
-        Input: Binance trade event
-        Output: {symbol, timestamp, price, size, trade_id}
-        """
+        shards = [self.symbols[i::num_shards] for i in range(num_shards)]
+        
+        for shard in shards:
+            if len(shard) > self.streams_per_connection:
+                raise ValueError(
+                    f"{len(shard)} streams in one connection exceeds "
+                    f"streams_per_connection={self.streams_per_connection}"
+                )
+        return shards
+    
+    async def _dispatch(self, tick: dict):
+        """Hand a tick to processing: inline, or via the symbol's worker queue."""
+        if not self.queues:
+            await self.on_message(tick)
+            return
+        
+        symbol = tick['symbol']
+        queue = self._symbol_queue.get(symbol)
+        if queue is None:
+            queue = self.queues[len(self._symbol_queue) % len(self.queues)]
+            self._symbol_queue[symbol] = queue
+        
+        await queue.put(tick)
+    
+    async def _worker(self, queue: TickQueue):
+        """Consume ticks from a queue until it is closed and drained."""
+        while True:
+            if self.on_batch is not None:
+                ticks = await queue.get_batch(self.max_batch_size)
+                if not ticks:
+                    break
+                
+                try:
+                    await self.on_batch(ticks)
+                except Exception as e:
+                    logger.error(f"Error processing batch of {len(ticks)} ticks: {e}")
+                continue
+            
+            tick = await queue.get()
+            if tick is None:
+                break
+            
+            try:
+                await self.on_message(tick)
+            except Exception as e:
+                logger.error(f"Error processing tick for {tick.get('symbol')}: {e}")
+    
+    def get_queue_metrics(self) -> dict:
+        """Queue depth, time-in-queue and drop/coalesce counters per worker."""
+        workers = [
+            dict(queue.metrics.to_dict(), depth=queue.depth, maxsize=queue.maxsize)
+            for queue in self.queues
+        ]
         return {
-            'symbol': raw_data['s'].lower(),
-            'timestamp': datetime.fromtimestamp(raw_data['T'] / 1000.0),
-            'price': float(raw_data['p']),
-            'size': float(raw_data['q']),
-            'trade_id': raw_data['t'],
-            'is_buyer_maker': raw_data['m']  # True if sell, False if buy
+            'depth': sum(w['depth'] for w in workers),
+            'dropped': sum(w['dropped'] for w in workers),
+            'coalesced': sum(w['coalesced'] for w in workers),
+            'max_wait_ms': max((w['max_wait_ms'] for w in workers), default=0.0),
+            'workers': workers
         }
     
     async def start(self):
@@ -96,25 +233,52 @@ class BinanceWebSocketClient:
         self.running = True
         logger.info(f"Starting WebSocket client for symbols: {self.symbols}")
         
-        # Create tasks for each symbol
-        tasks = [
-            asyncio.create_task(self.connect_symbol(symbol))
-            for symbol in self.symbols
+        self._workers = [
+            asyncio.create_task(self._worker(queue))
+            for queue in self.queues
         ]
         
+        if self.combined_streams:
+            # One task per shard of multiplexed streams
+            shards = self._build_shards()
+            logger.info(f"Combined-stream mode: {len(self.symbols)} streams over {len(shards)} connections")
+            tasks = [
+                asyncio.create_task(self.connect_shard(shard_id, shard))
+                for shard_id, shard in enumerate(shards)
+            ]
+        else:
+            # Create tasks for each symbol
+            tasks = [
+                asyncio.create_task(self.connect_symbol(symbol))
+                for symbol in self.symbols
+            ]
+        
         # Wait for all tasks
         await asyncio.gather(*tasks, return_exceptions=True)
     
-    async def stop(self):
-        """Gracefully stop all WebSocket connections."""
+    async def stop(self, drain_timeout: float = 5.0):
+        """Gracefully stop all WebSocket connections and drain queued ticks."""
         logger.info("Stopping WebSocket client...")
         self.running = False
         await asyncio.sleep(1)  # Give connections time to close gracefully
+        
+        for queue in self.queues:
+            queue.close()
+        
+        if self._workers:
+            done, pending = await asyncio.wait(self._workers, timeout=drain_timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Cancelled {len(pending)} tick workers before queues drained")
 
 
 class DataValidator:
     """Validates incoming tick data for quality and completeness."""
     
+    REQUIRED_FIELDS = ('symbol', 'price', 'size')
+    MAX_AGE_SECONDS = 300
+    
     @staticmethod
     def validate_tick(tick: dict) -> bool:
         """
@@ -122,10 +286,9 @@ class DataValidator:
         
         Returns True if valid, False otherwise.
         """
-        required_fields = ['symbol', 'timestamp', 'price', 'size']
-        
         # Check all required fields present
-        if not all(field in tick for field in required_fields):
+        if not all(field in tick for field in DataValidator.REQUIRED_FIELDS) or \
+           ('timestamp_ms' not in tick and 'timestamp' not in tick):
             logger.warning(f"Missing required fields in tick: {tick}")
             return False
         
@@ -135,12 +298,57 @@ class DataValidator:
             return False
         
         # Validate timestamp is recent (within last 5 minutes)
-        age = (datetime.now() - tick['timestamp']).total_seconds()
-        if age > 300:
+        age = time.time() - tick_epoch_ms(tick) / 1000.0
+        if age > DataValidator.MAX_AGE_SECONDS:
             logger.warning(f"Tick data too old: {age}s")
             return False
             
         return True
+    
+    @staticmethod
+    def validate_batch(ticks: List[dict]) -> List[dict]:
+        """
+        Validate a micro-batch of ticks with vectorized checks.
+        
+        Same rules as validate_tick, but price/size/age are checked with
+        NumPy over the whole batch and rejections are logged once per batch.
+        
+        Returns the valid ticks, in order.
+        """
+        if not ticks:
+            return []
+        
+        complete = [
+            t for t in ticks
+            if 'symbol' in t and 'price' in t and 'size' in t and
+            ('timestamp_ms' in t or 'timestamp' in t)
+        ]
+        n_incomplete = len(ticks) - len(complete)
+        
+        if not complete:
+            logger.warning(f"Dropped {n_incomplete} ticks with missing fields")
+            return []
+        
+        n = len(complete)
+        prices = np.fromiter((t['price'] for t in complete), dtype=np.float64, count=n)
+        sizes = np.fromiter((t['size'] for t in complete), dtype=np.float64, count=n)
+        times_ms = np.fromiter((tick_epoch_ms(t) for t in complete), dtype=np.int64, count=n)
+        
+        now_ms = int(time.time() * 1000)
+        valid_values = (prices > 0) & (sizes > 0)
+        fresh = (now_ms - times_ms) <= DataValidator.MAX_AGE_SECONDS * 1000
+        mask = valid_values & fresh
+        
+        if n_incomplete or not mask.all():
+            logger.warning(
+                f"Dropped ticks in batch of {len(ticks)}: {n_incomplete} missing fields, "
+                f"{int((~valid_values).sum())} invalid price/size, "
+                f"{int((valid_values & ~fresh).sum())} too old"
+            )
+        
+        if mask.all():
+            return complete
+        return [t for t, ok in zip(complete, mask.tolist()) if ok]
 
 
 if __name__ == "__main__":
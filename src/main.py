@@ -4,10 +4,13 @@ Coordinates data ingestion, storage, analytics, and alerts.
 """
 
 import asyncio
+import itertools
+import math
 import yaml
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
 from loguru import logger
 
 # Import custom modules
@@ -15,15 +18,36 @@ import sys
 sys.path.append('/home/claude/quantdev-assignment/src')
 
 from ingestion.websocket_client import BinanceWebSocketClient, DataValidator
+from ingestion.ticks import tick_epoch_ms
 from storage.timeseries_db import TimeSeriesDB
 from storage.redis_cache import RedisCache, TickBuffer
-from analytics.statistical import StatisticalAnalytics
+from storage.tick_flusher import BackgroundTickFlusher
+from storage.bar_builder import OHLCVBarBuilder
+from analytics.streaming import RollingZScore, RollingOLSHedgeRatio
+from analytics.pair_sampler import PairSampler
+from analytics.pair_scheduler import PairAnalyticsScheduler, compute_pair_statistics
 from analytics.pnl_tracker import PositionSimulator
 from analytics.signal_quality import SignalQualityScorer
 from analytics.risk import RiskAnalytics
 from alerts.engine import AlertEngine, AlertRuleBuilder
 
 
+@dataclass
+class PairState:
+    """Per-pair analytics state kept on the event loop."""
+    symbol_1: str
+    symbol_2: str
+    pnl_tracker: PositionSimulator
+    spread_zscore: RollingZScore
+    rolling_hedge: RollingOLSHedgeRatio
+    sampler: PairSampler
+    current_hedge_ratio: Optional[float] = None
+    
+    @property
+    def pair(self) -> str:
+        return f"{self.symbol_1}-{self.symbol_2}"
+
+
 class TradingAnalyticsApp:
     """
     Main application class that orchestrates all components.
@@ -32,6 +56,17 @@ class TradingAnalyticsApp:
     WebSocket → Buffer → [Redis + TimescaleDB] → Analytics → Alerts → Frontend
     """
     
+    # Redis TTL (seconds) per cached pair metric
+    ANALYTICS_TTLS = {
+        'hedge_ratio': 60,
+        'zscore': 10,
+        'correlation': 60,
+        'unrealized_pnl': 5,
+        'performance': 10,
+        'signal_quality': 10,
+        'risk_metrics': 10
+    }
+    
     def __init__(self, config_path: str = "config/settings.yaml"):
         # Load configuration
         with open(config_path, 'r') as f:
@@ -41,8 +76,18 @@ class TradingAnalyticsApp:
         self.symbols = self.config.get('DEFAULT_SYMBOLS', ['btcusdt', 'ethusdt'])
         
         # Storage
-        self.db = TimeSeriesDB(self.config['DATABASE_URL'])
-        self.redis = RedisCache(self.config['REDIS_URL'])
+        ohlcv_mode = self.config.get('OHLCV_MODE', 'stream')
+        self.db = TimeSeriesDB(
+            self.config['DATABASE_URL'],
+            ohlcv_source='continuous_aggregate' if ohlcv_mode == 'continuous_aggregate' else 'tables',
+            compress_after_hours=self.config.get('TICKS_COMPRESS_AFTER_HOURS', 0),
+            retention_days=self.config.get('TICKS_RETENTION_DAYS', 0)
+        )
+        self.redis = RedisCache(
+            self.config['REDIS_URL'],
+            tick_batch_size=self.config.get('REDIS_TICK_BATCH_SIZE', 1),
+            tick_flush_interval=self.config.get('REDIS_TICK_FLUSH_INTERVAL', 0.1)
+        )
         self.tick_buffer = TickBuffer(max_size=1000)
         
         # WebSocket client
@@ -52,21 +97,59 @@ class TradingAnalyticsApp:
         self.alert_engine = AlertEngine(
             check_interval=self.config['ALERTS']['check_interval']
         )
+        self.alert_metrics: Dict[str, dict] = {}  # pair -> metrics for the next alert batch
+        
+        # Hedge ratio estimation: batch OLS per cycle, or rolling OLS updated per tick
+        analytics_config = self.config.get('ANALYTICS', {})
+        self.analytics_config = analytics_config
+        self.hedge_ratio_method = analytics_config.get('hedge_ratio_method', 'ols')
+        
+        # Streaming z-scores are re-seeded only when the hedge ratio moves by
+        # more than this fraction; in between they advance per sample
+        self.zscore_reseed_tolerance = analytics_config.get('zscore_reseed_tolerance', 1e-4)
+        self.live_zscores: Dict[str, float] = {}  # pair -> latest per-sample z-score, not yet published
+        
+        # Analyzed pairs (configured list, or every symbol combination), each
+        # with its own PnL tracker, streaming z-score and hedge ratio
+        self.pairs = self._resolve_pairs(analytics_config.get('pairs'))
+        self.pair_states: Dict[str, PairState] = {}
+        self.pairs_by_symbol: Dict[str, List[PairState]] = {}
+        for symbol_1, symbol_2 in self.pairs:
+            state = self._create_pair_state(symbol_1, symbol_2)
+            self.pair_states[state.pair] = state
+            self.pairs_by_symbol.setdefault(symbol_1, []).append(state)
+            self.pairs_by_symbol.setdefault(symbol_2, []).append(state)
+        
+        # Heavy per-pair statistics run in a pool, stalest pair first
+        self.pair_scheduler = PairAnalyticsScheduler(
+            self.pairs,
+            prepare=self._prepare_pair,
+            compute=compute_pair_statistics,
+            apply=self._apply_pair_analytics,
+            executor=analytics_config.get('executor', 'thread'),
+            max_workers=analytics_config.get('max_workers', 4),
+            deadline=analytics_config.get('cycle_deadline', 4.0)
+        )
         
-        # PnL Tracker / Position Simulator
-        self.pnl_tracker = PositionSimulator(
-            initial_capital=10000,
-            entry_threshold=2.0,
-            exit_threshold=0.2,
-            position_size_pct=0.10,
-            stop_loss_pct=0.05,
-            take_profit_pct=0.10
+        # Background DB writer: ticks are batched in memory and written off
+        # the ingestion path, so tick latency does not depend on DB latency
+        self.db_insert_method = self.config.get('DB_INSERT_METHOD', 'copy')
+        self.flusher = BackgroundTickFlusher(
+            insert_fn=self._insert_ticks,
+            batch_size=self.config.get('BATCH_SIZE', 1000),
+            flush_interval=self.config['BUFFER_FLUSH_INTERVAL'],
+            max_in_flight=self.config.get('FLUSH_MAX_IN_FLIGHT', 2),
+            max_retries=self.config.get('FLUSH_MAX_RETRIES', 3),
+            retry_backoff=self.config.get('FLUSH_RETRY_BACKOFF', 0.5),
+            spill_dir=self.config.get('SPILL_DIR', 'data/spill')
         )
         
-        # Batch buffer for efficient DB writes
-        self.batch_buffer = []
-        self.batch_size = self.config.get('BATCH_SIZE', 1000)
-        self.last_flush_time = datetime.now()
+        # OHLCV bars: built incrementally from ticks ('stream'), by
+        # re-reading the ticks table ('resample'), or by TimescaleDB
+        # continuous aggregates ('continuous_aggregate')
+        self.ohlcv_mode = ohlcv_mode
+        self.bar_flush_interval = self.config.get('BAR_FLUSH_INTERVAL', 1.0)
+        self.bar_builder = OHLCVBarBuilder(grace_ms=self.config.get('BAR_CLOSE_GRACE_MS', 2000))
         
         # State
         self.running = False
@@ -91,18 +174,58 @@ class TradingAnalyticsApp:
         self.ws_client = BinanceWebSocketClient(
             symbols=self.symbols,
             on_message=self.on_tick_received,
+            on_batch=self.on_ticks_received,
             base_url=self.config['BINANCE_WS_BASE'],
-            max_reconnect_attempts=self.config['MAX_RECONNECT_ATTEMPTS']
+            max_reconnect_attempts=self.config['MAX_RECONNECT_ATTEMPTS'],
+            queue_size=self.config.get('INGESTION_QUEUE_SIZE', 0),
+            num_workers=self.config.get('INGESTION_WORKERS', 1),
+            backpressure=self.config.get('INGESTION_BACKPRESSURE', 'block'),
+            combined_streams=self.config.get('WS_COMBINED_STREAMS', False),
+            streams_per_connection=self.config.get('WS_STREAMS_PER_CONNECTION', 200),
+            num_connections=self.config.get('WS_CONNECTIONS', 0),
+            decoder=self.config.get('WS_JSON_DECODER', 'auto')
         )
         
         logger.info(f"Application initialized for symbols: {self.symbols}")
     
+    def _resolve_pairs(self, configured: Optional[list]) -> List[Tuple[str, str]]:
+        """Pairs from config ('sym1-sym2' strings), or all symbol combinations."""
+        if configured:
+            return [tuple(pair.lower().split('-', 1)) for pair in configured]
+        return list(itertools.combinations(self.symbols, 2))
+    
+    def _create_pair_state(self, symbol_1: str, symbol_2: str) -> PairState:
+        return PairState(
+            symbol_1=symbol_1,
+            symbol_2=symbol_2,
+            pnl_tracker=PositionSimulator(
+                initial_capital=10000,
+                entry_threshold=2.0,
+                exit_threshold=0.2,
+                position_size_pct=0.10,
+                stop_loss_pct=0.05,
+                take_profit_pct=0.10
+            ),
+            # Streaming spread z-score, updated per tick between analytics cycles
+            spread_zscore=RollingZScore(window=60, min_periods=20),
+            rolling_hedge=RollingOLSHedgeRatio(
+                window=self.analytics_config.get('hedge_ratio_window', 500),
+                forgetting_factor=self.analytics_config.get('hedge_ratio_forgetting_factor', 1.0),
+                fit_intercept=False  # Same model as the batch OLS: spread = p1 - beta * p2
+            ),
+            # Time-aligned prices of both legs (the pair analytics input)
+            sampler=PairSampler(
+                mode=self.analytics_config.get('sampler_mode', 'asof'),
+                step_ms=self.analytics_config.get('sampler_step_ms', 1000),
+                capacity=self.analytics_config.get('sampler_window', 500),
+                max_staleness_ms=self.analytics_config.get('sampler_max_staleness_ms')
+            )
+        )
+    
     def _setup_default_alerts(self):
         """Setup default alert rules."""
         # Z-score threshold alerts for each pair
-        if len(self.symbols) >= 2:
-            pair = f"{self.symbols[0]}-{self.symbols[1]}"
-            
+        for pair in self.pair_states:
             # Entry signal (z-score > 2)
             entry_rule = AlertRuleBuilder.mean_reversion_entry_alert(pair, entry_threshold=2.0)
             self.alert_engine.add_rule(entry_rule)
@@ -130,35 +253,75 @@ class TradingAnalyticsApp:
         if not DataValidator.validate_tick(tick):
             return
         
+        await self._process_tick(tick)
+    
+    async def on_ticks_received(self, ticks: list):
+        """
+        Callback for a micro-batch of ticks drained from the ingestion queue.
+        
+        Validation is vectorized over the batch; each valid tick then goes
+        through the same processing as on_tick_received.
+        """
+        for tick in DataValidator.validate_batch(ticks):
+            await self._process_tick(tick)
+    
+    async def _process_tick(self, tick: dict):
+        """Buffer, persist and run real-time analytics for a validated tick."""
         # Add to in-memory buffer
         self.tick_buffer.add_tick(tick)
         
+        # Update pair samplers, streaming hedge ratio and z-score (O(1))
+        self._update_streaming_analytics(tick)
+        
         # Add to Redis buffer (async)
         await self.redis.buffer_tick(tick)
         
-        # Add to batch buffer for DB
-        self.batch_buffer.append(tick)
+        # Queue for the background DB flusher (does not wait for the DB)
+        self.flusher.add(tick)
         
-        # Flush batch if needed
-        if len(self.batch_buffer) >= self.batch_size or \
-           (datetime.now() - self.last_flush_time).total_seconds() > self.config['BUFFER_FLUSH_INTERVAL']:
-            await self._flush_batch()
+        # Update OHLCV bars (O(1))
+        if self.ohlcv_mode == 'stream':
+            self.bar_builder.add_tick(tick)
         
         # Trigger real-time analytics check (lightweight)
         await self._check_realtime_analytics(tick['symbol'])
     
-    async def _flush_batch(self):
-        """Flush batch buffer to database."""
-        if not self.batch_buffer:
-            return
+    async def _insert_ticks(self, ticks: list):
+        """Write a batch of ticks using the configured insert path."""
+        if self.db_insert_method == 'copy':
+            await self.db.insert_ticks_copy(ticks)
+        else:
+            await self.db.insert_ticks_batch(ticks)
+    
+    def _update_streaming_analytics(self, tick: dict):
+        """
+        Feed a tick into its pairs' samplers and the streaming estimators.
         
-        try:
-            await self.db.insert_ticks_batch(self.batch_buffer)
-            logger.debug(f"Flushed {len(self.batch_buffer)} ticks to database")
-            self.batch_buffer = []
-            self.last_flush_time = datetime.now()
-        except Exception as e:
-            logger.error(f"Error flushing batch: {e}")
+        Each new time-aligned sample (see PairSampler) updates the rolling OLS hedge
+        ratio (if enabled) and the z-score. The z-score uses the hedge ratio
+        from the last analytics cycle, so the current z-score is available
+        per sample without recomputing the window; live_zscore_task
+        publishes it.
+        """
+        symbol = tick['symbol']
+        time_ms = tick_epoch_ms(tick)
+        
+        for state in self.pairs_by_symbol.get(symbol, ()):
+            leg = 0 if symbol == state.symbol_1 else 1
+            added = state.sampler.update(leg, time_ms, tick['price'])
+            if not added:
+                continue
+            
+            _, prices_1, prices_2 = state.sampler.arrays(added)
+            for price_1, price_2 in zip(prices_1.tolist(), prices_2.tolist()):
+                if self.hedge_ratio_method == 'rolling_ols':
+                    state.rolling_hedge.update(price_1, price_2)
+                
+                if state.current_hedge_ratio is not None:
+                    state.spread_zscore.update(price_1 - state.current_hedge_ratio * price_2)
+            
+            if state.current_hedge_ratio is not None:
+                self.live_zscores[state.pair] = state.spread_zscore.zscore
     
     async def _check_realtime_analytics(self, symbol: str):
         """
@@ -166,20 +329,13 @@ class TradingAnalyticsApp:
         
         For example: z-score based on recent buffer.
         """
-        # Get recent ticks from buffer
-        ticks = self.tick_buffer.get_ticks(symbol, count=500)
-        
-        if len(ticks) < 60:  # Need minimum data
+        if self.tick_buffer.get_size(symbol) < 60:  # Need minimum data
             return
         
-        # Extract prices
-        prices = [t['price'] for t in ticks]
-        
-        # Check cached analytics
-        cached = await self.redis.get_cached_analytics(symbol, 'latest_price')
+        latest_price = self.tick_buffer.get_latest_price(symbol)
         
         # Update cache
-        await self.redis.cache_analytics(symbol, 'latest_price', prices[-1], ttl=5)
+        await self.redis.cache_analytics(symbol, 'latest_price', latest_price, ttl=5)
     
     async def on_alert_triggered(self, alert):
         """Callback when alert is triggered."""
@@ -196,66 +352,131 @@ class TradingAnalyticsApp:
         while self.running:
             try:
                 await self._compute_analytics()
+                
+                if self.ws_client and self.ws_client.queues:
+                    queue_metrics = self.ws_client.get_queue_metrics()
+                    logger.debug(
+                        f"Ingestion queue: depth={queue_metrics['depth']}, "
+                        f"max_wait={queue_metrics['max_wait_ms']:.1f}ms, "
+                        f"dropped={queue_metrics['dropped']}, coalesced={queue_metrics['coalesced']}"
+                    )
+                
+                schedule_stats = self.pair_scheduler.get_stats()
+                logger.debug(
+                    f"Pair analytics: pairs={len(self.pairs)}, busy={schedule_stats['busy']}, "
+                    f"skipped={schedule_stats['skipped']}, deadline_misses={schedule_stats['deadline_misses']}, "
+                    f"errors={schedule_stats['errors']}"
+                )
+                
+                flush_stats = self.flusher.get_stats()
+                logger.debug(
+                    f"DB flusher: buffered={flush_stats['buffered']}, in_flight={flush_stats['in_flight']}, "
+                    f"last_latency={flush_stats['last_latency_ms']:.1f}ms, spilled={flush_stats['spilled_ticks']}, "
+                    f"dropped={flush_stats['dropped_ticks']}"
+                )
+                
                 await asyncio.sleep(5)  # Run every 5 seconds
             except Exception as e:
                 logger.error(f"Error in periodic analytics: {e}")
                 await asyncio.sleep(10)
     
-    async def _compute_analytics(self):
-        """Compute analytics for all symbol pairs."""
-        if len(self.symbols) < 2:
-            return
-        
-        # For pairs trading, compute on first two symbols
-        symbol_1, symbol_2 = self.symbols[0], self.symbols[1]
-        
-        # Get recent data from buffer
-        ticks_1 = self.tick_buffer.get_ticks(symbol_1, count=500)
-        ticks_2 = self.tick_buffer.get_ticks(symbol_2, count=500)
+    async def live_zscore_task(self):
+        """
+        Publish per-sample z-scores between analytics cycles.
         
-        if len(ticks_1) < 60 or len(ticks_2) < 60:
-            return
+        Every ALERTS check_interval, the latest streaming z-score of each pair
+        that received samples is written to Redis in one pipeline and checked
+        against the alert rules.
+        """
+        while self.running:
+            try:
+                await asyncio.sleep(self.alert_engine.check_interval)
+                
+                live, self.live_zscores = self.live_zscores, {}
+                live = {pair: zscore for pair, zscore in live.items() if not math.isnan(zscore)}
+                if not live:
+                    continue
+                
+                await self.redis.cache_metric_many('zscore', live, ttl=self.ANALYTICS_TTLS['zscore'])
+                await self.alert_engine.evaluate({pair: {'zscore': zscore} for pair, zscore in live.items()})
+            except Exception as e:
+                logger.error(f"Error publishing live z-scores: {e}")
+    
+    async def _compute_analytics(self):
+        """Compute analytics for all symbol pairs (see PairAnalyticsScheduler)."""
+        await self.pair_scheduler.run_cycle()
         
-        # Create price series
+        # Check every alert rule against this cycle's pair metrics at once
+        alert_metrics, self.alert_metrics = self.alert_metrics, {}
+        if alert_metrics:
+            await self.alert_engine.evaluate(alert_metrics)
+    
+    def _prepare_pair(self, symbol_1: str, symbol_2: str) -> Optional[tuple]:
+        """Snapshot a pair's inputs for compute_pair_statistics (event loop)."""
+        state = self.pair_states[f"{symbol_1}-{symbol_2}"]
+        if len(state.sampler) < 60:
+            return None
+        
+        # Time-aligned samples, copied out of the sampler ring, which keeps
+        # filling while the pool works
+        _, prices_1, prices_2 = state.sampler.arrays()
+        prices_1 = prices_1.copy()
+        prices_2 = prices_2.copy()
+        
+        hedge_ratio = r2 = None
+        if self.hedge_ratio_method == 'rolling_ols':
+            hedge_ratio = state.rolling_hedge.hedge_ratio
+            r2 = state.rolling_hedge.r_squared
+        
+        return (
+            prices_1, prices_2, hedge_ratio, r2,
+            self.analytics_config.get('correlation_window', 100),
+            self.analytics_config.get('adf_method', 'statsmodels'),
+            self.analytics_config.get('adf_lag')
+        )
+    
+    def _hedge_ratio_moved(self, previous: Optional[float], hedge_ratio: float) -> bool:
+        """True if the z-score engine must be re-seeded for a new hedge ratio."""
+        if previous is None or not math.isfinite(previous) or not math.isfinite(hedge_ratio):
+            return True
+        return abs(hedge_ratio - previous) > self.zscore_reseed_tolerance * abs(previous)
+    
+    async def _apply_pair_analytics(self, symbol_1: str, symbol_2: str, stats: dict):
+        """Update pair state, PnL, cache and alerts from one pair's statistics."""
         import pandas as pd
-        prices_1 = pd.Series([t['price'] for t in ticks_1])
-        prices_2 = pd.Series([t['price'] for t in ticks_2])
-        
-        # Compute hedge ratio
-        hedge_ratio, r2, pval = StatisticalAnalytics.calculate_hedge_ratio(prices_1, prices_2)
-        
-        if pd.isna(hedge_ratio):
-            return
-        
-        # Compute spread
-        spread = StatisticalAnalytics.calculate_spread(prices_1, prices_2, hedge_ratio)
-        
-        # Compute z-score
-        zscore_series = StatisticalAnalytics.calculate_zscore(spread, window=60)
-        current_zscore = zscore_series.iloc[-1] if not zscore_series.empty else None
-        
-        # Compute correlation
-        corr_series = StatisticalAnalytics.rolling_correlation(prices_1, prices_2, window=100)
-        current_corr = corr_series.iloc[-1] if not corr_series.empty else None
-        
-        # Compute ADF test and half-life for signal quality
-        adf_result = StatisticalAnalytics.adf_test(spread)
-        half_life = StatisticalAnalytics.calculate_half_life(spread)
-        
-        # Cache analytics
-        pair = f"{symbol_1}-{symbol_2}"
-        await self.redis.cache_analytics(pair, 'hedge_ratio', hedge_ratio, ttl=60)
-        await self.redis.cache_analytics(pair, 'zscore', float(current_zscore) if pd.notna(current_zscore) else None, ttl=10)
-        await self.redis.cache_analytics(pair, 'correlation', float(current_corr) if pd.notna(current_corr) else None, ttl=60)
+        state = self.pair_states[f"{symbol_1}-{symbol_2}"]
+        
+        hedge_ratio = stats['hedge_ratio']
+        spread = pd.Series(stats['spread'])
+        current_corr = stats['correlation']
+        adf_result = stats['adf']
+        half_life = stats['half_life']
+        
+        # Z-score: the streaming engine already holds it per sample. Re-seed it
+        # with the spread under the new hedge ratio only when the ratio has
+        # moved (only the last window matters for the latest value)
+        if self._hedge_ratio_moved(state.current_hedge_ratio, hedge_ratio):
+            state.current_hedge_ratio = hedge_ratio
+            state.spread_zscore.reset()
+            state.spread_zscore.update_many(spread.values[-state.spread_zscore.window:])
+        current_zscore = state.spread_zscore.zscore
+        
+        # Collect analytics; written to Redis in one pipeline at the end
+        pair = state.pair
+        metrics = {
+            'hedge_ratio': float(hedge_ratio),
+            'zscore': float(current_zscore) if pd.notna(current_zscore) else None,
+            'correlation': float(current_corr) if pd.notna(current_corr) else None
+        }
         
         # Update PnL tracker with current data
         if pd.notna(current_zscore):
-            latest_price_1 = prices_1.iloc[-1]
-            latest_price_2 = prices_2.iloc[-1]
+            latest_price_1 = stats['price_1']
+            latest_price_2 = stats['price_2']
             current_spread_value = spread.iloc[-1]
             
             # Check for entry signal
-            entry_msg = self.pnl_tracker.check_entry_signal(
+            entry_msg = state.pnl_tracker.check_entry_signal(
                 zscore=float(current_zscore),
                 spread=float(current_spread_value),
                 price_1=float(latest_price_1),
@@ -265,7 +486,7 @@ class TradingAnalyticsApp:
             )
             
             # Check for exit signal
-            exit_msg = self.pnl_tracker.check_exit_signal(
+            exit_msg = state.pnl_tracker.check_exit_signal(
                 zscore=float(current_zscore),
                 spread=float(current_spread_value),
                 price_1=float(latest_price_1),
@@ -274,7 +495,7 @@ class TradingAnalyticsApp:
             )
             
             # Get unrealized PnL
-            unrealized = self.pnl_tracker.get_unrealized_pnl(
+            unrealized = state.pnl_tracker.get_unrealized_pnl(
                 current_spread=float(current_spread_value),
                 current_price_1=float(latest_price_1),
                 current_price_2=float(latest_price_2)
@@ -285,11 +506,11 @@ class TradingAnalyticsApp:
                 unrealized['entry_time'] = unrealized['entry_time'].isoformat()
             
             # Cache PnL data
-            await self.redis.cache_analytics(pair, 'unrealized_pnl', unrealized, ttl=5)
+            metrics['unrealized_pnl'] = unrealized
             
             # Get performance metrics
-            performance = self.pnl_tracker.get_performance_metrics()
-            await self.redis.cache_analytics(pair, 'performance', performance, ttl=10)
+            performance = state.pnl_tracker.get_performance_metrics()
+            metrics['performance'] = performance
             
             # Calculate Signal Quality Score
             signal_quality = SignalQualityScorer.calculate_composite_score(
@@ -304,16 +525,16 @@ class TradingAnalyticsApp:
             )
             
             # Cache signal quality
-            await self.redis.cache_analytics(pair, 'signal_quality', signal_quality, ttl=10)
+            metrics['signal_quality'] = signal_quality
             
             # Calculate Risk Metrics
-            if len(self.pnl_tracker.closed_trades) > 0:
+            if len(state.pnl_tracker.closed_trades) > 0:
                 # Get trade returns
-                trade_returns = pd.Series([t.pnl_percent for t in self.pnl_tracker.closed_trades])
+                trade_returns = pd.Series([t.pnl_percent for t in state.pnl_tracker.closed_trades])
                 
                 # Build equity curve
-                cumulative_pnl = [self.pnl_tracker.initial_capital]
-                for trade in self.pnl_tracker.closed_trades:
+                cumulative_pnl = [state.pnl_tracker.initial_capital]
+                for trade in state.pnl_tracker.closed_trades:
                     cumulative_pnl.append(cumulative_pnl[-1] + trade.pnl)
                 equity_curve = pd.Series(cumulative_pnl)
                 
@@ -325,7 +546,7 @@ class TradingAnalyticsApp:
                     avg_win=performance.get('avg_win'),
                     avg_loss=performance.get('avg_loss'),
                     current_position_size=unrealized.get('size', 0) if unrealized.get('has_position') else 0,
-                    max_position_size=self.pnl_tracker.initial_capital * 0.20  # 20% max
+                    max_position_size=state.pnl_tracker.initial_capital * 0.20  # 20% max
                 )
                 
                 # Calculate portfolio health
@@ -333,29 +554,54 @@ class TradingAnalyticsApp:
                 risk_metrics['health'] = health
                 
                 # Cache risk metrics
-                await self.redis.cache_analytics(pair, 'risk_metrics', risk_metrics, ttl=10)
+                metrics['risk_metrics'] = risk_metrics
         
-        # Check alerts if z-score exists
-        if pd.notna(current_zscore):
-            for rule in self.alert_engine.rules.values():
-                if rule.symbol == pair:
-                    await self.alert_engine.check_rule(rule, float(current_zscore))
+        await self.redis.cache_analytics_many(pair, metrics, ttl_map=self.ANALYTICS_TTLS)
+        
+        # Alerts for all pairs are evaluated in one batch after the cycle
+        self.alert_metrics[pair] = {
+            'zscore': metrics['zscore'],
+            'correlation': metrics['correlation']
+        }
     
     async def periodic_resampling_task(self):
         """
-        Background task for resampling tick data to OHLCV.
-        Runs every 30 seconds.
+        Background task keeping the OHLCV tables up to date.
+        
+        In 'stream' mode, closes bars whose interval has passed and writes all
+        closed bars in bulk every BAR_FLUSH_INTERVAL seconds. In 'resample'
+        mode, re-reads new ticks and resamples them every 30 seconds. With
+        continuous aggregates the database refreshes the bars itself.
         """
+        if self.ohlcv_mode == 'continuous_aggregate':
+            logger.info("OHLCV bars maintained by continuous aggregates")
+            return
+        
         while self.running:
             try:
-                for symbol in self.symbols:
-                    for interval in ['1s', '1m', '5m']:
-                        await self.db.resample_and_store(symbol, interval)
+                if self.ohlcv_mode == 'stream':
+                    self.bar_builder.close_stale()
+                    await self._write_closed_bars(self.bar_builder.drain_closed())
+                    await asyncio.sleep(self.bar_flush_interval)
+                else:
+                    for symbol in self.symbols:
+                        for interval in ['1s', '1m', '5m']:
+                            await self.db.resample_and_store(symbol, interval)
                 
-                await asyncio.sleep(30)
+                    await asyncio.sleep(30)
             except Exception as e:
                 logger.error(f"Error in resampling task: {e}")
-                await asyncio.sleep(60)
+                await asyncio.sleep(self.bar_flush_interval if self.ohlcv_mode == 'stream' else 60)
+    
+    async def _write_closed_bars(self, closed: dict):
+        """Write closed bars per interval; put them back if a write fails."""
+        for interval, bars in list(closed.items()):
+            try:
+                await self.db.upsert_ohlcv_bars(interval, bars)
+            except Exception:
+                self.bar_builder.requeue(closed)
+                raise
+            del closed[interval]
     
     async def start(self):
         """Start the application."""
@@ -365,7 +611,10 @@ class TradingAnalyticsApp:
         # Start background tasks
         tasks = [
             asyncio.create_task(self.ws_client.start()),
+            asyncio.create_task(self.flusher.run()),
+            asyncio.create_task(self.redis.run_tick_flusher()),
             asyncio.create_task(self.periodic_analytics_task()),
+            asyncio.create_task(self.live_zscore_task()),
             asyncio.create_task(self.periodic_resampling_task())
         ]
         
@@ -377,13 +626,23 @@ class TradingAnalyticsApp:
         logger.info("Stopping application...")
         self.running = False
         
-        # Flush remaining ticks
-        await self._flush_batch()
-        
-        # Stop WebSocket
+        # Stop WebSocket (drains queued ticks into the flusher)
         if self.ws_client:
             await self.ws_client.stop()
         
+        # Flush remaining ticks
+        await self.flusher.stop()
+        
+        # Write bars still open; they are flagged partial and merged with the
+        # rest of their interval if the app restarts before it ends
+        if self.ohlcv_mode == 'stream':
+            try:
+                await self._write_closed_bars(self.bar_builder.flush_all())
+            except Exception as e:
+                logger.error(f"Failed to write final OHLCV bars: {e}")
+        
+        self.pair_scheduler.shutdown()
+        
         # Disconnect from databases
         await self.db.disconnect()
         await self.redis.disconnect()
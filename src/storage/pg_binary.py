@@ -0,0 +1,136 @@
+"""
+Columnar decoding of PostgreSQL binary COPY output.
+
+COPY (SELECT ...) TO STDOUT WITH (FORMAT binary) returns every row as a
+field count followed by (byte length, big-endian value) per field. When all
+selected columns are fixed-width and non-NULL every row has the same size,
+so the whole payload can be viewed as one NumPy structured array and split
+into typed columns without creating a Python object per row or value.
+"""
+
+import struct
+from typing import Dict, Sequence, Tuple
+
+import numpy as np
+
+
+class BinaryCopyDecoder:
+    """Decode binary COPY payloads of fixed-width, non-NULL columns."""
+    
+    SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+    
+    # PostgreSQL type -> big-endian wire dtype
+    PG_TYPES = {
+        'timestamptz': '>i8',  # microseconds since 2000-01-01 UTC
+        'timestamp': '>i8',
+        'float8': '>f8',
+        'float4': '>f4',
+        'int8': '>i8',
+        'int4': '>i4',
+        'int2': '>i2',
+        'bool': '?'
+    }
+    
+    # 2000-01-01 minus 1970-01-01 in microseconds
+    PG_EPOCH_OFFSET_US = 946684800 * 1000000
+    
+    @staticmethod
+    def row_dtype(columns: Sequence[Tuple[str, str]]) -> np.dtype:
+        """Structured dtype of one COPY row for (name, pg_type) columns."""
+        fields = [('_field_count', '>i2')]
+        for i, (name, pg_type) in enumerate(columns):
+            if pg_type not in BinaryCopyDecoder.PG_TYPES:
+                raise ValueError(f"Unsupported column type for {name}: {pg_type}")
+            fields += [(f'_size_{i}', '>i4'), (name, BinaryCopyDecoder.PG_TYPES[pg_type])]
+        return np.dtype(fields)
+    
+    @staticmethod
+    def decode(data: bytes, columns: Sequence[Tuple[str, str]]) -> Dict[str, np.ndarray]:
+        """
+        Split a binary COPY payload into native-endian NumPy columns.
+        
+        Args:
+            data: Complete COPY output (header, rows, trailer)
+            columns: (name, pg_type) in SELECT order, see PG_TYPES
+        
+        Returns:
+            Dict of name -> array; timestamps as datetime64[us] (UTC)
+        
+        Raises:
+            ValueError: Malformed payload, NULLs or variable-width values
+        """
+        if not data.startswith(BinaryCopyDecoder.SIGNATURE):
+            raise ValueError("Not a binary COPY payload")
+        
+        _, extension_size = struct.unpack_from('>ii', data, len(BinaryCopyDecoder.SIGNATURE))
+        offset = len(BinaryCopyDecoder.SIGNATURE) + 8 + extension_size
+        
+        row_dtype = BinaryCopyDecoder.row_dtype(columns)
+        n_rows, remainder = divmod(len(data) - offset - 2, row_dtype.itemsize)
+        if remainder or struct.unpack_from('>h', data, len(data) - 2)[0] != -1:
+            raise ValueError("Rows are not fixed-width (NULL or variable-width values)")
+        
+        rows = np.frombuffer(data, dtype=row_dtype, count=n_rows, offset=offset)
+        
+        # Every row must carry the expected field count and value sizes
+        if n_rows and not (rows['_field_count'] == len(columns)).all():
+            raise ValueError("Unexpected field count in COPY rows")
+        for i, (name, _) in enumerate(columns):
+            if n_rows and not (rows[f'_size_{i}'] == row_dtype[name].itemsize).all():
+                raise ValueError(f"Column {name} has NULL or variable-width values")
+        
+        result = {}
+        for name, pg_type in columns:
+            values = rows[name].astype(row_dtype[name].newbyteorder('='))
+            if pg_type in ('timestamptz', 'timestamp'):
+                values = (values + BinaryCopyDecoder.PG_EPOCH_OFFSET_US).view('datetime64[us]')
+            result[name] = values
+        
+        return result
+    
+    @staticmethod
+    def encode(columns: Sequence[Tuple[str, str]], values: Dict[str, np.ndarray]) -> bytes:
+        """
+        Build a binary COPY payload from columns (inverse of decode).
+        
+        Used by benchmarks and checks; timestamps as datetime64 (UTC).
+        """
+        row_dtype = BinaryCopyDecoder.row_dtype(columns)
+        n_rows = len(values[columns[0][0]])
+        rows = np.empty(n_rows, dtype=row_dtype)
+        rows['_field_count'] = len(columns)
+        
+        for i, (name, pg_type) in enumerate(columns):
+            rows[f'_size_{i}'] = row_dtype[name].itemsize
+            column = np.asarray(values[name])
+            if pg_type in ('timestamptz', 'timestamp'):
+                column = column.astype('datetime64[us]').view(np.int64) - BinaryCopyDecoder.PG_EPOCH_OFFSET_US
+            rows[name] = column
+        
+        header = BinaryCopyDecoder.SIGNATURE + struct.pack('>ii', 0, 0)
+        return header + rows.tobytes() + struct.pack('>h', -1)
+
+
+if __name__ == "__main__":
+    import time
+    import pandas as pd
+    
+    columns = [('time', 'timestamptz'), ('price', 'float8'), ('size', 'float8'), ('is_buyer_maker', 'bool')]
+    n = 1_000_000
+    times = np.datetime64('2024-01-01T00:00:00', 'us') + np.arange(n) * 1000
+    values = {
+        'time': times,
+        'price': 45000 + np.random.randn(n).cumsum(),
+        'size': np.random.rand(n),
+        'is_buyer_maker': np.random.rand(n) > 0.5
+    }
+    payload = BinaryCopyDecoder.encode(columns, values)
+    
+    start = time.perf_counter()
+    decoded = BinaryCopyDecoder.decode(payload, columns)
+    df = pd.DataFrame(decoded)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+    
+    assert all(np.array_equal(decoded[name], values[name]) for name, _ in columns)
+    print(f"Decoded {n:,} rows ({len(payload) / 1e6:.1f} MB) in {elapsed_ms:.1f}ms")
+    print(df.head(3))
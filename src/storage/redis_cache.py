@@ -3,12 +3,17 @@ Redis cache manager for real-time data buffering and fast access.
 Used for: recent ticks buffer, alert state, computed analytics cache.
 """
 
+import asyncio
 import json
+import time
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
+import numpy as np
 import redis.asyncio as redis
 from loguru import logger
 
+from ingestion.ticks import tick_epoch_ms
+
 
 class RedisCache:
     """
@@ -18,13 +23,56 @@ class RedisCache:
     - ticks:{symbol}:buffer -> List of recent ticks (FIFO)
     - analytics:{symbol}:{metric} -> Cached analytics values
     - alerts:{alert_id} -> Alert state and history
+    
+    Writes are pipelined: ticks are micro-batched per symbol and flushed
+    (RPUSH + LTRIM + EXPIRE for every symbol) in a single MULTI/EXEC round
+    trip, and cache_analytics_many writes several metrics in one round trip.
+    run_tick_flusher() flushes batches that reach tick_flush_interval while
+    no further ticks arrive; a failed flush is re-queued and retried.
     """
     
-    def __init__(self, redis_url: str, max_buffer_size: int = 10000):
+    def __init__(
+        self,
+        redis_url: str,
+        max_buffer_size: int = 10000,
+        tick_batch_size: int = 1,
+        tick_flush_interval: float = 0.1
+    ):
+        """
+        Args:
+            redis_url: Redis connection URL
+            max_buffer_size: Max ticks kept per symbol in Redis
+            tick_batch_size: Flush pending ticks once this many are queued
+            tick_flush_interval: Flush pending ticks once the oldest is this old (seconds)
+        """
         self.redis_url = redis_url
         self.max_buffer_size = max_buffer_size
+        self.tick_batch_size = tick_batch_size
+        self.tick_flush_interval = tick_flush_interval
         self.client: Optional[redis.Redis] = None
         
+        # Pending tick micro-batches: symbol -> serialized ticks
+        self._pending_ticks: Dict[str, List[str]] = {}
+        self._pending_count = 0
+        self._oldest_pending: Optional[float] = None
+        self._retry_after = 0.0  # Size-triggered flushes wait after a failure
+        # One flush at a time, so a failed (re-queued) batch is never written
+        # after a newer one and the Redis lists stay in time order
+        self._flush_lock = asyncio.Lock()
+        self.running = False
+        
+        # Pipeline flush statistics
+        self.flush_stats = {
+            'flush_count': 0,
+            'total_items': 0,
+            'last_batch_size': 0,
+            'last_latency_ms': 0.0,
+            'max_latency_ms': 0.0,
+            'total_latency_ms': 0.0,
+            'failed_flushes': 0,
+            'dropped_ticks': 0
+        }
+        
     async def connect(self):
         """Connect to Redis."""
         self.client = await redis.from_url(
@@ -36,7 +84,9 @@ class RedisCache:
         
     async def disconnect(self):
         """Close Redis connection."""
+        self.running = False
         if self.client:
+            await self.flush_ticks()
             await self.client.close()
             logger.info("Redis connection closed")
     
@@ -44,29 +94,139 @@ class RedisCache:
         """
         Buffer a tick in Redis for fast access.
         Maintains a sliding window of recent ticks.
+        
+        Ticks are queued locally and written in one pipeline once
+        tick_batch_size ticks are pending or the oldest pending tick is
+        older than tick_flush_interval.
         """
         symbol = tick['symbol']
-        key = f"ticks:{symbol}:buffer"
         
-        # Serialize tick with timestamp
+        # Serialize tick with integer epoch-ms timestamp
         tick_data = {
-            'timestamp': tick['timestamp'].isoformat(),
+            'timestamp_ms': tick_epoch_ms(tick),
             'price': tick['price'],
             'size': tick['size'],
             'is_buyer_maker': tick.get('is_buyer_maker', False)
         }
         
-        # Push to list (right side = newest)
-        await self.client.rpush(key, json.dumps(tick_data))
+        self._pending_ticks.setdefault(symbol, []).append(json.dumps(tick_data))
+        self._pending_count += 1
+        
+        now = time.perf_counter()
+        if self._oldest_pending is None:
+            self._oldest_pending = now
+        
+        if now < self._retry_after or self._flush_lock.locked():
+            return  # The running flush or run_tick_flusher picks these up
+        
+        if self._pending_count >= self.tick_batch_size or \
+           now - self._oldest_pending >= self.tick_flush_interval:
+            await self.flush_ticks()
+    
+    async def run_tick_flusher(self):
+        """
+        Flush pending ticks once the oldest is tick_flush_interval old.
+        
+        buffer_tick() only checks the age when another tick arrives; run this
+        as a background task so a symbol that goes quiet is still written.
+        """
+        self.running = True
+        
+        while self.running:
+            await asyncio.sleep(self.tick_flush_interval)
+            
+            oldest = self._oldest_pending
+            if oldest is None or self.client is None:
+                continue
+            if time.perf_counter() - oldest >= self.tick_flush_interval:
+                await self.flush_ticks()
+    
+    async def flush_ticks(self, symbol: Optional[str] = None):
+        """
+        Write pending ticks (all symbols, or one) in a single MULTI/EXEC pipeline.
+        """
+        async with self._flush_lock:
+            await self._flush_ticks(symbol)
+    
+    async def _flush_ticks(self, symbol: Optional[str]):
+        if symbol is not None:
+            batches = {symbol: self._pending_ticks.pop(symbol)} if symbol in self._pending_ticks else {}
+        else:
+            batches, self._pending_ticks = self._pending_ticks, {}
+        
+        if not batches:
+            return
         
-        # Trim to maintain max size (keep most recent)
-        await self.client.ltrim(key, -self.max_buffer_size, -1)
+        batch_size = sum(len(items) for items in batches.values())
+        oldest_pending = self._oldest_pending
+        self._pending_count -= batch_size
+        if not self._pending_ticks:
+            self._oldest_pending = None
+        
+        start = time.perf_counter()
+        
+        try:
+            async with self.client.pipeline(transaction=True) as pipe:
+                for sym, items in batches.items():
+                    key = f"ticks:{sym}:buffer"
+                    # Push to list (right side = newest), trim to most recent, expire in 1 hour
+                    pipe.rpush(key, *items)
+                    pipe.ltrim(key, -self.max_buffer_size, -1)
+                    pipe.expire(key, 3600)
+                await pipe.execute()
+        except Exception as e:
+            self._requeue_ticks(batches, oldest_pending)
+            self.flush_stats['failed_flushes'] += 1
+            self._retry_after = time.perf_counter() + self.tick_flush_interval
+            logger.error(f"Redis tick flush failed, re-queued {batch_size} ticks: {e}")
+            return
+        
+        self._retry_after = 0.0
+        self._record_flush(batch_size, start)
+    
+    def _requeue_ticks(self, batches: Dict[str, List[str]], oldest_pending: Optional[float]):
+        """Put a failed batch back in front of newer pending ticks."""
+        for sym, items in batches.items():
+            merged = items + self._pending_ticks.get(sym, [])
+            # Redis keeps only the newest max_buffer_size per symbol anyway
+            dropped = max(0, len(merged) - self.max_buffer_size)
+            self._pending_ticks[sym] = merged[dropped:]
+            self._pending_count += len(items) - dropped
+            self.flush_stats['dropped_ticks'] += dropped
+        
+        if oldest_pending is not None:
+            self._oldest_pending = oldest_pending
+    
+    async def _flush_pending_for(self, symbol: str):
+        """Make queued ticks for a symbol visible before reading it back."""
+        if symbol in self._pending_ticks:
+            await self.flush_ticks(symbol)
+    
+    def _record_flush(self, batch_size: int, start: float):
+        """Update pipeline flush statistics."""
+        latency_ms = (time.perf_counter() - start) * 1000
+        stats = self.flush_stats
+        stats['flush_count'] += 1
+        stats['total_items'] += batch_size
+        stats['last_batch_size'] = batch_size
+        stats['last_latency_ms'] = latency_ms
+        stats['max_latency_ms'] = max(stats['max_latency_ms'], latency_ms)
+        stats['total_latency_ms'] += latency_ms
         
-        # Set expiry to 1 hour
-        await self.client.expire(key, 3600)
+        logger.debug(f"Redis pipeline flush: {batch_size} items in {latency_ms:.2f}ms")
+    
+    def get_flush_stats(self) -> dict:
+        """Pipeline flush statistics with averages."""
+        stats = dict(self.flush_stats)
+        count = stats['flush_count']
+        stats['avg_batch_size'] = stats['total_items'] / count if count else 0.0
+        stats['avg_latency_ms'] = stats['total_latency_ms'] / count if count else 0.0
+        stats['pending_ticks'] = self._pending_count
+        return stats
     
     async def get_recent_ticks(self, symbol: str, count: int = 1000) -> List[dict]:
         """Get recent ticks from buffer."""
+        await self._flush_pending_for(symbol)
         key = f"ticks:{symbol}:buffer"
         
         # Get most recent 'count' ticks
@@ -75,7 +235,10 @@ class RedisCache:
         ticks = []
         for tick_str in tick_strings:
             tick = json.loads(tick_str)
-            tick['timestamp'] = datetime.fromisoformat(tick['timestamp'])
+            if 'timestamp_ms' in tick:
+                tick['timestamp'] = datetime.fromtimestamp(tick['timestamp_ms'] / 1000.0)
+            else:
+                tick['timestamp'] = datetime.fromisoformat(tick['timestamp'])
             ticks.append(tick)
         
         return ticks
@@ -105,6 +268,64 @@ class RedisCache:
         
         await self.client.setex(key, ttl, json.dumps(data))
     
+    async def cache_analytics_many(
+        self,
+        symbol: str,
+        metrics: Dict[str, any],
+        ttl_map: Optional[Dict[str, int]] = None,
+        default_ttl: int = 60
+    ):
+        """
+        Cache several analytics values in one pipelined round trip.
+        
+        Args:
+            symbol: Trading symbol or pair
+            metrics: {metric: value} (values will be JSON serialized)
+            ttl_map: Optional per-metric TTL in seconds
+            default_ttl: TTL for metrics missing from ttl_map
+        """
+        if not metrics:
+            return
+        
+        ttl_map = ttl_map or {}
+        timestamp = datetime.now().isoformat()
+        start = time.perf_counter()
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            for metric, value in metrics.items():
+                data = {'value': value, 'timestamp': timestamp}
+                pipe.setex(
+                    f"analytics:{symbol}:{metric}",
+                    ttl_map.get(metric, default_ttl),
+                    json.dumps(data)
+                )
+            await pipe.execute()
+        
+        self._record_flush(len(metrics), start)
+    
+    async def cache_metric_many(self, metric: str, values: Dict[str, any], ttl: int = 60):
+        """
+        Cache one metric for several symbols in one pipelined round trip.
+        
+        Args:
+            metric: Metric name (e.g., 'zscore')
+            values: {symbol or pair: value} (values will be JSON serialized)
+            ttl: Time to live in seconds
+        """
+        if not values:
+            return
+        
+        timestamp = datetime.now().isoformat()
+        start = time.perf_counter()
+        
+        async with self.client.pipeline(transaction=False) as pipe:
+            for symbol, value in values.items():
+                data = {'value': value, 'timestamp': timestamp}
+                pipe.setex(f"analytics:{symbol}:{metric}", ttl, json.dumps(data))
+            await pipe.execute()
+        
+        self._record_flush(len(values), start)
+    
     async def get_cached_analytics(
         self, 
         symbol: str, 
@@ -148,11 +369,15 @@ class RedisCache:
     
     async def get_buffer_size(self, symbol: str) -> int:
         """Get current buffer size for a symbol."""
+        await self._flush_pending_for(symbol)
         key = f"ticks:{symbol}:buffer"
         return await self.client.llen(key)
     
     async def clear_buffer(self, symbol: str):
         """Clear tick buffer for a symbol."""
+        self._pending_count -= len(self._pending_ticks.pop(symbol, []))
+        if not self._pending_ticks:
+            self._oldest_pending = None
         key = f"ticks:{symbol}:buffer"
         await self.client.delete(key)
         logger.info(f"Cleared buffer for {symbol}")
@@ -173,48 +398,181 @@ class RedisCache:
             return False
 
 
+class TickRingBuffer:
+    """
+    Preallocated columnar ring buffer for one symbol.
+    
+    Columns: timestamp (int64 epoch ns), price (float64), size (float64),
+    side (int8: +1 buy, -1 sell) - 25 bytes per tick.
+    
+    Column reads return zero-copy views into the ring when the requested
+    range is contiguous, and a single concatenated copy when it wraps around.
+    Views are overwritten as new ticks arrive; copy them if they must outlive
+    the current (synchronous) computation.
+    """
+    
+    COLUMNS = ('timestamp_ns', 'price', 'size', 'side')
+    
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.timestamp_ns = np.zeros(capacity, dtype=np.int64)
+        self.price = np.zeros(capacity, dtype=np.float64)
+        self.size = np.zeros(capacity, dtype=np.float64)
+        self.side = np.zeros(capacity, dtype=np.int8)
+        self._head = 0  # Next write position
+        self._count = 0
+    
+    def __len__(self) -> int:
+        return self._count
+    
+    @property
+    def nbytes(self) -> int:
+        """Memory used by the preallocated columns."""
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+    
+    def append(self, timestamp_ns: int, price: float, size: float, side: int):
+        """Write one tick, overwriting the oldest once full."""
+        i = self._head
+        self.timestamp_ns[i] = timestamp_ns
+        self.price[i] = price
+        self.size[i] = size
+        self.side[i] = side
+        
+        self._head = (i + 1) % self.capacity
+        if self._count < self.capacity:
+            self._count += 1
+    
+    def column(self, name: str, count: Optional[int] = None) -> np.ndarray:
+        """
+        Return the most recent `count` values of a column, oldest first.
+        """
+        if name not in self.COLUMNS:
+            raise ValueError(f"Unknown column: {name}")
+        
+        n = self._count if count is None else min(count, self._count)
+        data = getattr(self, name)
+        
+        if n == 0:
+            return data[:0]
+        
+        start = (self._head - n) % self.capacity
+        end = start + n
+        
+        if end <= self.capacity:
+            return data[start:end]
+        
+        # Range wraps around the end of the ring
+        return np.concatenate((data[start:], data[:end - self.capacity]))
+    
+    def latest(self, name: str):
+        """Most recent value of a column (None if empty)."""
+        if self._count == 0:
+            return None
+        return getattr(self, name)[(self._head - 1) % self.capacity]
+    
+    def clear(self):
+        """Drop all ticks (keeps the allocation)."""
+        self._head = 0
+        self._count = 0
+
+
 class TickBuffer:
     """
     In-memory tick buffer for ultra-low latency access.
     Complements Redis for immediate analytics computation.
+    
+    Backed by one TickRingBuffer per symbol, so analytics can read float64
+    price arrays directly (see get_prices) instead of rebuilding lists of dicts.
     """
     
     def __init__(self, max_size: int = 1000):
         self.max_size = max_size
-        self.buffers: Dict[str, List[dict]] = {}
+        self.buffers: Dict[str, TickRingBuffer] = {}
+    
+    @staticmethod
+    def _to_ns(tick: dict) -> int:
+        """Trade time of a tick as integer epoch ns."""
+        if 'timestamp_ms' in tick:
+            return tick['timestamp_ms'] * 1_000_000
+        return int(round(tick['timestamp'].timestamp() * 1_000_000)) * 1_000
     
     def add_tick(self, tick: dict):
         """Add tick to in-memory buffer."""
         symbol = tick['symbol']
         
         if symbol not in self.buffers:
-            self.buffers[symbol] = []
+            self.buffers[symbol] = TickRingBuffer(self.max_size)
         
-        self.buffers[symbol].append(tick)
+        # is_buyer_maker = True means the aggressor sold
+        side = -1 if tick.get('is_buyer_maker', False) else 1
         
-        # Trim if needed
-        if len(self.buffers[symbol]) > self.max_size:
-            self.buffers[symbol] = self.buffers[symbol][-self.max_size:]
+        self.buffers[symbol].append(
+            self._to_ns(tick),
+            tick['price'],
+            tick['size'],
+            side
+        )
+    
+    def get_size(self, symbol: str) -> int:
+        """Number of ticks currently buffered for a symbol."""
+        buffer = self.buffers.get(symbol)
+        return len(buffer) if buffer is not None else 0
+    
+    def get_column(self, symbol: str, column: str, count: Optional[int] = None) -> np.ndarray:
+        """Get the most recent values of one column (view where possible)."""
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            return np.empty(0, dtype=np.float64)
+        return buffer.column(column, count)
+    
+    def get_prices(self, symbol: str, count: Optional[int] = None) -> np.ndarray:
+        """Get recent prices as a float64 array, oldest first."""
+        return self.get_column(symbol, 'price', count)
+    
+    def get_timestamps_ns(self, symbol: str, count: Optional[int] = None) -> np.ndarray:
+        """Get recent timestamps as int64 epoch nanoseconds, oldest first."""
+        return self.get_column(symbol, 'timestamp_ns', count)
     
     def get_ticks(self, symbol: str, count: Optional[int] = None) -> List[dict]:
-        """Get recent ticks from buffer."""
-        if symbol not in self.buffers:
+        """
+        Get recent ticks from buffer as dicts.
+        
+        Materializes Python objects per tick; prefer get_prices/get_column
+        on hot paths.
+        """
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
             return []
         
-        if count is None:
-            return self.buffers[symbol]
+        timestamps = buffer.column('timestamp_ns', count)
+        prices = buffer.column('price', count)
+        sizes = buffer.column('size', count)
+        sides = buffer.column('side', count)
         
-        return self.buffers[symbol][-count:]
+        return [
+            {
+                'symbol': symbol,
+                'timestamp': datetime.fromtimestamp(ts / 1e9),
+                'price': float(price),
+                'size': float(size),
+                'is_buyer_maker': bool(side < 0)
+            }
+            for ts, price, size, side in zip(timestamps.tolist(), prices.tolist(), sizes.tolist(), sides.tolist())
+        ]
     
     def get_latest_price(self, symbol: str) -> Optional[float]:
         """Get most recent price for a symbol."""
-        ticks = self.get_ticks(symbol, count=1)
-        return ticks[0]['price'] if ticks else None
+        buffer = self.buffers.get(symbol)
+        if buffer is None:
+            return None
+        price = buffer.latest('price')
+        return float(price) if price is not None else None
     
     def clear(self, symbol: Optional[str] = None):
         """Clear buffer for specific symbol or all."""
         if symbol:
-            self.buffers[symbol] = []
+            if symbol in self.buffers:
+                self.buffers[symbol].clear()
         else:
             self.buffers = {}
 
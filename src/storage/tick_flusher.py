@@ -0,0 +1,315 @@
+"""
+Background tick flusher: decouples tick ingestion from database latency.
+Ticks are appended to an in-memory buffer; a dedicated task swaps buffers
+and writes them with bounded concurrency, retries and spill-to-disk.
+"""
+
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+from loguru import logger
+
+from ingestion.ticks import tick_epoch_ms
+
+
+class BackgroundTickFlusher:
+    """
+    Double-buffered, non-blocking tick writer.
+    
+    - add() only appends to the active buffer; it never awaits the database
+    - The flusher task swaps the active buffer out when it reaches batch_size
+      or flush_interval elapses, and writes it in the background
+    - At most max_in_flight batches are written concurrently
+    - Failed writes are retried max_retries times with exponential backoff,
+      then spilled to JSONL files in spill_dir
+    - If the active buffer outgrows max_buffered_ticks while all write slots
+      are busy, it is spilled instead of growing without bound
+    - Spill files are written and read in a worker thread, never on the event
+      loop; batches that cannot be spilled (disk errors, or more than
+      MAX_PENDING_SPILLS spills queued) are dropped and counted
+    - Spilled files are replayed after the next successful write
+    """
+    
+    MAX_PENDING_SPILLS = 4
+    
+    def __init__(
+        self,
+        insert_fn: Callable[[List[dict]], Awaitable[None]],
+        batch_size: int = 1000,
+        flush_interval: float = 5.0,
+        max_in_flight: int = 2,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        max_buffered_ticks: Optional[int] = None,
+        spill_dir: str = 'data/spill'
+    ):
+        """
+        Args:
+            insert_fn: Async function writing a list of ticks to the database
+            batch_size: Ticks per write
+            flush_interval: Max seconds before a partial buffer is written
+            max_in_flight: Max concurrent batch writes
+            max_retries: Retries per batch before spilling to disk
+            retry_backoff: Initial retry delay in seconds (doubles each retry)
+            max_buffered_ticks: Spill the active buffer beyond this size
+                (default: 10 x batch_size)
+            spill_dir: Directory for spilled batches
+        """
+        self.insert_fn = insert_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_in_flight = max_in_flight
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_buffered_ticks = max_buffered_ticks or batch_size * 10
+        self.spill_dir = Path(spill_dir)
+        
+        self._active: List[dict] = []
+        self._batch_ready = asyncio.Event()
+        self._slots = asyncio.Semaphore(max_in_flight)
+        self._in_flight: set = set()
+        self._spills: set = set()
+        self._replaying = False
+        self._spill_seq = 0
+        self.running = False
+        
+        self.stats = {
+            'flushed_batches': 0,
+            'flushed_ticks': 0,
+            'retries': 0,
+            'spilled_batches': 0,
+            'spilled_ticks': 0,
+            'replayed_files': 0,
+            'dropped_ticks': 0,
+            'last_latency_ms': 0.0
+        }
+    
+    @property
+    def buffered(self) -> int:
+        """Ticks waiting in the active buffer."""
+        return len(self._active)
+    
+    @property
+    def in_flight(self) -> int:
+        """Batches currently being written."""
+        return len(self._in_flight)
+    
+    def add(self, tick: dict):
+        """Queue a tick for writing (never blocks on the database)."""
+        self._active.append(tick)
+        
+        if len(self._active) >= self.max_buffered_ticks and self._slots.locked():
+            # Every write slot is busy (the flusher may be parked waiting for
+            # one) and the buffer is over budget
+            batch, self._active = self._active, []
+            self._spill_in_background(batch, reason="buffer over budget")
+            return
+        
+        if len(self._active) >= self.batch_size:
+            self._batch_ready.set()
+    
+    async def run(self):
+        """Flusher loop; run as a background task."""
+        self.running = True
+        
+        # Pick up batches spilled by a previous run
+        self._maybe_replay()
+        
+        while self.running:
+            try:
+                await asyncio.wait_for(self._batch_ready.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._batch_ready.clear()
+            
+            await self._dispatch()
+    
+    async def _dispatch(self):
+        """Swap out the active buffer and start writing it."""
+        if not self._active:
+            return
+        
+        await self._slots.acquire()
+        if not self._active:
+            # Spilled by add() while waiting for the slot
+            self._slots.release()
+            return
+        batch, self._active = self._active, []
+        
+        task = asyncio.create_task(self._write(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+    
+    async def _write(self, batch: List[dict]):
+        """Write one batch with bounded retries, spilling on final failure."""
+        try:
+            if await self._write_with_retry(batch):
+                self._maybe_replay()
+            else:
+                await self._spill(batch, reason="write failed")
+        finally:
+            self._slots.release()
+    
+    async def _write_with_retry(self, batch: List[dict]) -> bool:
+        delay = self.retry_backoff
+        
+        for attempt in range(self.max_retries + 1):
+            start = time.perf_counter()
+            try:
+                await self.insert_fn(batch)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Batch write failed after {attempt + 1} attempts: {e}")
+                    return False
+                
+                self.stats['retries'] += 1
+                logger.warning(f"Batch write failed ({e}), retrying in {delay:.1f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+                continue
+            
+            self.stats['flushed_batches'] += 1
+            self.stats['flushed_ticks'] += len(batch)
+            self.stats['last_latency_ms'] = (time.perf_counter() - start) * 1000
+            logger.debug(f"Flushed {len(batch)} ticks in {self.stats['last_latency_ms']:.1f}ms")
+            return True
+        
+        return False
+    
+    def _spill_in_background(self, batch: List[dict], reason: str):
+        """Hand a batch to a spill task so the caller never waits on the disk."""
+        if len(self._spills) >= self.MAX_PENDING_SPILLS:
+            self.stats['dropped_ticks'] += len(batch)
+            logger.error(f"Dropped {len(batch)} ticks ({reason}, {len(self._spills)} spills pending)")
+            return
+        
+        task = asyncio.create_task(self._spill(batch, reason))
+        for tasks in (self._spills, self._in_flight):
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    
+    async def _spill(self, batch: List[dict], reason: str):
+        """Write a batch to a JSONL spill file from a worker thread."""
+        self._spill_seq += 1
+        path = self.spill_dir / f"ticks-{int(time.time() * 1000)}-{self._spill_seq}.jsonl"
+        
+        try:
+            await asyncio.to_thread(self._write_spill_file, path, batch)
+        except OSError as e:
+            self.stats['dropped_ticks'] += len(batch)
+            logger.error(f"Could not spill {len(batch)} ticks to {path} ({reason}), dropped: {e}")
+            return
+        
+        self.stats['spilled_batches'] += 1
+        self.stats['spilled_ticks'] += len(batch)
+        logger.warning(f"Spilled {len(batch)} ticks to {path} ({reason})")
+    
+    @staticmethod
+    def _write_spill_file(path: Path, batch: List[dict]):
+        """Serialize a batch; the file only gets its .jsonl name once complete."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        partial = path.with_name(path.name + '.tmp')
+        
+        with open(partial, 'w') as f:
+            for tick in batch:
+                f.write(json.dumps({
+                    'symbol': tick['symbol'],
+                    'timestamp_ms': tick_epoch_ms(tick),
+                    'price': tick['price'],
+                    'size': tick['size'],
+                    'trade_id': tick.get('trade_id'),
+                    'is_buyer_maker': tick.get('is_buyer_maker', False)
+                }) + '\n')
+        partial.replace(path)
+    
+    @staticmethod
+    def _read_spill_file(path: Path) -> List[dict]:
+        with open(path) as f:
+            return [json.loads(line) for line in f if line.strip()]
+    
+    def _maybe_replay(self):
+        """Start replaying spill files once the database accepts writes again."""
+        if self._replaying or not self.spill_dir.exists():
+            return
+        if not any(self.spill_dir.glob('ticks-*.jsonl')):
+            return
+        
+        self._replaying = True
+        task = asyncio.create_task(self._replay_spill())
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+    
+    async def _replay_spill(self):
+        """Write spilled batches back, oldest first; stop at the first failure."""
+        try:
+            for path in sorted(self.spill_dir.glob('ticks-*.jsonl')):
+                batch = await asyncio.to_thread(self._read_spill_file, path)
+                
+                async with self._slots:
+                    ok = await self._write_with_retry(batch)
+                
+                if not ok:
+                    return
+                
+                await asyncio.to_thread(path.unlink)
+                self.stats['replayed_files'] += 1
+                logger.info(f"Replayed {len(batch)} spilled ticks from {path.name}")
+        finally:
+            self._replaying = False
+    
+    async def stop(self, timeout: float = 30.0):
+        """Write what is buffered, wait for in-flight writes, spill leftovers."""
+        self.running = False
+        self._batch_ready.set()
+        
+        while self._active:
+            await self._dispatch()
+        
+        if self._in_flight:
+            done, pending = await asyncio.wait(set(self._in_flight), timeout=timeout)
+            for task in pending:
+                task.cancel()
+            if pending:
+                logger.warning(f"Cancelled {len(pending)} pending writes on shutdown")
+        
+        if self._active:
+            batch, self._active = self._active, []
+            await self._spill(batch, reason="shutdown")
+    
+    def get_stats(self) -> dict:
+        """Flush statistics plus current buffer state."""
+        return dict(self.stats, buffered=self.buffered, in_flight=self.in_flight)
+
+
+if __name__ == "__main__":
+    import random
+    import tempfile
+    
+    async def flaky_insert(batch):
+        await asyncio.sleep(0.05)
+        if random.random() < 0.5:
+            raise ConnectionError("database unavailable")
+    
+    async def test():
+        flusher = BackgroundTickFlusher(
+            flaky_insert, batch_size=100, flush_interval=0.2,
+            max_retries=1, retry_backoff=0.01, spill_dir=tempfile.mkdtemp()
+        )
+        task = asyncio.create_task(flusher.run())
+        
+        start = time.perf_counter()
+        for i in range(2000):
+            flusher.add({'symbol': 'btcusdt', 'timestamp_ms': i, 'price': 1.0, 'size': 1.0, 'trade_id': i})
+            if i % 100 == 0:
+                await asyncio.sleep(0)
+        print(f"add() latency: {(time.perf_counter() - start) / 2000 * 1e6:.2f} µs/tick")
+        
+        await asyncio.sleep(1)
+        await flusher.stop()
+        await task
+        print(f"Stats: {flusher.get_stats()}")
+    
+    asyncio.run(test())
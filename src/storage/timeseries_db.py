@@ -4,36 +4,94 @@ Handles schema creation, data insertion, and time-series queries.
 """
 
 import asyncio
+import struct
 from datetime import datetime, timedelta
-from typing import List, Optional, Dict
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Union
 import asyncpg
 from loguru import logger
+import numpy as np
 import pandas as pd
 
+from ingestion.ticks import tick_epoch_ms
+from storage.bar_builder import BAR_INTERVALS_MS, aggregate_bars
+from storage.pg_binary import BinaryCopyDecoder
+
 
 class TimeSeriesDB:
     """
     Async TimescaleDB manager for tick and resampled data.
     
     Schema:
-    - ticks: Raw tick data
-    - ohlcv_1s, ohlcv_1m, ohlcv_5m: Resampled OHLCV data
+    - ticks: Raw tick data (optionally compressed / expired by policy)
+    - ohlcv_1s, ohlcv_1m, ohlcv_5m: OHLCV tables filled from Python
+      (ohlcv_source='tables'), or
+    - ohlcv_1s_cagg, ohlcv_1m_cagg, ohlcv_5m_cagg: Continuous aggregates
+      maintained by TimescaleDB (ohlcv_source='continuous_aggregate')
+    
+    get_ohlcv() reads from whichever source is active; with 'auto' the
+    source is detected on connect (continuous aggregates win if present).
     """
     
-    def __init__(self, connection_string: str):
+    OHLCV_INTERVALS = ('1s', '1m', '5m')
+    OHLCV_SOURCES = ('auto', 'tables', 'continuous_aggregate')
+    
+    # interval -> (bucket width, source relation, refresh start offset,
+    #              refresh end offset, refresh schedule)
+    # 1m and 5m are hierarchical aggregates on top of the 1s aggregate
+    CAGG_DEFINITIONS = {
+        '1s': ('1 second', 'ticks', '10 minutes', '1 second', '5 seconds'),
+        '1m': ('1 minute', 'ohlcv_1s_cagg', '2 hours', '1 minute', '30 seconds'),
+        '5m': ('5 minutes', 'ohlcv_1m_cagg', '6 hours', '5 minutes', '1 minute')
+    }
+    
+    def __init__(
+        self,
+        connection_string: str,
+        ohlcv_source: str = 'auto',
+        compress_after_hours: float = 0,
+        retention_days: float = 0
+    ):
+        """
+        Args:
+            connection_string: PostgreSQL DSN
+            ohlcv_source: 'tables', 'continuous_aggregate' or 'auto'
+            compress_after_hours: Compress ticks chunks older than this (0 = off)
+            retention_days: Drop ticks chunks older than this (0 = off). Must
+                exceed the continuous aggregate refresh windows.
+        """
+        if ohlcv_source not in self.OHLCV_SOURCES:
+            raise ValueError(f"Invalid OHLCV source: {ohlcv_source}")
+        
         self.connection_string = connection_string
         self.pool: Optional[asyncpg.Pool] = None
+        self.ohlcv_source = ohlcv_source
+        self.compress_after_hours = compress_after_hours
+        self.retention_days = retention_days
         
-    async def connect(self):
-        """Create connection pool."""
+    async def connect(self, init_schema: bool = True, min_size: int = 5, max_size: int = 20):
+        """
+        Create connection pool.
+        
+        Args:
+            init_schema: Run the schema DDL (tables, hypertables, policies).
+                Readers such as the dashboard pass False and rely on the
+                ingestion process having created the schema.
+            min_size: Minimum pool connections
+            max_size: Maximum pool connections
+        """
         self.pool = await asyncpg.create_pool(
             self.connection_string,
-            min_size=5,
-            max_size=20,
+            min_size=min_size,
+            max_size=max_size,
             command_timeout=60
         )
         logger.info("Database connection pool created")
-        await self._initialize_schema()
+        if init_schema:
+            await self._initialize_schema()
+        
+        if self.ohlcv_source == 'auto':
+            self.ohlcv_source = await self._detect_ohlcv_source()
+            logger.info(f"Reading OHLCV from {self.ohlcv_source}")
         
     async def disconnect(self):
         """Close connection pool."""
@@ -76,6 +134,13 @@ class TimeSeriesDB:
                 ON ticks (symbol, time DESC);
             """)
             
+            await self._apply_tick_policies(conn)
+            
+            if self.ohlcv_source == 'continuous_aggregate':
+                await self._create_continuous_aggregates(conn)
+                logger.info("Database schema initialized")
+                return
+            
             # Create OHLCV tables for different timeframes
             for interval in ['1s', '1m', '5m']:
                 await conn.execute(f"""
@@ -88,9 +153,15 @@ class TimeSeriesDB:
                         close DOUBLE PRECISION NOT NULL,
                         volume DOUBLE PRECISION NOT NULL,
                         trade_count INTEGER,
+                        partial BOOLEAN NOT NULL DEFAULT FALSE,
                         PRIMARY KEY (time, symbol)
                     );
                 """)
+                # Tables created before partial bars were tracked
+                await conn.execute(f"""
+                    ALTER TABLE ohlcv_{interval}
+                    ADD COLUMN IF NOT EXISTS partial BOOLEAN NOT NULL DEFAULT FALSE;
+                """)
                 
                 try:
                     await conn.execute(f"""
@@ -108,14 +179,111 @@ class TimeSeriesDB:
             
             logger.info("Database schema initialized")
     
+    async def _apply_tick_policies(self, conn):
+        """Native compression and retention on ticks chunks (if configured)."""
+        if self.compress_after_hours:
+            try:
+                await conn.execute("""
+                    ALTER TABLE ticks SET (
+                        timescaledb.compress,
+                        timescaledb.compress_segmentby = 'symbol',
+                        timescaledb.compress_orderby = 'time DESC'
+                    );
+                """)
+            except Exception as e:
+                logger.debug(f"Compression settings on ticks: {e}")
+            
+            await conn.execute(f"""
+                SELECT add_compression_policy('ticks', INTERVAL '{self.compress_after_hours} hours',
+                                              if_not_exists => TRUE);
+            """)
+        
+        if self.retention_days:
+            await conn.execute(f"""
+                SELECT add_retention_policy('ticks', INTERVAL '{self.retention_days} days',
+                                            if_not_exists => TRUE);
+            """)
+    
+    async def _create_continuous_aggregates(self, conn):
+        """
+        Define the OHLCV tiers as continuous aggregates with refresh policies.
+        
+        Real-time aggregation (materialized_only = false) serves the newest
+        buckets from raw data until the next refresh materializes them.
+        Hierarchical aggregates require TimescaleDB 2.9+.
+        """
+        for interval in self.OHLCV_INTERVALS:
+            bucket, source, start_offset, end_offset, schedule = self.CAGG_DEFINITIONS[interval]
+            view = f"ohlcv_{interval}_cagg"
+            
+            if source == 'ticks':
+                aggregates = """
+                    first(price, time) AS open,
+                    max(price) AS high,
+                    min(price) AS low,
+                    last(price, time) AS close,
+                    sum(size) AS volume,
+                    count(*)::integer AS trade_count
+                """
+            else:
+                aggregates = """
+                    first(open, time) AS open,
+                    max(high) AS high,
+                    min(low) AS low,
+                    last(close, time) AS close,
+                    sum(volume) AS volume,
+                    sum(trade_count)::integer AS trade_count
+                """
+            
+            await conn.execute(f"""
+                CREATE MATERIALIZED VIEW IF NOT EXISTS {view}
+                WITH (timescaledb.continuous, timescaledb.materialized_only = false) AS
+                SELECT time_bucket(INTERVAL '{bucket}', time) AS time,
+                       symbol,
+                       {aggregates}
+                FROM {source}
+                GROUP BY 1, 2
+                WITH NO DATA;
+            """)
+            
+            await conn.execute(f"""
+                SELECT add_continuous_aggregate_policy('{view}',
+                    start_offset => INTERVAL '{start_offset}',
+                    end_offset => INTERVAL '{end_offset}',
+                    schedule_interval => INTERVAL '{schedule}',
+                    if_not_exists => TRUE);
+            """)
+    
+    async def _detect_ohlcv_source(self) -> str:
+        """'continuous_aggregate' if the OHLCV aggregates exist, else 'tables'."""
+        async with self.pool.acquire() as conn:
+            try:
+                found = await conn.fetchval("""
+                    SELECT COUNT(*) FROM timescaledb_information.continuous_aggregates
+                    WHERE view_name = ANY($1::text[]);
+                """, [f"ohlcv_{i}_cagg" for i in self.OHLCV_INTERVALS])
+            except Exception as e:
+                logger.debug(f"Continuous aggregate lookup failed: {e}")
+                return 'tables'
+        
+        return 'continuous_aggregate' if found == len(self.OHLCV_INTERVALS) else 'tables'
+    
+    def _ohlcv_relation(self, interval: str) -> str:
+        """Table or view holding OHLCV bars for an interval."""
+        if interval not in self.OHLCV_INTERVALS:
+            raise ValueError(f"Invalid interval: {interval}")
+        if self.ohlcv_source == 'continuous_aggregate':
+            return f"ohlcv_{interval}_cagg"
+        return f"ohlcv_{interval}"
+    
     async def insert_tick(self, tick: dict):
         """Insert a single tick into the database."""
         async with self.pool.acquire() as conn:
             await conn.execute("""
                 INSERT INTO ticks (time, symbol, price, size, trade_id, is_buyer_maker)
-                VALUES ($1, $2, $3, $4, $5, $6)
+                VALUES (to_timestamp($1::double precision / 1000), $2, $3, $4, $5, $6)
                 ON CONFLICT (time, symbol, trade_id) DO NOTHING;
-            """, tick['timestamp'], tick['symbol'], tick['price'], 
+            """, tick_epoch_ms(tick), tick['symbol'], tick['price'], 
                 tick['size'], tick['trade_id'], tick['is_buyer_maker'])
     
     async def insert_ticks_batch(self, ticks: List[dict]):
@@ -126,117 +294,379 @@ class TimeSeriesDB:
         async with self.pool.acquire() as conn:
             await conn.executemany("""
                 INSERT INTO ticks (time, symbol, price, size, trade_id, is_buyer_maker)
-                VALUES ($1, $2, $3, $4, $5, $6)
+                VALUES (to_timestamp($1::double precision / 1000), $2, $3, $4, $5, $6)
                 ON CONFLICT (time, symbol, trade_id) DO NOTHING;
-            """, [(t['timestamp'], t['symbol'], t['price'], t['size'], 
+            """, [(tick_epoch_ms(t), t['symbol'], t['price'], t['size'], 
                    t['trade_id'], t['is_buyer_maker']) for t in ticks])
             
         logger.debug(f"Inserted batch of {len(ticks)} ticks")
     
+    async def insert_ticks_copy(self, ticks: List[dict]):
+        """
+        Insert multiple ticks via binary COPY + one set-based merge.
+        
+        Rows are COPYed into a per-session temp staging table (unlogged,
+        emptied on commit), then merged into ticks with a single
+        INSERT ... SELECT ... ON CONFLICT DO NOTHING. Timestamps travel as
+        epoch-ms integers and are converted server-side.
+        """
+        if not ticks:
+            return
+        
+        records = [
+            (tick_epoch_ms(t), t['symbol'], t['price'], t['size'],
+             t['trade_id'], t['is_buyer_maker'])
+            for t in ticks
+        ]
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction():
+                await conn.execute("""
+                    CREATE TEMP TABLE IF NOT EXISTS ticks_staging (
+                        time_ms BIGINT NOT NULL,
+                        symbol TEXT NOT NULL,
+                        price DOUBLE PRECISION NOT NULL,
+                        size DOUBLE PRECISION NOT NULL,
+                        trade_id BIGINT,
+                        is_buyer_maker BOOLEAN
+                    ) ON COMMIT DELETE ROWS;
+                """)
+                
+                await conn.copy_records_to_table(
+                    'ticks_staging',
+                    records=records,
+                    columns=['time_ms', 'symbol', 'price', 'size', 'trade_id', 'is_buyer_maker']
+                )
+                
+                await conn.execute("""
+                    INSERT INTO ticks (time, symbol, price, size, trade_id, is_buyer_maker)
+                    SELECT to_timestamp(time_ms::double precision / 1000), symbol, price, size,
+                           trade_id, is_buyer_maker
+                    FROM ticks_staging
+                    ON CONFLICT (time, symbol, trade_id) DO NOTHING;
+                """)
+        
+        logger.debug(f"Copied batch of {len(ticks)} ticks")
+    
+    @staticmethod
+    async def _copy_columns(conn, query: str, *args, columns: list) -> Dict[str, np.ndarray]:
+        """
+        Run a query through binary COPY and decode it into NumPy columns.
+        
+        The selected columns must be fixed-width and non-NULL (see
+        BinaryCopyDecoder), so nullable columns are selected with COALESCE.
+        """
+        chunks = []
+        
+        async def collect(chunk: bytes):
+            chunks.append(chunk)
+        
+        await conn.copy_from_query(query, *args, output=collect, format='binary')
+        return BinaryCopyDecoder.decode(b''.join(chunks), columns)
+    
+    @staticmethod
+    def _utc_index(times: np.ndarray) -> pd.DatetimeIndex:
+        return pd.DatetimeIndex(pd.to_datetime(times, utc=True), name='time')
+    
     async def get_recent_ticks(
         self, 
         symbol: str, 
         minutes: int = 60,
         limit: Optional[int] = None
     ) -> pd.DataFrame:
-        """Fetch recent ticks for a symbol."""
+        """Fetch recent ticks for a symbol (columnar, via binary COPY)."""
+        query = """
+            SELECT time, price, size, COALESCE(is_buyer_maker, FALSE), is_buyer_maker IS NULL
+            FROM ticks
+            WHERE symbol = $1 AND time > NOW() - INTERVAL '%s minutes'
+            ORDER BY time DESC
+        """ % minutes
+        
+        if limit:
+            query += f" LIMIT {limit}"
+        
         async with self.pool.acquire() as conn:
-            query = """
-                SELECT time, symbol, price, size, is_buyer_maker
-                FROM ticks
-                WHERE symbol = $1 AND time > NOW() - INTERVAL '%s minutes'
-                ORDER BY time DESC
-            """ % minutes
+            columns = await self._copy_columns(conn, query, symbol, columns=[
+                ('time', 'timestamptz'), ('price', 'float8'), ('size', 'float8'),
+                ('is_buyer_maker', 'bool'), ('is_buyer_maker_null', 'bool')
+            ])
+        
+        if len(columns['time']) == 0:
+            return pd.DataFrame()
+        
+        # Newest-first from the query (for LIMIT); return oldest first
+        is_buyer_maker = columns['is_buyer_maker'][::-1]
+        is_null = columns['is_buyer_maker_null'][::-1]
+        if is_null.any():
+            is_buyer_maker = pd.array(is_buyer_maker, dtype='boolean')
+            is_buyer_maker[is_null] = pd.NA
+        
+        return pd.DataFrame({
+            'time': pd.to_datetime(columns['time'][::-1], utc=True),
+            'symbol': symbol,
+            'price': columns['price'][::-1],
+            'size': columns['size'][::-1],
+            'is_buyer_maker': is_buyer_maker
+        })
+    
+    async def iter_ticks(
+        self,
+        symbols: Union[str, List[str]],
+        start: datetime,
+        end: Optional[datetime] = None,
+        chunk_rows: int = 50_000
+    ) -> AsyncIterator[Dict[str, np.ndarray]]:
+        """
+        Stream ticks for one or more symbols in time order, in fixed-size chunks.
+        
+        Each symbol is read through its own server-side cursor (following
+        the (symbol, time) index, so the server never sorts the range) and
+        the streams are merged client-side. At most about chunk_rows rows
+        per symbol are held at a time, however long the range. The cursors
+        live in a read-only transaction on one pooled connection, released
+        when the generator finishes or is closed.
+        
+        Args:
+            symbols: Symbol or list of symbols
+            start: Inclusive start time
+            end: Exclusive end time (default: open-ended)
+            chunk_rows: Rows per yielded chunk and per cursor fetch
+        
+        Yields:
+            Dicts of equal-length arrays: time_ms (int64 epoch ms),
+            symbol_id (index into symbols), price, size, is_buyer_maker
+            (NULL read as False). Every chunk but the last has chunk_rows rows.
+        """
+        if isinstance(symbols, str):
+            symbols = [symbols]
+        
+        args = [start] if end is None else [start, end]
+        query = f"""
+            SELECT (extract(epoch FROM time) * 1000)::bigint, price, size,
+                   COALESCE(is_buyer_maker, FALSE)
+            FROM ticks
+            WHERE symbol = $1 AND time >= $2 {'' if end is None else 'AND time < $3'}
+            ORDER BY time
+        """
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                fetchers = [
+                    self._cursor_fetcher(await conn.cursor(query, symbol, *args), symbol_id)
+                    for symbol_id, symbol in enumerate(symbols)
+                ]
+                async for chunk in self._merge_tick_streams(fetchers, chunk_rows):
+                    yield chunk
+    
+    @staticmethod
+    def _cursor_fetcher(cursor, symbol_id: int) -> Callable[[int], Awaitable[Optional[Dict[str, np.ndarray]]]]:
+        """fetch(n) -> next n rows of a tick cursor as arrays, or None when done."""
+        async def fetch(n: int) -> Optional[Dict[str, np.ndarray]]:
+            rows = await cursor.fetch(n)
+            if not rows:
+                return None
+            time_ms, price, size, is_buyer_maker = zip(*rows)
+            return {
+                'time_ms': np.array(time_ms, dtype=np.int64),
+                'symbol_id': np.full(len(rows), symbol_id, dtype=np.int16),
+                'price': np.array(price, dtype=np.float64),
+                'size': np.array(size, dtype=np.float64),
+                'is_buyer_maker': np.array(is_buyer_maker, dtype=bool)
+            }
+        return fetch
+    
+    @staticmethod
+    async def _merge_tick_streams(
+        fetchers: List[Callable[[int], Awaitable[Optional[Dict[str, np.ndarray]]]]],
+        chunk_rows: int
+    ) -> AsyncIterator[Dict[str, np.ndarray]]:
+        """
+        K-way merge of time-ordered tick streams into chunk_rows-sized chunks.
+        
+        Rows up to the earliest last-buffered time among streams that may
+        still have more rows are final; those are merged (stable sort), the
+        rest stay buffered and streams are refilled as they run dry.
+        """
+        buffers: List[Optional[Dict[str, np.ndarray]]] = [None] * len(fetchers)
+        exhausted = [False] * len(fetchers)
+        pending: List[Dict[str, np.ndarray]] = []
+        pending_rows = 0
+        
+        while True:
+            for i, fetch in enumerate(fetchers):
+                if not exhausted[i] and (buffers[i] is None or len(buffers[i]['time_ms']) == 0):
+                    buffers[i] = await fetch(chunk_rows)
+                    exhausted[i] = buffers[i] is None or len(buffers[i]['time_ms']) < chunk_rows
             
-            if limit:
-                query += f" LIMIT {limit}"
+            live = [i for i, b in enumerate(buffers) if b is not None and len(b['time_ms'])]
+            if not live:
+                break
             
-            rows = await conn.fetch(query, symbol)
+            open_ends = [buffers[i]['time_ms'][-1] for i in live if not exhausted[i]]
+            horizon = min(open_ends) if open_ends else None
             
-        if not rows:
-            return pd.DataFrame()
+            parts = []
+            for i in live:
+                buffer = buffers[i]
+                cut = len(buffer['time_ms']) if horizon is None else \
+                    int(np.searchsorted(buffer['time_ms'], horizon, side='right'))
+                parts.append({k: v[:cut] for k, v in buffer.items()})
+                buffers[i] = {k: v[cut:] for k, v in buffer.items()}
             
-        df = pd.DataFrame(rows, columns=['time', 'symbol', 'price', 'size', 'is_buyer_maker'])
-        df['time'] = pd.to_datetime(df['time'])
-        return df.sort_values('time')
+            merged = TimeSeriesDB._concat_columns(parts)
+            order = np.argsort(merged['time_ms'], kind='stable')
+            pending.append({k: v[order] for k, v in merged.items()})
+            pending_rows += len(order)
+            
+            if pending_rows >= chunk_rows:
+                merged = TimeSeriesDB._concat_columns(pending)
+                full = pending_rows - pending_rows % chunk_rows
+                for offset in range(0, full, chunk_rows):
+                    yield {k: v[offset:offset + chunk_rows] for k, v in merged.items()}
+                pending = [{k: v[full:] for k, v in merged.items()}]
+                pending_rows -= full
+        
+        if pending_rows:
+            yield TimeSeriesDB._concat_columns(pending)
+    
+    @staticmethod
+    def _concat_columns(parts: List[Dict[str, np.ndarray]]) -> Dict[str, np.ndarray]:
+        if len(parts) == 1:
+            return parts[0]
+        return {k: np.concatenate([p[k] for p in parts]) for k in parts[0]}
+    
+    # Ticks per chunk when streaming ticks into resample_and_store
+    RESAMPLE_CHUNK_ROWS = 100_000
     
     async def resample_and_store(self, symbol: str, interval: str):
         """
         Resample tick data to OHLCV and store.
         
+        Ticks since the last stored bar are streamed with iter_ticks and
+        aggregated chunk by chunk. The ticks of each chunk's last (possibly
+        unfinished) bar are carried into the next chunk, so bars never split
+        across chunks and a long catch-up needs memory for one chunk only.
+        
         interval: '1s', '1m', or '5m'
         """
-        # Map interval to SQL interval and pandas freq
-        interval_map = {
-            '1s': ('1 second', '1S'),
-            '1m': ('1 minute', '1T'),
-            '5m': ('5 minutes', '5T')
-        }
-        
-        if interval not in interval_map:
+        if interval not in BAR_INTERVALS_MS:
             raise ValueError(f"Invalid interval: {interval}")
         
-        sql_interval, pd_freq = interval_map[interval]
+        interval_ms = BAR_INTERVALS_MS[interval]
         
         async with self.pool.acquire() as conn:
-            # Get last processed time
+            # Get last processed time; its bar is rebuilt from its first tick
             last_time = await conn.fetchval(f"""
                 SELECT MAX(time) FROM ohlcv_{interval} WHERE symbol = $1
             """, symbol)
+        
+        if last_time is None:
+            # Start from 1 hour ago if no data
+            last_time = datetime.now() - timedelta(hours=1)
+        
+        carry = None
+        async for chunk in self.iter_ticks(symbol, last_time, chunk_rows=self.RESAMPLE_CHUNK_ROWS):
+            if carry is not None:
+                chunk = self._concat_columns([carry, chunk])
             
-            if last_time is None:
-                # Start from 1 hour ago if no data
-                last_time = datetime.now() - timedelta(hours=1)
-            
-            # Fetch tick data since last processed time
-            rows = await conn.fetch("""
-                SELECT time, price, size
-                FROM ticks
-                WHERE symbol = $1 AND time > $2
-                ORDER BY time
-            """, symbol, last_time)
-            
-            if not rows:
-                return
-            
-            # Convert to DataFrame and resample
-            df = pd.DataFrame(rows, columns=['time', 'price', 'size'])
-            df['time'] = pd.to_datetime(df['time'])
-            df = df.set_index('time')
-            
-            # Resample to OHLCV
-            ohlcv = df['price'].resample(pd_freq).agg(['first', 'max', 'min', 'last'])
-            ohlcv.columns = ['open', 'high', 'low', 'close']
-            ohlcv['volume'] = df['size'].resample(pd_freq).sum()
-            ohlcv['trade_count'] = df['price'].resample(pd_freq).count()
-            
-            # Remove empty bars
-            ohlcv = ohlcv.dropna()
-            
-            if len(ohlcv) == 0:
-                return
-            
-            # Insert OHLCV data
-            records = [
-                (idx, symbol, row['open'], row['high'], row['low'], 
-                 row['close'], row['volume'], int(row['trade_count']))
-                for idx, row in ohlcv.iterrows()
-            ]
-            
-            await conn.executemany(f"""
-                INSERT INTO ohlcv_{interval} 
-                (time, symbol, open, high, low, close, volume, trade_count)
-                VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
-                ON CONFLICT (time, symbol) DO UPDATE SET
+            last_ms = chunk['time_ms'][-1]
+            cut = int(np.searchsorted(chunk['time_ms'], last_ms - last_ms % interval_ms, side='left'))
+            carry = {k: v[cut:] for k, v in chunk.items()}
+            await self._store_tick_bars(symbol, interval, {k: v[:cut] for k, v in chunk.items()})
+        
+        if carry is not None:
+            await self._store_tick_bars(symbol, interval, carry)
+    
+    async def _store_tick_bars(self, symbol: str, interval: str, ticks: Dict[str, np.ndarray]):
+        """Aggregate one symbol's time-ordered ticks into bars and upsert them."""
+        if len(ticks['time_ms']) == 0:
+            return
+        
+        bars = aggregate_bars(ticks['time_ms'], ticks['price'], ticks['size'], BAR_INTERVALS_MS[interval])
+        await self._upsert_ohlcv(interval, {
+            'start_ms': bars['start_ms'].tolist(),
+            'symbol': [symbol] * len(bars['start_ms']),
+            **{k: bars[k].tolist() for k in ('open', 'high', 'low', 'close', 'volume', 'trade_count')}
+        })
+    
+    async def upsert_ohlcv_bars(self, interval: str, bars: list):
+        """
+        Write closed bars from the streaming bar builder in one statement.
+        
+        bars: objects with symbol, start_ms, open, high, low, close, volume,
+        trade_count and partial. Columns are sent as arrays and unnested
+        server-side, so a flush is one round trip regardless of the number of
+        bars.
+        
+        Bars flushed while still open (partial, on shutdown) are stored with
+        partial = TRUE. The next write of the same bar, e.g. by a restarted
+        builder, is merged into such a row (first open, high/low extremes,
+        latest close, summed volume and trade count) rather than replacing
+        it; once a complete bar has been merged the row is no longer partial,
+        so re-writes replace it again.
+        """
+        if not bars:
+            return
+        
+        await self._upsert_ohlcv(interval, {
+            'start_ms': [b.start_ms for b in bars], 'symbol': [b.symbol for b in bars],
+            'open': [b.open for b in bars], 'high': [b.high for b in bars],
+            'low': [b.low for b in bars], 'close': [b.close for b in bars],
+            'volume': [b.volume for b in bars], 'trade_count': [b.trade_count for b in bars],
+            'partial': [b.partial for b in bars]
+        }, merge_partial=True)
+    
+    async def _upsert_ohlcv(self, interval: str, columns: Dict[str, list], merge_partial: bool = False):
+        """
+        Upsert bars given as column lists (start_ms, symbol, open .. trade_count,
+        optionally partial).
+        
+        Existing rows are replaced, unless merge_partial is set and the stored
+        row is partial: then the new bar is added to it (see upsert_ohlcv_bars).
+        Bars recomputed from the ticks table are complete and always replace.
+        """
+        if interval not in ('1s', '1m', '5m'):
+            raise ValueError(f"Invalid interval: {interval}")
+        
+        partial = columns.get('partial') or [False] * len(columns['start_ms'])
+        if merge_partial:
+            update = """
+                    open = CASE WHEN stored.partial THEN stored.open ELSE EXCLUDED.open END,
+                    high = CASE WHEN stored.partial THEN GREATEST(stored.high, EXCLUDED.high) ELSE EXCLUDED.high END,
+                    low = CASE WHEN stored.partial THEN LEAST(stored.low, EXCLUDED.low) ELSE EXCLUDED.low END,
+                    close = EXCLUDED.close,
+                    volume = CASE WHEN stored.partial THEN stored.volume + EXCLUDED.volume ELSE EXCLUDED.volume END,
+                    trade_count = CASE WHEN stored.partial
+                        THEN COALESCE(stored.trade_count, 0) + EXCLUDED.trade_count
+                        ELSE EXCLUDED.trade_count END,
+                    partial = EXCLUDED.partial"""
+        else:
+            update = """
                     open = EXCLUDED.open,
                     high = EXCLUDED.high,
                     low = EXCLUDED.low,
                     close = EXCLUDED.close,
                     volume = EXCLUDED.volume,
-                    trade_count = EXCLUDED.trade_count;
-            """, records)
-            
-            logger.info(f"Resampled {len(records)} {interval} bars for {symbol}")
+                    trade_count = EXCLUDED.trade_count,
+                    partial = EXCLUDED.partial"""
+        
+        async with self.pool.acquire() as conn:
+            await conn.execute(f"""
+                INSERT INTO ohlcv_{interval} AS stored
+                (time, symbol, open, high, low, close, volume, trade_count, partial)
+                SELECT to_timestamp(b.time_ms::double precision / 1000), b.symbol,
+                       b.open, b.high, b.low, b.close, b.volume, b.trade_count, b.partial
+                FROM unnest(
+                    $1::bigint[], $2::text[], $3::float8[], $4::float8[],
+                    $5::float8[], $6::float8[], $7::float8[], $8::int[], $9::bool[]
+                ) AS b(time_ms, symbol, open, high, low, close, volume, trade_count, partial)
+                ON CONFLICT (time, symbol) DO UPDATE SET{update};
+            """,
+                columns['start_ms'], columns['symbol'], columns['open'], columns['high'],
+                columns['low'], columns['close'], columns['volume'], columns['trade_count'], partial
+            )
+        
+        logger.debug(f"Wrote {len(columns['start_ms'])} {interval} bars")
     
     async def get_ohlcv(
         self,
@@ -244,22 +674,156 @@ class TimeSeriesDB:
         interval: str,
         minutes: int = 60
     ) -> pd.DataFrame:
-        """Fetch OHLCV data for a symbol and interval."""
+        """Fetch OHLCV data for a symbol and interval (table or continuous aggregate)."""
+        relation = self._ohlcv_relation(interval)
+        
         async with self.pool.acquire() as conn:
-            rows = await conn.fetch(f"""
-                SELECT time, open, high, low, close, volume, trade_count
-                FROM ohlcv_{interval}
+            bars = await self._copy_columns(conn, f"""
+                SELECT time, open, high, low, close, volume, COALESCE(trade_count, 0)
+                FROM {relation}
                 WHERE symbol = $1 AND time > NOW() - INTERVAL '{minutes} minutes'
                 ORDER BY time
-            """, symbol)
+            """, symbol, columns=[
+                ('time', 'timestamptz'), ('open', 'float8'), ('high', 'float8'), ('low', 'float8'),
+                ('close', 'float8'), ('volume', 'float8'), ('trade_count', 'int4')
+            ])
         
-        if not rows:
+        if len(bars['time']) == 0:
             return pd.DataFrame()
         
-        df = pd.DataFrame(rows, columns=['time', 'open', 'high', 'low', 'close', 'volume', 'trade_count'])
-        df['time'] = pd.to_datetime(df['time'])
-        df = df.set_index('time')
-        return df
+        index = self._utc_index(bars.pop('time'))
+        return pd.DataFrame(bars, index=index)
+    
+    PAIR_OHLCV_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+    
+    async def get_pair_ohlcv(
+        self,
+        symbol_1: str,
+        symbol_2: str,
+        interval: str,
+        minutes: int = 60
+    ) -> pd.DataFrame:
+        """
+        Fetch time-aligned OHLCV bars for two symbols in one query.
+        
+        The bars are inner-joined on time server-side (only timestamps both
+        symbols have, like dropna() on two get_ohlcv results) and each column
+        comes back as one binary array (array_send), decoded with
+        np.frombuffer instead of building a Record per row.
+        
+        Returns:
+            DataFrame indexed by time with open_1 .. volume_1 and
+            open_2 .. volume_2 columns (empty if no common bars)
+        """
+        relation = self._ohlcv_relation(interval)
+        aggregates = ",\n".join(
+            f"array_send(array_agg(a.{col} ORDER BY a.time)) AS {col}_1, "
+            f"array_send(array_agg(b.{col} ORDER BY a.time)) AS {col}_2"
+            for col in self.PAIR_OHLCV_COLUMNS
+        )
+        
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(f"""
+                SELECT array_send(array_agg(
+                           (extract(epoch FROM a.time) * 1000)::bigint ORDER BY a.time
+                       )) AS time_ms,
+                       {aggregates}
+                FROM {relation} a
+                JOIN {relation} b ON b.time = a.time AND b.symbol = $2
+                WHERE a.symbol = $1
+                  AND a.time > NOW() - INTERVAL '{minutes} minutes'
+                  AND b.time > NOW() - INTERVAL '{minutes} minutes'
+            """, symbol_1, symbol_2)
+        
+        time_ms = self._decode_array(row['time_ms'], np.int64)
+        if len(time_ms) == 0:
+            return pd.DataFrame()
+        
+        columns = {
+            f"{col}_{side}": self._decode_array(row[f"{col}_{side}"], np.float64)
+            for side in (1, 2)
+            for col in self.PAIR_OHLCV_COLUMNS
+        }
+        index = pd.DatetimeIndex(pd.to_datetime(time_ms, unit='ms', utc=True), name='time')
+        return pd.DataFrame(columns, index=index)
+    
+    async def iter_pair_closes(
+        self,
+        symbol_1: str,
+        symbol_2: str,
+        start: datetime,
+        end: Optional[datetime] = None,
+        interval: str = '1m',
+        chunk_rows: int = 50_000
+    ) -> AsyncIterator[Dict[str, np.ndarray]]:
+        """
+        Stream time-aligned close prices of two symbols in fixed-size chunks.
+        
+        Same inner join on time as get_pair_ohlcv, read through a server-side
+        cursor in a read-only transaction, so months of bars are processed
+        with at most chunk_rows rows held client-side.
+        
+        Args:
+            symbol_1, symbol_2: Pair legs
+            start: Inclusive start time
+            end: Exclusive end time (default: open-ended)
+            interval: Bar interval (table or continuous aggregate)
+            chunk_rows: Rows per yielded chunk
+        
+        Yields:
+            Dicts of equal-length arrays: time_ms (int64 epoch ms), close_1, close_2
+        """
+        relation = self._ohlcv_relation(interval)
+        args = [start] if end is None else [start, end]
+        query = f"""
+            SELECT (extract(epoch FROM a.time) * 1000)::bigint, a.close, b.close
+            FROM {relation} a
+            JOIN {relation} b ON b.time = a.time AND b.symbol = $2
+            WHERE a.symbol = $1 AND a.time >= $3 {'' if end is None else 'AND a.time < $4'}
+            ORDER BY a.time
+        """
+        
+        async with self.pool.acquire() as conn:
+            async with conn.transaction(readonly=True):
+                cursor = await conn.cursor(query, symbol_1, symbol_2, *args)
+                while True:
+                    rows = await cursor.fetch(chunk_rows)
+                    if not rows:
+                        break
+                    time_ms, close_1, close_2 = zip(*rows)
+                    yield {
+                        'time_ms': np.array(time_ms, dtype=np.int64),
+                        'close_1': np.array(close_1, dtype=np.float64),
+                        'close_2': np.array(close_2, dtype=np.float64)
+                    }
+                    if len(rows) < chunk_rows:
+                        break
+    
+    @staticmethod
+    def _decode_array(data: Optional[bytes], dtype) -> np.ndarray:
+        """
+        Decode a one-dimensional PostgreSQL binary array without NULLs.
+        
+        Layout (array_send): ndim, has_null, element oid, then per dimension
+        length and lower bound (all int32), then per element an int32 byte
+        length followed by the big-endian value.
+        """
+        dtype = np.dtype(dtype)
+        if data is None:
+            return np.empty(0, dtype=dtype)
+        
+        ndim, has_null, _ = struct.unpack_from('>iii', data)
+        if ndim == 0:
+            return np.empty(0, dtype=dtype)
+        if ndim != 1 or has_null:
+            raise ValueError("Expected a one-dimensional array without NULLs")
+        
+        (length,) = struct.unpack_from('>i', data, 12)
+        elements = np.frombuffer(
+            data, dtype=[('size', '>i4'), ('value', dtype.newbyteorder('>'))],
+            count=length, offset=20
+        )
+        return elements['value'].astype(dtype)
 
 
 if __name__ == "__main__":
@@ -283,6 +847,12 @@ if __name__ == "__main__":
         df = await db.get_recent_ticks('btcusdt', minutes=5)
         print(f"Recent ticks: {len(df)}")
         
+        # Stream the last day of ticks in chunks
+        rows = 0
+        async for chunk in db.iter_ticks(['btcusdt', 'ethusdt'], datetime.now() - timedelta(days=1)):
+            rows += len(chunk['time_ms'])
+        print(f"Streamed ticks: {rows}")
+        
         await db.disconnect()
     
     asyncio.run(test())
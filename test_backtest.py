@@ -0,0 +1,64 @@
+"""
+SpreadBacktester must reproduce PositionSimulator trade for trade.
+"""
+
+import numpy as np
+import pytest
+from loguru import logger
+
+from analytics.backtest import SpreadBacktester, _scan_bars_compiled
+
+
+@pytest.fixture(scope='module')
+def pair_series():
+    rng = np.random.default_rng(42)
+    n = 5_000
+    times = np.datetime64('2024-01-01T00:00:00', 'ms') + np.arange(n) * 1000
+    prices_2 = 100 + np.cumsum(rng.standard_normal(n) * 0.1)
+    ou = np.zeros(n)
+    shocks = rng.standard_normal(n) * 0.3
+    for t in range(1, n):
+        ou[t] = 0.97 * ou[t - 1] + shocks[t]
+    prices_1 = 1.5 * prices_2 + 20 + ou
+    
+    spread, zscore = SpreadBacktester.signals_from_prices(prices_1, prices_2, hedge_ratio=1.5)
+    return times, prices_1, prices_2, spread, zscore
+
+
+def simulate_bar_by_bar(backtester, times, prices_1, prices_2, spread, zscore):
+    """Reference: drive PositionSimulator per bar, as main.py does live."""
+    simulator = backtester.new_simulator()
+    py_times = times.astype('datetime64[us]').tolist()
+    for k in range(len(zscore)):
+        if np.isnan(zscore[k]):
+            continue
+        simulator.check_entry_signal(zscore[k], spread[k], prices_1[k], prices_2[k], 1.5, py_times[k])
+        simulator.check_exit_signal(zscore[k], spread[k], prices_1[k], prices_2[k], py_times[k])
+    return simulator
+
+
+@pytest.mark.parametrize('compiled', [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(_scan_bars_compiled is None, reason="numba not installed"))
+])
+@pytest.mark.parametrize('params', [
+    {},
+    {'entry_threshold': 1.5, 'exit_threshold': 0.5, 'stop_loss_pct': 0.02, 'take_profit_pct': 0.05}
+])
+def test_trades_match_position_simulator(pair_series, compiled, params):
+    times, prices_1, prices_2, spread, zscore = pair_series
+    backtester = SpreadBacktester(**params)
+    
+    logger.disable('analytics.pnl_tracker')  # Logs every trade
+    try:
+        simulator = simulate_bar_by_bar(backtester, times, prices_1, prices_2, spread, zscore)
+    finally:
+        logger.enable('analytics.pnl_tracker')
+    result = backtester.run(zscore, spread, times, prices_1, prices_2, hedge_ratio=1.5, compiled=compiled)
+    
+    assert len(result.trades) > 0
+    assert result.trades == simulator.closed_trades
+    assert result.metrics == simulator.get_performance_metrics()
+    assert result.simulator.current_position == simulator.current_position
+    assert result.simulator.max_unrealized_profit == simulator.max_unrealized_profit
+    assert result.simulator.max_unrealized_loss == simulator.max_unrealized_loss
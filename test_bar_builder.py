@@ -0,0 +1,112 @@
+"""
+Streaming OHLCV bars (OHLCVBarBuilder, aggregate_bars) against pandas resample.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from storage.bar_builder import BAR_INTERVALS_MS, OHLCVBarBuilder, aggregate_bars
+
+PANDAS_RULES = {'1s': '1s', '1m': '1min', '5m': '5min'}
+
+
+@pytest.fixture(scope='module')
+def ticks():
+    rng = np.random.default_rng(42)
+    n = 50_000
+    times = 1_700_000_000_000 + np.cumsum(rng.integers(0, 20, n))
+    prices = 100 + np.cumsum(rng.standard_normal(n) * 0.01)
+    sizes = rng.random(n)
+    return times, prices, sizes
+
+
+def tick_dicts(times, prices, sizes, symbol='btcusdt'):
+    return [
+        {'symbol': symbol, 'timestamp_ms': int(t), 'price': float(p), 'size': float(s)}
+        for t, p, s in zip(times, prices, sizes)
+    ]
+
+
+def build(ticks):
+    builder = OHLCVBarBuilder()
+    for tick in ticks:
+        builder.add_tick(tick)
+    return builder.flush_all()
+
+
+def pandas_bars(times, prices, sizes, interval):
+    df = pd.DataFrame({'price': prices, 'size': sizes}, index=pd.to_datetime(times, unit='ms'))
+    rule = PANDAS_RULES[interval]
+    expected = df['price'].resample(rule).ohlc()
+    expected['volume'] = df['size'].resample(rule).sum()
+    expected['trade_count'] = df['price'].resample(rule).count()
+    return expected[expected['trade_count'] > 0]
+
+
+def bars_frame(bars):
+    return pd.DataFrame(
+        [(b.open, b.high, b.low, b.close, b.volume, b.trade_count) for b in bars],
+        index=pd.to_datetime([b.start_ms for b in bars], unit='ms'),
+        columns=['open', 'high', 'low', 'close', 'volume', 'trade_count']
+    )
+
+
+@pytest.mark.parametrize('interval', list(BAR_INTERVALS_MS))
+def test_builder_matches_pandas_resample(ticks, interval):
+    times, prices, sizes = ticks
+    built = bars_frame(build(tick_dicts(times, prices, sizes))[interval])
+    expected = pandas_bars(times, prices, sizes, interval)
+    
+    pd.testing.assert_index_equal(built.index, expected.index)
+    for column in ('open', 'high', 'low', 'close'):
+        np.testing.assert_array_equal(built[column].values, expected[column].values)
+    np.testing.assert_allclose(built['volume'].values, expected['volume'].values, rtol=1e-12)
+    np.testing.assert_array_equal(built['trade_count'].values, expected['trade_count'].values)
+
+
+@pytest.mark.parametrize('interval', list(BAR_INTERVALS_MS))
+def test_aggregate_bars_matches_pandas_resample(ticks, interval):
+    times, prices, sizes = ticks
+    bars = aggregate_bars(times, prices, sizes, BAR_INTERVALS_MS[interval])
+    expected = pandas_bars(times, prices, sizes, interval)
+    
+    np.testing.assert_array_equal(pd.to_datetime(bars['start_ms'], unit='ms'), expected.index)
+    for column in ('open', 'high', 'low', 'close'):
+        np.testing.assert_array_equal(bars[column], expected[column].values)
+    np.testing.assert_allclose(bars['volume'], expected['volume'].values, rtol=1e-12)
+    np.testing.assert_array_equal(bars['trade_count'], expected['trade_count'].values)
+
+
+def test_aggregate_bars_empty():
+    bars = aggregate_bars(np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), 60_000)
+    assert all(len(values) == 0 for values in bars.values())
+
+
+def test_late_tick_after_close_stale_is_dropped():
+    builder = OHLCVBarBuilder(grace_ms=0)
+    builder.add_tick({'symbol': 'btcusdt', 'timestamp_ms': 1_000, 'price': 10.0, 'size': 1.0})
+    builder.add_tick({'symbol': 'ethusdt', 'timestamp_ms': 400_000, 'price': 1.0, 'size': 1.0})
+    builder.close_stale()
+    closed = builder.drain_closed()
+    assert [b.start_ms for b in closed['1m'] if b.symbol == 'btcusdt'] == [0]
+    
+    # Belongs to the 1s/1m/5m bars already emitted for btcusdt
+    builder.add_tick({'symbol': 'btcusdt', 'timestamp_ms': 1_500, 'price': 99.0, 'size': 5.0})
+    assert builder.late_ticks == 1
+    assert not any(b.symbol == 'btcusdt' for bars in builder.flush_all().values() for b in bars)
+
+
+def test_flush_all_flags_open_bars_partial(ticks):
+    times, prices, sizes = ticks
+    builder = OHLCVBarBuilder()
+    for tick in tick_dicts(times[:1000], prices[:1000], sizes[:1000]):
+        builder.add_tick(tick)
+    builder.close_stale(int(times[999]) - 1_000)
+    complete = builder.drain_closed()
+    flushed = builder.flush_all()
+    
+    assert not any(b.partial for bars in complete.values() for b in bars)
+    for interval in BAR_INTERVALS_MS:
+        assert flushed[interval][-1].partial
+        assert flushed[interval][-1].start_ms <= times[999] < flushed[interval][-1].start_ms + BAR_INTERVALS_MS[interval]
@@ -0,0 +1,51 @@
+"""
+Fixed-lag fast ADF (FastADF, adf_test(method='fast')) against statsmodels adfuller.
+"""
+
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+from statsmodels.tsa.stattools import adfuller
+
+from analytics.fast_adf import FastADF
+from analytics.statistical import StatisticalAnalytics
+
+
+@pytest.fixture(scope='module')
+def ar_series():
+    """AR(1) rows from strongly mean-reverting to a random walk."""
+    rng = np.random.default_rng(42)
+    rows = np.zeros((8, 500))
+    phi = np.linspace(0.5, 1.0, 8)
+    for t in range(1, 500):
+        rows[:, t] = phi * rows[:, t - 1] + rng.standard_normal(8)
+    return rows
+
+
+def reference(row, lag, regression='c'):
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return adfuller(row, maxlag=lag, autolag=None, regression=regression)
+
+
+@pytest.mark.parametrize('lag', [0, 1, 2])
+def test_adf_test_fast_matches_statsmodels(ar_series, lag):
+    for row in ar_series:
+        result = StatisticalAnalytics.adf_test(pd.Series(row), max_lag=lag, method='fast')
+        expected = reference(row, lag)
+        
+        assert result['statistic'] == pytest.approx(expected[0], rel=1e-10, abs=1e-10)
+        assert result['p_value'] == pytest.approx(expected[1], abs=1e-5)
+        assert result['is_stationary'] == (expected[1] < 0.05)
+        for level, value in expected[4].items():
+            assert result['critical_values'][level] == pytest.approx(value, abs=1e-3)
+
+
+@pytest.mark.parametrize('regression', FastADF.REGRESSIONS)
+def test_batch_matches_statsmodels(ar_series, regression):
+    for row, result in zip(ar_series, FastADF.test_batch(ar_series, lag=2, regression=regression)):
+        expected = reference(row, 2, regression)
+        assert result['statistic'] == pytest.approx(expected[0], rel=1e-10, abs=1e-10)
+        assert result['p_value'] == pytest.approx(expected[1], abs=1e-5)
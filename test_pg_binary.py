@@ -0,0 +1,74 @@
+"""
+Binary COPY decoding (BinaryCopyDecoder) against hand-built payloads.
+"""
+
+import struct
+
+import numpy as np
+import pytest
+
+from storage.pg_binary import BinaryCopyDecoder
+
+COLUMNS = [('time', 'timestamptz'), ('price', 'float8'), ('size', 'float8'),
+           ('trade_count', 'int4'), ('is_buyer_maker', 'bool')]
+
+
+def copy_payload(rows):
+    """PostgreSQL binary COPY output for rows of (time_us_since_2000, price, size, count, flag)."""
+    out = BinaryCopyDecoder.SIGNATURE + struct.pack('>ii', 0, 0)
+    for time_us, price, size, count, flag in rows:
+        out += struct.pack('>h', len(COLUMNS))
+        out += struct.pack('>iq', 8, time_us)
+        out += struct.pack('>id', 8, price)
+        out += struct.pack('>id', 8, size)
+        out += struct.pack('>ii', 4, count)
+        out += struct.pack('>i?', 1, flag)
+    return out + struct.pack('>h', -1)
+
+
+def test_decode_matches_row_values():
+    # 2024-01-01T00:00:00Z in microseconds since 2000-01-01
+    base_us = 757382400 * 1_000_000
+    rows = [(base_us + i * 1_500, 45000.5 + i, 0.25 * i, i * 3, i % 2 == 0) for i in range(5)]
+    
+    decoded = BinaryCopyDecoder.decode(copy_payload(rows), COLUMNS)
+    
+    expected_time = np.datetime64('2024-01-01T00:00:00', 'us') + np.arange(5) * 1_500
+    np.testing.assert_array_equal(decoded['time'], expected_time)
+    np.testing.assert_array_equal(decoded['price'], [r[1] for r in rows])
+    np.testing.assert_array_equal(decoded['size'], [r[2] for r in rows])
+    np.testing.assert_array_equal(decoded['trade_count'], [r[3] for r in rows])
+    np.testing.assert_array_equal(decoded['is_buyer_maker'], [r[4] for r in rows])
+    assert all(values.dtype.isnative for values in decoded.values())
+
+
+def test_decode_empty_result():
+    decoded = BinaryCopyDecoder.decode(copy_payload([]), COLUMNS)
+    assert all(len(values) == 0 for values in decoded.values())
+
+
+def test_encode_decode_round_trip():
+    rng = np.random.default_rng(42)
+    n = 10_000
+    values = {
+        'time': np.datetime64('2024-01-01T00:00:00', 'us') + np.arange(n) * 1000,
+        'price': 45000 + rng.standard_normal(n).cumsum(),
+        'size': rng.random(n),
+        'trade_count': rng.integers(0, 1000, n).astype(np.int32),
+        'is_buyer_maker': rng.random(n) > 0.5
+    }
+    
+    decoded = BinaryCopyDecoder.decode(BinaryCopyDecoder.encode(COLUMNS, values), COLUMNS)
+    
+    for name, _ in COLUMNS:
+        np.testing.assert_array_equal(decoded[name], values[name])
+
+
+def test_decode_rejects_null():
+    payload = bytearray(copy_payload([(0, 1.0, 1.0, 1, True)]))
+    # Replace the price field's length (after header, field count and the time field) with -1
+    offset = len(BinaryCopyDecoder.SIGNATURE) + 8 + 2 + 12
+    payload[offset:offset + 4] = struct.pack('>i', -1)
+    
+    with pytest.raises(ValueError):
+        BinaryCopyDecoder.decode(bytes(payload), COLUMNS)
@@ -0,0 +1,167 @@
+"""
+BackgroundTickFlusher retry, spill and replay against a failing insert_fn.
+"""
+
+import asyncio
+import json
+
+from storage.tick_flusher import BackgroundTickFlusher
+
+
+def make_tick(i):
+    return {'symbol': 'btcusdt', 'timestamp_ms': 1_700_000_000_000 + i, 'price': 100.0 + i,
+            'size': 1.0, 'trade_id': i, 'is_buyer_maker': bool(i % 2)}
+
+
+class FlakyInsert:
+    """insert_fn double: fails while `down` (or for the first `failures` calls)."""
+    
+    def __init__(self, failures=0, down=False, delay=0.0):
+        self.failures = failures
+        self.down = down
+        self.delay = delay
+        self.calls = 0
+        self.written = []
+    
+    async def __call__(self, batch):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.down or self.calls <= self.failures:
+            raise ConnectionError("database unavailable")
+        self.written.extend(tick['trade_id'] for tick in batch)
+
+
+async def feed(flusher, n, start=0, yield_every=50):
+    for i in range(start, start + n):
+        flusher.add(make_tick(i))
+        if i % yield_every == 0:
+            await asyncio.sleep(0)
+
+
+async def run_flusher(flusher, body):
+    task = asyncio.create_task(flusher.run())
+    try:
+        await body()
+    finally:
+        await flusher.stop()
+        await task
+
+
+def spill_files(path):
+    return sorted(path.glob('ticks-*.jsonl*'))
+
+
+def spilled_trade_ids(path):
+    ids = []
+    for spill in spill_files(path):
+        with open(spill) as f:
+            ids.extend(json.loads(line)['trade_id'] for line in f)
+    return ids
+
+
+def test_retries_then_writes(tmp_path):
+    insert = FlakyInsert(failures=2)
+    flusher = BackgroundTickFlusher(insert, batch_size=100, flush_interval=0.05, max_retries=3,
+                                    retry_backoff=0.001, spill_dir=str(tmp_path))
+    
+    async def body():
+        await feed(flusher, 100)
+        await asyncio.sleep(0.2)
+    
+    asyncio.run(run_flusher(flusher, body))
+    
+    assert sorted(insert.written) == list(range(100))
+    assert flusher.stats['retries'] == 2
+    assert flusher.stats['spilled_ticks'] == 0
+    assert spill_files(tmp_path) == []
+
+
+def test_spills_after_retries_and_replays_on_recovery(tmp_path):
+    insert = FlakyInsert(down=True)
+    flusher = BackgroundTickFlusher(insert, batch_size=100, flush_interval=0.05, max_retries=1,
+                                    retry_backoff=0.001, spill_dir=str(tmp_path))
+    
+    async def body():
+        await feed(flusher, 300)
+        await asyncio.sleep(0.2)
+        assert flusher.stats['spilled_ticks'] == 300
+        assert insert.written == []
+        
+        # The next successful write replays the spill files
+        insert.down = False
+        await feed(flusher, 100, start=300)
+        await asyncio.sleep(0.3)
+    
+    asyncio.run(run_flusher(flusher, body))
+    
+    assert sorted(insert.written) == list(range(400))
+    assert flusher.stats['replayed_files'] == flusher.stats['spilled_batches']
+    assert spill_files(tmp_path) == []
+
+
+def test_spill_file_round_trip(tmp_path):
+    flusher = BackgroundTickFlusher(FlakyInsert(down=True), spill_dir=str(tmp_path))
+    batch = [make_tick(i) for i in range(10)]
+    
+    asyncio.run(flusher._spill(batch, reason="test"))
+    
+    (path,) = spill_files(tmp_path)
+    assert path.suffix == '.jsonl'
+    with open(path) as f:
+        assert [json.loads(line) for line in f] == batch
+
+
+def test_replays_spill_from_previous_run(tmp_path):
+    previous = BackgroundTickFlusher(FlakyInsert(down=True), spill_dir=str(tmp_path))
+    asyncio.run(previous._spill([make_tick(i) for i in range(50)], reason="test"))
+    
+    insert = FlakyInsert()
+    flusher = BackgroundTickFlusher(insert, flush_interval=0.05, spill_dir=str(tmp_path))
+    
+    asyncio.run(run_flusher(flusher, lambda: asyncio.sleep(0.1)))
+    
+    assert sorted(insert.written) == list(range(50))
+    assert spill_files(tmp_path) == []
+
+
+def test_buffer_stays_bounded_while_writes_stall(tmp_path):
+    insert = FlakyInsert(delay=0.05)
+    flusher = BackgroundTickFlusher(insert, batch_size=100, flush_interval=0.05, max_in_flight=1,
+                                    max_buffered_ticks=500, spill_dir=str(tmp_path))
+    peak = 0
+    
+    async def body():
+        nonlocal peak
+        for i in range(5_000):
+            flusher.add(make_tick(i))
+            peak = max(peak, flusher.buffered)
+            if i % 50 == 0:
+                await asyncio.sleep(0)
+        await asyncio.sleep(0.5)
+    
+    asyncio.run(run_flusher(flusher, body))
+    
+    assert peak < 500
+    assert flusher.stats['spilled_ticks'] > 0
+    # Every tick is written, still spilled (files created after the last
+    # replay pass wait for the next run) or counted as dropped when more
+    # than MAX_PENDING_SPILLS spills were queued
+    kept = insert.written + spilled_trade_ids(tmp_path)
+    assert len(set(kept)) == len(kept)
+    assert len(kept) + flusher.stats['dropped_ticks'] == 5_000
+
+
+def test_unwritable_spill_dir_counts_dropped_ticks(tmp_path):
+    blocker = tmp_path / 'not-a-dir'
+    blocker.write_text('')
+    flusher = BackgroundTickFlusher(FlakyInsert(down=True), batch_size=10, flush_interval=0.05,
+                                    max_in_flight=1, max_retries=0, spill_dir=str(blocker / 'spill'))
+    
+    async def body():
+        await feed(flusher, 200, yield_every=10)
+        await asyncio.sleep(0.2)
+    
+    asyncio.run(run_flusher(flusher, body))
+    
+    assert flusher.stats['dropped_ticks'] == 200
+    assert flusher.stats['spilled_ticks'] == 0
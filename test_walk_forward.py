@@ -0,0 +1,40 @@
+"""
+Chunked RollingPairMoments z-score against the pandas rolling z-score.
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from analytics.statistical import StatisticalAnalytics
+from analytics.walk_forward import RollingPairMoments
+
+
+@pytest.fixture(scope='module')
+def btc_eth():
+    """BTC/ETH-like levels: leg variances dwarf the spread variance."""
+    rng = np.random.default_rng(7)
+    n = 20_000
+    eth = 3500 + np.cumsum(rng.standard_normal(n) * 5)
+    noise = np.zeros(n)
+    shocks = rng.standard_normal(n) * 0.5
+    for t in range(1, n):
+        noise[t] = 0.9 * noise[t - 1] + shocks[t]
+    return 15 * eth + noise, eth
+
+
+@pytest.mark.parametrize('window', [30, 120])
+@pytest.mark.parametrize('chunk', [997, 5_000])
+def test_chunked_zscore_matches_pandas(btc_eth, window, chunk):
+    btc, eth = btc_eth
+    spread = btc - 15 * eth
+    
+    state = RollingPairMoments(window)
+    parts = [state.update(btc[i:i + chunk], eth[i:i + chunk]) for i in range(0, len(btc), chunk)]
+    moments = {name: np.concatenate([part[name] for part in parts]) for name in RollingPairMoments.FIELDS}
+    zscore = RollingPairMoments.spread_zscore(moments, spread, 15.0, 20)
+    reference = StatisticalAnalytics.calculate_zscore(pd.Series(spread), window=window, min_periods=20).values
+    
+    np.testing.assert_array_equal(np.isnan(zscore), np.isnan(reference))
+    np.testing.assert_allclose(zscore, reference, atol=1e-6, equal_nan=True)
+    assert not ((np.abs(zscore) > 2) != (np.abs(reference) > 2)).any()